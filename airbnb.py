@@ -1,18 +1,47 @@
 from selenium import webdriver
 from selenium_stealth import stealth
-import time
-import re 
-import pandas as pd
+import os
+from collections import namedtuple
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from datetime import datetime
+from urllib.parse import parse_qsl, urlencode, urljoin, urlsplit, urlunsplit
+from driver_pool import get_pool
+from browser_profiles import apply_lean_options, enable_request_blocking
+from page_cache import get_default_cache
+from sinks import CsvSink
+from rate_control import get_controller
+from readiness import PageNotReady, wait_until_ready
+from engine import BrowserAdapter, ScrapeError
+from extraction import extract_airbnb_page
+from metrics import metrics
+from pagination import parse_count
+from tiered import fetch_tiered
+from url_canon import Deduper, item_id
 
-def setup_driver():
-    """Set up and return a Chrome WebDriver with stealth options."""
+# Airbnb shows at most this many result pages for one search, however many listings match
+MAX_PAGES = 15
+
+# A map area as its south-west and north-east corners, as in the `sw_lat`... URL parameters
+BBox = namedtuple('BBox', ['sw_lat', 'sw_lng', 'ne_lat', 'ne_lng'])
+
+def setup_driver(headless=False, lean=True):
+    """
+    Set up and return a Chrome WebDriver with stealth options.
+    
+    With `lean`, images, fonts and trackers are blocked (see browser_profiles.py).
+    """
     options = webdriver.ChromeOptions()
+    if headless:
+        options.add_argument("--headless")
     options.add_argument("start-maximized")
     options.add_experimental_option("excludeSwitches", ["enable-automation"])
     options.add_experimental_option('useAutomationExtension', False)
+    if lean:
+        apply_lean_options(options, 'airbnb')
     
     driver = webdriver.Chrome(options=options)
+    if lean:
+        enable_request_blocking(driver, 'airbnb')
     
     # Stealth setup to avoid detection
     stealth(driver,
@@ -26,48 +55,290 @@ def setup_driver():
     
     return driver
 
-def extract_urls(base_url):
-    """Extract property URLs from the given Airbnb page."""
-    driver = setup_driver()
-    url_list = []
-    
+def get_driver_pool(headless=False, lean=True, **kwargs):
+    """Return the shared pool of Airbnb browsers (created on first use)."""
+    name = 'airbnb-headless' if headless else 'airbnb'
+    if not lean:
+        name += '-full'
+    return get_pool(name, lambda: setup_driver(headless, lean), **kwargs)
+
+def load_page(driver, url):
+    """
+    Load a search page and return its source, paced by Airbnb's rate
+    controller, which slows down when a page shows no listings (a block
+    page, or a search emptied by one).
+    """
+    controller = get_controller(url)
+    controller.acquire()
+    driver.get(url)
     try:
-        # Load the page
-        driver.get(base_url)
-        time.sleep(5)  # Wait for page to load completely
-        
-        # Fetch page source
-        html_content = driver.page_source
-        
-        # Define regex pattern for property URLs
-        url_pattern = 'labelledby="[^"]+" href="(\/rooms\/\d+[^"]+)"'
-        
-        # Find all matching URLs
-        urls = re.findall(url_pattern, html_content)
-        
-        # Create full URLs and store them
-        for url in urls:
-            full_url = "https://www.airbnb.com" + url
-            url_list.append({'url': full_url})
-        
-        print(f"Found {len(url_list)} URLs")
-        
-    except Exception as e:
-        print(f"An error occurred: {e}")
-        
-    finally:
-        driver.quit()
-        
-    return url_list
+        wait_until_ready(driver, 'airbnb')  # Returns once the listings have settled
+    except PageNotReady:
+        controller.on_response(503)
+        raise
+    controller.on_response(200)
+    return driver.page_source
+
+class AirbnbAdapter(BrowserAdapter):
+    """A single Airbnb search page, given by its URL instead of a query."""
+
+    platform = 'airbnb'
+    base_url = "https://www.airbnb.com"
+    page_limit = 1
+
+    def search_url(self, query, page):
+        return query
+
+    def render(self, url):
+        return load_page(self.driver, url)
+
+def bbox_from_url(url):
+    """The map area of a search URL (its ne_lat, ne_lng, sw_lat and sw_lng parameters), or None."""
+    params = dict(parse_qsl(urlsplit(url).query))
+    try:
+        return BBox(*(float(params[name]) for name in BBox._fields))
+    except (KeyError, ValueError):
+        return None
+
+def area_url(search_url, bbox=None, cursor=None):
+    """`search_url` limited to the map area `bbox` and moved to the result page of `cursor`."""
+    parts = urlsplit(search_url)
+    replaced = {*BBox._fields, 'cursor', 'items_offset', 'search_by_map', 'search_type'}
+    params = [(name, value) for name, value in parse_qsl(parts.query, keep_blank_values=True)
+              if name not in replaced]
+    if bbox is not None:
+        params += [(name, f'{value:.6f}') for name, value in zip(BBox._fields, bbox)]
+        params += [('search_by_map', 'true'), ('search_type', 'user_map_move')]
+    if cursor:
+        params.append(('cursor', cursor))
+    return urlunsplit(parts._replace(query=urlencode(params)))
+
+def split_bbox(bbox):
+    """The four quadrants of a map area."""
+    mid_lat = (bbox.sw_lat + bbox.ne_lat) / 2
+    mid_lng = (bbox.sw_lng + bbox.ne_lng) / 2
+    return [
+        BBox(bbox.sw_lat, bbox.sw_lng, mid_lat, mid_lng),
+        BBox(bbox.sw_lat, mid_lng, mid_lat, bbox.ne_lng),
+        BBox(mid_lat, bbox.sw_lng, bbox.ne_lat, mid_lng),
+        BBox(mid_lat, mid_lng, bbox.ne_lat, bbox.ne_lng),
+    ]
+
+def is_capped(links, page_size):
+    """
+    Whether page 1 of a search reports more listings than its result pages
+    can show ("Over 1,000 places", or a count above pages x page size).
+    """
+    if links.total_count and links.total_count.lower().startswith('over'):
+        return True
+    total = parse_count(links.total_count)
+    if total is not None:
+        return total > (links.last_page or MAX_PAGES) * max(page_size, 1)
+    return (links.last_page or 0) >= MAX_PAGES
+
+class AirbnbCrawler:
+    """
+    Crawls every listing of an Airbnb search, past the per-search result cap.
+
+    Page 1 of a search gives the cursors of all its result pages, which are
+    then fetched in parallel. When page 1 reports more listings than the
+    pages can show and the search has a map area (`bbox`, or the sw_lat...
+    parameters of the URL), the area is split into four tiles instead, each
+    searched the same way, down to `max_depth` splits or tiles of
+    `min_span` degrees. No more than `max_total_pages` pages are fetched in
+    all. Up to `workers` pages are fetched at once, over HTTP first and
+    with a browser from `pool` when that finds nothing (see tiered.py).
+    Listings are deduplicated by room ID across all tiles.
+    """
+
+    def __init__(self, pool=None, cache=None, http=True, workers=4, max_pages=MAX_PAGES, max_depth=8, min_span=0.002,
+                 max_total_pages=1000):
+        self.pool = pool
+        self.cache = cache
+        self.http = http
+        self.workers = workers
+        self.max_pages = max_pages
+        self.max_depth = max_depth
+        self.min_span = min_span
+        self.max_total_pages = max_total_pages
+        self.tiles = 0
+        self.pages = 0
+        self.failed_pages = 0
+        self.submitted = 0
+        # Pages not fetched because the crawl reached `max_total_pages`
+        self.skipped_pages = 0
+
+    def _render(self, url):
+        driver = self.pool.checkout()
+        try:
+            return load_page(driver, url)
+        finally:
+            self.pool.checkin(driver)
+
+    def _fetch(self, url, tile_url, page):
+        """Fetch and read one result page: (PageLinks, cursors, next cursor), or None."""
+        fetch = lambda: fetch_tiered('airbnb', url, lambda: self._render(url), http=self.http)[0]
+        if self.cache:
+            html = self.cache.get_or_render('airbnb', tile_url, page, fetch, urlsplit(url).netloc)[0]
+        else:
+            html = fetch()
+        return extract_airbnb_page(html) if html else None
+
+    def _can_split(self, bbox, depth):
+        if bbox is None:
+            print("The search has more listings than Airbnb shows; use a search URL with a map area "
+                  "(ne_lat, ne_lng, sw_lat, sw_lng) to crawl all of them")
+            return False
+        if depth >= self.max_depth or min(bbox.ne_lat - bbox.sw_lat, bbox.ne_lng - bbox.sw_lng) <= self.min_span:
+            print(f"Area {bbox} still has more listings than Airbnb shows, but is not split further")
+            return False
+        return True
+
+    def crawl(self, search_url, bbox=None, seen=None, page_callback=None, progress_callback=None,
+              cancel_event=None, delta=None):
+        """
+        Return the canonical URLs of every listing found. `page_callback(n, urls)`
+        receives the new URLs of each page as it is processed (n counts pages
+        across all tiles), `progress_callback(fraction)` the share of known
+        pages done, and setting `cancel_event` stops the crawl. With `delta`
+        (a url_index.DeltaRun), only listings new since earlier runs are
+        returned, and listings not seen are marked gone only when every
+        listing of the search was reached: no page failed and no page,
+        tile or area was left out by `max_pages`, `max_total_pages`,
+        `max_depth` or `min_span`.
+        """
+        bbox = bbox or bbox_from_url(search_url)
+        deduper = Deduper('airbnb', seen)
+        executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='airbnb-crawl')
+        pending = {}
+        urls = []
+        complete = True
+
+        def submit(area, depth, page, cursor=None, follow=False):
+            # `follow`: the page's own next cursor leads on, as page 1 listed no page cursors
+            nonlocal complete
+            if self.submitted >= self.max_total_pages:
+                self.skipped_pages += 1
+                complete = False
+                return
+            self.submitted += 1
+            tile_url = area_url(search_url, area)
+            future = executor.submit(self._fetch, area_url(search_url, area, cursor), tile_url, page)
+            pending[future] = (area, depth, page, follow)
+
+        submit(bbox, 0, 1)
+        try:
+            while pending:
+                if cancel_event is not None and cancel_event.is_set():
+                    print("Crawl cancelled.")
+                    complete = False
+                    break
+                done, _ = wait(list(pending), timeout=0.1, return_when=FIRST_COMPLETED)
+                for future in done:
+                    area, depth, page, follow = pending.pop(future)
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        result = None
+                        print(f"Airbnb page {page} of area {area} failed: {e}")
+                    if result is None:
+                        self.failed_pages += 1
+                        complete = False
+                        continue
+                    links, cursors, next_cursor = result
+
+                    page_urls = []
+                    for href in links.hrefs:
+                        url = deduper.add(urljoin(AirbnbAdapter.base_url, href))
+                        if url:
+                            page_urls.append(url)
+                    if delta is not None:
+                        page_urls = delta.observe(page_urls)
+                    urls.extend(page_urls)
+                    self.pages += 1
+                    metrics.count('pages', platform='airbnb')
+                    metrics.count('urls', len(page_urls), platform='airbnb')
+                    print(f"Scraping page {page} of {'area ' + str(area) if area else 'the search'}...")
+                    if page_callback:
+                        page_callback(self.pages, page_urls)
+
+                    if page == 1:
+                        self.tiles += 1
+                        # Listings on the page, including those already found in other areas
+                        page_size = len({item_id('airbnb', href) for href in links.hrefs})
+                        capped = is_capped(links, page_size)
+                        if capped and self._can_split(area, depth):
+                            for tile in split_bbox(area):
+                                submit(tile, depth + 1, 1)
+                        else:
+                            # Listings past the pages Airbnb shows, or past `max_pages`, are not reached
+                            if capped or len(cursors) > self.max_pages or (next_cursor and self.max_pages == 1):
+                                complete = False
+                            if len(cursors) > 1:
+                                for number, cursor in enumerate(cursors[1:self.max_pages], start=2):
+                                    submit(area, depth, number, cursor)
+                            elif next_cursor and self.max_pages > 1:
+                                submit(area, depth, 2, next_cursor, follow=True)
+                    elif follow and next_cursor and links.hrefs:
+                        if page < self.max_pages:
+                            submit(area, depth, page + 1, next_cursor, follow=True)
+                        else:
+                            complete = False
+                    if progress_callback:
+                        progress_callback(self.pages / (self.pages + len(pending)))
+        finally:
+            for future in pending:
+                future.cancel()
+            executor.shutdown(wait=False)
+            if delta is not None:
+                delta.finish(complete)
+        return urls
+
+def extract_urls(base_url, pool=None, seen=None, cache=None, page_callback=None, http=True, progress_callback=None,
+                 index=None, cancel_event=None, workers=4, max_pages=MAX_PAGES, bbox=None, strict=False,
+                 max_total_pages=1000):
+    """
+    Extract property URLs from an Airbnb search URL, one per room ID.
+
+    Every result page of the search is crawled, and a search that matches
+    more listings than Airbnb shows is split into map tiles (see
+    AirbnbCrawler); `workers` pages are fetched at once, `max_pages`
+    bounds the pages per tile and `max_total_pages` those of the crawl.
+    Pages are first fetched over plain HTTP and read from their links and
+    embedded JSON state; a browser is only used when that finds nothing
+    (pass http=False to always use the browser).
+    Page sources are served from `cache` (default: the shared page cache;
+    pass False to disable it) when a recent copy exists.
+    `page_callback(n, urls)` receives each page's URLs as soon as it has
+    been processed. With a url_index.UrlIndex as `index`, only listings new
+    since earlier runs for the same URL are returned. With `strict`, a crawl
+    in which some page could not be fetched raises engine.ScrapeError.
+    """
+    pool = pool or get_driver_pool()
+    cache = get_default_cache() if cache is None else cache
+    delta = index.start_run('airbnb', base_url) if index is not None else None
+    crawler = AirbnbCrawler(pool, cache, http, workers, max_pages, max_total_pages=max_total_pages)
+    urls = crawler.crawl(base_url, bbox, seen=seen, page_callback=page_callback,
+                         progress_callback=progress_callback, cancel_event=cancel_event, delta=delta)
+    if progress_callback:
+        progress_callback(1.0)
+    print(f"Found {len(urls)} URLs in {crawler.pages} pages of {crawler.tiles} map areas")
+    if crawler.skipped_pages:
+        print(f"{crawler.skipped_pages} more pages were not fetched, over the limit of {max_total_pages} pages")
+    if strict and crawler.failed_pages:
+        raise ScrapeError(f"airbnb crawl of {base_url!r} failed: {crawler.failed_pages} pages could not be fetched",
+                          urls)
+    return [{'url': url} for url in urls]
+
+def default_filename():
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    return f"airbnb_urls_{timestamp}.csv"
 
 def save_to_csv(urls, filename=None):
     """Save the extracted URLs to a CSV file."""
-    if filename is None:
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        filename = f"airbnb_urls_{timestamp}.csv"
-    
-    df = pd.DataFrame(urls)
-    df.to_csv(filename, index=False)
+    filename = filename or default_filename()
+    with CsvSink(filename, ['url']) as sink:
+        sink.write_many(urls)
     print(f"Saved {len(urls)} URLs to {filename}")
 
 def main():
@@ -75,11 +346,15 @@ def main():
     base_url = input("Enter the Airbnb search URL: ")
     
     print("Starting URL extraction...")
-    urls = extract_urls(base_url)
+    filename = default_filename()
+    # Rows are written to the CSV as soon as they are extracted
+    with CsvSink(filename, ['url']) as sink:
+        urls = extract_urls(base_url, page_callback=lambda page, found: sink.write_many({'url': url} for url in found))
     
     if urls:
-        save_to_csv(urls)
+        print(f"Saved {len(urls)} URLs to {filename}")
     else:
+        os.remove(filename)
         print("No URLs found.")
 
 if __name__ == "__main__":
@@ -1,88 +1,118 @@
 from selenium import webdriver
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.chrome.options import Options
-from bs4 import BeautifulSoup
-import pandas as pd
-import time
-import random
+import os
+from driver_pool import get_pool
+from browser_profiles import apply_lean_options, enable_request_blocking
+from page_cache import get_default_cache
+from sinks import CsvSink
+from rate_control import get_controller
+from readiness import PageNotReady, wait_until_ready
+from engine import BrowserAdapter, ScrapeEngine
 
-def setup_driver():
-    """Set up and return a Chrome WebDriver with appropriate options."""
+def setup_driver(lean=True):
+    """
+    Set up and return a Chrome WebDriver with appropriate options.
+    
+    With `lean`, images, fonts, stylesheets and trackers are blocked (see browser_profiles.py).
+    """
     chrome_options = Options()
     chrome_options.add_argument("--headless")  # Run in headless mode
     chrome_options.add_argument("--disable-gpu")
     chrome_options.add_argument("--no-sandbox")
     chrome_options.add_argument("--disable-dev-shm-usage")
     chrome_options.add_argument("user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36")
+    if lean:
+        apply_lean_options(chrome_options, 'amazon')
     
-    return webdriver.Chrome(options=chrome_options)
+    driver = webdriver.Chrome(options=chrome_options)
+    if lean:
+        enable_request_blocking(driver, 'amazon')
+    return driver
+
+def get_driver_pool(lean=True, **kwargs):
+    """Return the shared pool of Amazon browsers (created on first use)."""
+    name = 'amazon' if lean else 'amazon-full'
+    return get_pool(name, lambda: setup_driver(lean), **kwargs)
+
+def load_page(driver, url):
+    """
+    Load a search page and return its source once the results are present.
 
-def extract_product_urls(search_term, num_pages=1):
+    Page loads are paced by Amazon's rate controller (see rate_control.py),
+    which slows down when a CAPTCHA page comes back instead of results.
+    """
+    controller = get_controller(url)
+    controller.acquire()
+    driver.get(url)
+    
+    # Wait until the result cards are present and have stopped changing
+    try:
+        wait_until_ready(driver, 'amazon')
+    except PageNotReady:
+        if 'captcha' in driver.page_source.lower():
+            controller.on_response(503)
+        raise
+    controller.on_response(200)
+    return driver.page_source
+
+class AmazonAdapter(BrowserAdapter):
+    """Amazon search pages; every requested page is loaded, even after an empty one."""
+
+    platform = 'amazon'
+    base_url = "https://www.amazon.com"
+    # Amazon shows at most 20 result pages
+    page_limit = 20
+
+    def search_url(self, query, page):
+        # Format the Amazon search URL
+        return f"{self.base_url}/s?k={query.replace(' ', '+')}&page={page}"
+
+    def render(self, url):
+        return load_page(self.driver, url)
+
+    def should_continue(self, page, links, new_urls):
+        return True
+
+    def plan_pages(self, html):
+        # Every requested page is loaded, up to the page limit
+        return self.page_limit
+
+def extract_product_urls(search_term, num_pages=1, pool=None, seen=None, cache=None,
+                         page_callback=None, cancel_event=None, http=True, progress_callback=None, index=None,
+                         strict=False):
     """
     Extract product URLs from Amazon search results.
     
     Args:
         search_term (str): The search term to look for on Amazon
         num_pages (int): Number of pages to scrape (default: 1)
+        pool (DriverPool): Pool to borrow the browser from (default: the shared Amazon pool)
+        seen (SeenSet or BloomFilter): Keys of products to skip, e.g. from earlier runs
+        cache (PageCache): Cache for page sources (default: the shared page cache; False disables it)
+        page_callback (callable): Called as page_callback(page, urls) with each page's new URLs
+        cancel_event (threading.Event): Stops the search after the current page once set
+        http (bool): Try a plain HTTP fetch before the browser (see tiered.py)
+        progress_callback (callable): Called with the fraction of pages done after each page
+        index (UrlIndex): Only return products new since earlier runs of the search (see url_index.py)
+        strict (bool): Raise engine.ScrapeError when a page fails instead of returning the products found so far
     
     Returns:
-        list: List of dictionaries containing product URLs and titles
+        list: List of dictionaries containing canonical `/dp/<ASIN>` product URLs
     """
-    driver = setup_driver()
-    products = []
-    
-    try:
-        for page in range(1, num_pages + 1):
-            # Format the Amazon search URL
-            url = f"https://www.amazon.com/s?k={search_term.replace(' ', '+')}&page={page}"
-            
-            # Load the page
-            driver.get(url)
-            
-            # Wait for the products to load
-            WebDriverWait(driver, 10).until(
-                EC.presence_of_element_located((By.CSS_SELECTOR, "div.s-result-item"))
-            )
-            
-            # Parse the page with BeautifulSoup
-            soup = BeautifulSoup(driver.page_source, 'html.parser')
-            
-            # Find all product containers
-            product_cards = soup.find_all("div", {"data-component-type": "s-search-result"})
-            
-            for card in product_cards:
-                try:
-                    # Extract product URL and title
-                    product_link = card.find("a", {"class": "a-link-normal s-no-outline"})
-                    if product_link:
-                        url = "https://www.amazon.com" + product_link.get('href')
-                        title = card.find("span", {"class": "a-text-normal"})
-                        title_text = title.text.strip() if title else "No title found"
-                        
-                        products.append({
-                            # 'title': title_text,
-                            'url': url
-                        })
-                except Exception as e:
-                    print(f"Error extracting product: {e}")
-            
-            # Add a random delay between pages to avoid being blocked
-            time.sleep(random.uniform(2, 4))
-    
-    except Exception as e:
-        print(f"An error occurred: {e}")
-    
-    finally:
-        driver.quit()
-    
-    return products
+    pool = pool or get_driver_pool()
+    cache = get_default_cache() if cache is None else cache
+    # Pages are fetched, parsed and collected as a pipeline (see engine.py)
+    adapter = AmazonAdapter(pool, cache, http)
+    delta = index.start_run('amazon', search_term) if index is not None else None
+    urls = ScrapeEngine(adapter).run(search_term, num_pages, seen=seen, page_callback=page_callback,
+                                     progress_callback=progress_callback, cancel_event=cancel_event, delta=delta,
+                                     strict=strict)
+    return [{'url': url} for url in urls]
 
 def save_to_csv(products, filename='amazon_products.csv'):
     """Save the extracted products to a CSV file."""
-    df = pd.DataFrame(products)
-    df.to_csv(filename, index=False)
+    with CsvSink(filename, ['url']) as sink:
+        sink.write_many(products)
     print(f"Saved {len(products)} products to {filename}")
 
 def main():
@@ -91,11 +121,18 @@ def main():
     num_pages = int(input("Enter the number of pages to scrape (default 1): ") or "1")
     
     print(f"Searching for '{search_term}' on Amazon...")
-    products = extract_product_urls(search_term, num_pages)
+    filename = 'amazon_products.csv'
+    # Rows are written to the CSV page by page as they are extracted
+    with CsvSink(filename, ['url']) as sink:
+        products = extract_product_urls(
+            search_term, num_pages,
+            page_callback=lambda page, urls: sink.write_many({'url': url} for url in urls),
+        )
     
     if products:
-        save_to_csv(products)
+        print(f"Saved {len(products)} products to {filename}")
     else:
+        os.remove(filename)
         print("No products found.")
 
 if __name__ == "__main__":
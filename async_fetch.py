@@ -0,0 +1,140 @@
+import asyncio
+import queue
+import threading
+from urllib.parse import urlsplit
+import requests
+from extraction import extract_links
+from http_client import get_session
+from metrics import metrics
+from rate_control import ThrottledSession
+from streaming import StreamedPage, StreamingSession
+
+class AsyncFetcher:
+    """
+    Fetch the result pages of a query concurrently.
+
+    Requests are issued from an asyncio event loop (the blocking `requests`
+    calls run on the loop's thread pool), with at most `per_host_limit`
+    requests in flight per host. Responses are returned in the same order
+    as the URLs that were passed in.
+
+    With a `cache` (see page_cache.PageCache), pages that come with a
+    (platform, query, page) cache key are served from and stored in it.
+    Network requests are paced by the per-host rate controllers in
+    rate_control.py unless `throttle` is False. Without a `session`, the
+    process-wide keep-alive client from http_client.py is used.
+
+    With `stream` set to a platform id, pages are parsed as they download
+    and cut after their results (see streaming.py); `on_href(url, href)`
+    then receives each result link as soon as it is parsed. Pages served
+    from the cache are not downloaded, so their links are passed to
+    `on_href` all at once when the cached page is read.
+    """
+
+    def __init__(self, session=None, headers=None, per_host_limit=4, timeout=30, cache=None, throttle=True,
+                 stream=None, on_href=None):
+        self.session = session or get_session()
+        self.headers = headers or {}
+        self.per_host_limit = per_host_limit
+        self.timeout = timeout
+        self.cache = cache
+        self.stream = stream
+        self.on_href = on_href if stream else None
+        self.client = ThrottledSession(self.session) if throttle else self.session
+        if stream:
+            self.client = StreamingSession(self.client, stream, on_href)
+
+    def _get(self, url, cache_key=None):
+        host = urlsplit(url).netloc
+        platform, _, page = cache_key or (None, None, None)
+        with metrics.span('fetch', platform=platform, host=host, page=page):
+            if self.cache is not None and cache_key is not None:
+                response = self.cache.fetch(self.client, url, *cache_key, headers=self.headers, timeout=self.timeout)
+            else:
+                response = self.client.get(url, headers=self.headers, timeout=self.timeout)
+        if getattr(response, 'from_cache', False):
+            metrics.count('cache_hits', platform=platform, host=host)
+            if self.on_href is not None:
+                self._replay_links(url, response)
+        else:
+            metrics.count('bytes_downloaded', len(response.content), platform=platform, host=host)
+        return response
+
+    def _replay_links(self, url, response):
+        # A cached page bypasses the StreamingSession: parse it here, once, and report its links
+        links = getattr(response.text, 'links', None) or extract_links(self.stream, response.text)
+        response.text = StreamedPage(response.text, links)
+        for href in links.hrefs:
+            self.on_href(url, href)
+
+    async def fetch(self, url, semaphore, cache_key=None):
+        """Fetch a single URL, returning None if the request failed."""
+        async with semaphore:
+            loop = asyncio.get_running_loop()
+            try:
+                return await loop.run_in_executor(None, self._get, url, cache_key)
+            except requests.RequestException as e:
+                print(f"Failed to fetch {url}: {e}")
+                return None
+
+    async def fetch_all(self, urls, cache_keys=None):
+        """Fetch all URLs concurrently and return the responses in URL order."""
+        cache_keys = cache_keys or [None] * len(urls)
+        # Semaphores are created per batch so they always belong to the running loop
+        semaphores = {}
+        tasks = []
+        for url, cache_key in zip(urls, cache_keys):
+            host = urlsplit(url).netloc
+            if host not in semaphores:
+                semaphores[host] = asyncio.Semaphore(self.per_host_limit)
+            tasks.append(self.fetch(url, semaphores[host], cache_key))
+        return await asyncio.gather(*tasks)
+
+    def fetch_pages(self, urls, cache_keys=None):
+        """Blocking wrapper around fetch_all() for synchronous callers."""
+        return asyncio.run(self.fetch_all(urls, cache_keys))
+
+    def iter_pages(self, urls, cache_keys=None):
+        """
+        Yield responses in URL order, each as soon as it and every response
+        before it have arrived. Closing the generator early (e.g. `break`)
+        cancels the requests that have not started yet.
+        """
+        cache_keys = cache_keys or [None] * len(urls)
+        arrived = queue.Queue()
+        state = {}
+
+        async def fetch_into_queue(index, url, semaphore, cache_key):
+            response = None
+            try:
+                response = await self.fetch(url, semaphore, cache_key)
+            finally:
+                # Always report the page, or the consumer would wait for it forever
+                arrived.put((index, response))
+
+        async def run():
+            state['loop'] = asyncio.get_running_loop()
+            semaphores = {}
+            tasks = []
+            for index, (url, cache_key) in enumerate(zip(urls, cache_keys)):
+                host = urlsplit(url).netloc
+                if host not in semaphores:
+                    semaphores[host] = asyncio.Semaphore(self.per_host_limit)
+                tasks.append(asyncio.ensure_future(fetch_into_queue(index, url, semaphores[host], cache_key)))
+            state['tasks'] = tasks
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+        thread = threading.Thread(target=asyncio.run, args=(run(),), daemon=True)
+        thread.start()
+        pending = {}
+        try:
+            for index in range(len(urls)):
+                while index not in pending:
+                    arrived_index, response = arrived.get()
+                    pending[arrived_index] = response
+                yield pending.pop(index)
+        finally:
+            loop = state.get('loop')
+            if loop is not None and thread.is_alive():
+                for task in state.get('tasks', []):
+                    loop.call_soon_threadsafe(task.cancel)
@@ -0,0 +1,261 @@
+"""
+Run many search queries across platforms with bounded concurrency.
+
+Queries are read one per line from a file (or stdin with "-"). Every
+finished (platform, query) pair is appended to a checkpoint file, so an
+interrupted run picks up where it stopped when started again with the same
+--state file.
+
+    python batch.py queries.txt --platforms Amazon,eBay,Walmart --concurrency 4
+
+A Parquet file can only be read once it has been closed, so with .parquet
+output tasks are checkpointed when the run ends (Ctrl+C included); a run
+that is killed leaves an unreadable part file and repeats all its tasks.
+
+With --parse-workers N, result pages are read whole and parsed in N worker
+processes so parsing is not limited to one core.
+
+With --delta, a URL index (see url_index.py) remembers what earlier runs
+found: only new URLs are written (change "new") and pagination stops at the
+first page without new URLs. Add --gone to crawl every page instead, so
+that URLs that disappeared are written with change "gone"; a URL is only
+known to be gone after a run that reached the last page of the results.
+
+With --dedupe, a URL found by several queries is only written for the
+first one on each platform. The URLs written so far are kept in a compact
+ResultStore (see result_store.py), about 40 bytes per URL, so this works
+for catalogs of millions of results; it covers the URLs of the current
+run, not those written before a resume.
+"""
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import parse_pool
+from metrics import metrics
+from engine import ScrapeError
+from fanout import DEFAULT_TIMEOUTS, QUERY_PLATFORMS, run_platform
+from result_store import ResultStore
+from sinks import open_sink
+from url_index import DEFAULT_INDEX_PATH, UrlIndex
+
+class Checkpoint:
+    """Append-only record of finished (platform, query) tasks."""
+
+    def __init__(self, path):
+        self.path = path
+        self.done = set()
+        if os.path.exists(path):
+            with open(path, encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        continue  # a torn last line from an interrupted write
+                    self.done.add((record['platform'], record['query']))
+        self._file = open(path, 'a', encoding='utf-8')
+
+    def mark_done(self, platform, query, url_count):
+        record = {'platform': platform, 'query': query, 'urls': url_count, 'finished_at': time.time()}
+        self._file.write(json.dumps(record) + '\n')
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self.done.add((platform, query))
+
+    def close(self):
+        self._file.close()
+
+class ThroughputMeter:
+    """Tracks finished queries and URLs and prints rates every `interval` seconds."""
+
+    def __init__(self, total, interval=10):
+        self.total = total
+        self.interval = interval
+        self.queries = 0
+        self.urls = 0
+        self.start = time.monotonic()
+        self._last_report = self.start
+
+    def add(self, url_count):
+        self.queries += 1
+        self.urls += url_count
+        if time.monotonic() - self._last_report >= self.interval:
+            self.report()
+
+    def report(self):
+        self._last_report = time.monotonic()
+        minutes = max(self._last_report - self.start, 1e-9) / 60
+        print(f"[{self.queries}/{self.total}] {self.queries / minutes:.1f} queries/min, "
+              f"{self.urls / minutes:.0f} URLs/min, {self.urls} URLs total")
+
+def read_queries(source):
+    stream = sys.stdin if source == '-' else open(source, encoding='utf-8')
+    try:
+        return [line.strip() for line in stream if line.strip() and not line.startswith('#')]
+    finally:
+        if stream is not sys.stdin:
+            stream.close()
+
+def run_batch(queries, platforms, output, state, concurrency=4, num_pages=5, report_interval=10, index=None,
+              dedupe=False):
+    """
+    Run every (platform, query) pair not yet in the checkpoint, appending URLs
+    to `output`. With a UrlIndex as `index`, each task is a delta crawl. With
+    `dedupe`, URLs already written for another query of the same platform
+    are skipped.
+    Tasks that fail, or are cut short by an interrupt, are not checkpointed,
+    so the next run retries them.
+    """
+    checkpoint = Checkpoint(state)
+    tasks = [(platform, query) for query in queries for platform in platforms
+             if (platform, query) not in checkpoint.done]
+    skipped = len(queries) * len(platforms) - len(tasks)
+    if skipped:
+        print(f"Resuming: {skipped} tasks already done, {len(tasks)} remaining")
+
+    if output.endswith('.parquet') and os.path.exists(output):
+        # Parquet files cannot be appended to, so a resumed run writes a new part file
+        stem, part = output[:-len('.parquet')], 1
+        while os.path.exists(f"{stem}.part{part}.parquet"):
+            part += 1
+        output = f"{stem}.part{part}.parquet"
+        print(f"Writing this run's results to {output}")
+    fieldnames = ['platform', 'query', 'url'] + (['change'] if index is not None else [])
+    sink = open_sink(output, fieldnames, append=True)
+
+    meter = ThroughputMeter(len(tasks), report_interval)
+    cancel_event = threading.Event()
+    executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='batch')
+    task_iter = iter(tasks)
+    in_flight = {}
+    # Tasks whose rows are only safe once the sink is closed (see ResultSink.durable)
+    unsaved = []
+    written = ResultStore(dedupe=True) if dedupe else None
+
+    def unwritten(platform, query, urls):
+        if written is None:
+            return urls
+        return [url for url in urls if written.append(platform, query, url)]
+
+    def write_partial(platform, query, urls):
+        # A delta crawl's index already counts these URLs as seen, so a retry would not return them as new
+        if index is not None:
+            urls = unwritten(platform, query, urls)
+            sink.write_many({'platform': platform, 'query': query, 'url': url, 'change': 'new'} for url in urls)
+
+    def submit_next():
+        task = next(task_iter, None)
+        if task is not None:
+            future = executor.submit(run_platform, task[0], task[1], num_pages, cancel_event=cancel_event, index=index,
+                                     strict=True)
+            in_flight[future] = task
+
+    try:
+        # Keep at most `concurrency` tasks queued so huge catalogs are not submitted up front
+        for _ in range(concurrency):
+            submit_next()
+        while in_flight:
+            done, _ = wait(list(in_flight), return_when=FIRST_COMPLETED)
+            for future in done:
+                platform, query = in_flight.pop(future)
+                try:
+                    urls = future.result()
+                except ScrapeError as e:
+                    print(f"{e}; it is retried on the next run")
+                    write_partial(platform, query, e.urls)
+                    submit_next()
+                    continue
+                except Exception as e:
+                    print(f"{platform} '{query}' failed: {e}")
+                    submit_next()
+                    continue
+                # Results are written before the task is checkpointed, so a crash never loses URLs. A
+                # Parquet file is unreadable until it is closed, so its tasks are checkpointed after that
+                urls = unwritten(platform, query, urls)
+                if index is not None:
+                    gone = index.changes(platform, query)['gone']
+                    sink.write_many({'platform': platform, 'query': query, 'url': url, 'change': 'new'} for url in urls)
+                    sink.write_many({'platform': platform, 'query': query, 'url': url, 'change': 'gone'} for url in gone)
+                else:
+                    sink.write_many({'platform': platform, 'query': query, 'url': url} for url in urls)
+                if sink.durable:
+                    checkpoint.mark_done(platform, query, len(urls))
+                else:
+                    unsaved.append((platform, query, len(urls)))
+                meter.add(len(urls))
+                submit_next()
+    except KeyboardInterrupt:
+        print("\nInterrupted: finishing the current pages, progress is saved in the checkpoint")
+        cancel_event.set()
+        # The running tasks stop after their current page. Their URLs are kept, though the tasks are
+        # partial and so not checkpointed
+        for future in wait(list(in_flight)).done:
+            platform, query = in_flight.pop(future)
+            try:
+                write_partial(platform, query, future.result())
+            except ScrapeError as e:
+                write_partial(platform, query, e.urls)
+            except Exception as e:
+                print(f"{platform} '{query}' failed: {e}")
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
+        sink.close()
+        for task in unsaved:
+            checkpoint.mark_done(*task)
+        checkpoint.close()
+        meter.report()
+    return meter
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('queries', help='file with one search query per line, or - for stdin')
+    parser.add_argument('--platforms', default=','.join(QUERY_PLATFORMS),
+                        help='comma-separated platforms (default: %(default)s)')
+    parser.add_argument('--concurrency', type=int, default=4, help='queries running at once (default: %(default)s)')
+    parser.add_argument('--num-pages', type=int, default=5, help='result pages per query (default: %(default)s)')
+    parser.add_argument('--output', default='batch_results.csv',
+                        help='file results are appended to; .csv, .jsonl or .parquet (default: %(default)s)')
+    parser.add_argument('--state', default='batch_state.jsonl', help='checkpoint file used to resume')
+    parser.add_argument('--report-interval', type=float, default=10, help='seconds between throughput reports')
+    parser.add_argument('--parse-workers', type=int, default=0,
+                        help='processes that parse result pages (default: parse in-process)')
+    parser.add_argument('--delta', action='store_true', help='only write URLs that changed since earlier runs')
+    parser.add_argument('--index', default=DEFAULT_INDEX_PATH, help='URL index used by --delta (default: %(default)s)')
+    parser.add_argument('--gone', action='store_true',
+                        help='with --delta, crawl every page so URLs that disappeared are written as "gone"')
+    parser.add_argument('--dedupe', action='store_true',
+                        help='write a URL only for the first query that finds it on a platform')
+    parser.add_argument('--trace', help='write a JSON trace of every stage to this file at the end')
+    parser.add_argument('--prometheus', help='write stage timings and counters in Prometheus text format to this file')
+    args = parser.parse_args()
+
+    queries = read_queries(args.queries)
+    known = {platform.lower(): platform for platform in DEFAULT_TIMEOUTS}
+    platforms = []
+    for name in args.platforms.split(','):
+        if name.strip().lower() not in known:
+            parser.error(f"unknown platform {name.strip()!r} (choose from {', '.join(known.values())})")
+        platforms.append(known[name.strip().lower()])
+    if args.parse_workers:
+        parse_pool.configure(args.parse_workers)
+    print(f"Running {len(queries)} queries on {', '.join(platforms)} with concurrency {args.concurrency}")
+    try:
+        index = UrlIndex(args.index, stop_early=not args.gone) if args.delta else None
+        run_batch(queries, platforms, args.output, args.state, args.concurrency, args.num_pages,
+                  args.report_interval, index, args.dedupe)
+    finally:
+        if args.trace:
+            metrics.write_trace(args.trace)
+            print(f"Trace saved to {args.trace}")
+        if args.prometheus:
+            with open(args.prometheus, 'w', encoding='utf-8') as f:
+                f.write(metrics.to_prometheus())
+            print(f"Metrics saved to {args.prometheus}")
+    print(f"Results saved to {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,176 @@
+"""
+Measure how much of a city an Airbnb crawl covers, and how fast.
+
+A local server stands in for Airbnb's map search over a generated city of
+`--listings` rooms, most of them in a few dense neighbourhoods. Like
+Airbnb, a search shows 18 listings per page and at most 15 pages, with
+the page cursors in its embedded JSON state, and reports "Over 1,000
+places" above 1,000 matches. Every response takes `--latency` seconds.
+
+Compared are one page of the search (what airbnb.extract_urls used to
+return), following the page cursors of the whole-city search, and the map
+tile crawl (airbnb.AirbnbCrawler) with the given numbers of workers:
+
+    python benchmarks/bench_airbnb_crawl.py --listings 5000 --workers 1,4,8
+"""
+import argparse
+import base64
+import contextlib
+import io
+import json
+import os
+import random
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import rate_control
+from airbnb import AirbnbCrawler, BBox, area_url
+from make_fixtures import page_shell
+
+CITY = BBox(38.69, -9.23, 38.80, -9.09)
+PAGE_SIZE = 18
+MAX_PAGES = 15
+
+
+def make_city(count, seed=20240101):
+    """(room id, lat, lng) of `count` rooms: 70% around five centres, the rest spread evenly."""
+    rng = random.Random(seed)
+    centres = [(rng.uniform(CITY.sw_lat, CITY.ne_lat), rng.uniform(CITY.sw_lng, CITY.ne_lng)) for _ in range(5)]
+    rooms = []
+    for i in range(count):
+        if i % 10 < 7:
+            lat, lng = rng.choice(centres)
+            lat = min(max(rng.gauss(lat, 0.006), CITY.sw_lat), CITY.ne_lat)
+            lng = min(max(rng.gauss(lng, 0.008), CITY.sw_lng), CITY.ne_lng)
+        else:
+            lat, lng = rng.uniform(CITY.sw_lat, CITY.ne_lat), rng.uniform(CITY.sw_lng, CITY.ne_lng)
+        rooms.append((40000000 + i, lat, lng))
+    # Search results come back in a fixed ranking, not in map order
+    rng.shuffle(rooms)
+    return rooms
+
+
+def cursor(offset):
+    return base64.b64encode(json.dumps({'section_offset': 0, 'items_offset': offset, 'version': 1}).encode()).decode()
+
+
+def search_page(rooms, offset):
+    """An Airbnb-like result page of `rooms` (all matches of a search) starting at `offset`."""
+    shown = rooms[offset:offset + PAGE_SIZE]
+    cards = ''.join(
+        f'<div itemprop="itemListElement"><a target="listing_{room_id}" aria-labelledby="title_{room_id}" '
+        f'href="/rooms/{room_id}?adults=2&amp;search_mode=regular_search">'
+        f'<div id="title_{room_id}">Room {room_id}</div></a></div>'
+        for room_id, _, _ in shown
+    )
+    pages = min(-(-len(rooms) // PAGE_SIZE), MAX_PAGES)
+    offsets = [page * PAGE_SIZE for page in range(pages)]
+    state = {'staysSearch': {'results': {
+        'searchResults': [{'__typename': 'StaySearchResult', 'listingId': str(room_id)} for room_id, _, _ in shown],
+        'paginationInfo': {
+            'pageCursors': [cursor(o) for o in offsets],
+            'nextPageCursor': cursor(offset + PAGE_SIZE) if offset + PAGE_SIZE in offsets else None,
+        },
+    }}}
+    heading = 'Over 1,000 places' if len(rooms) > 1000 else f'{len(rooms):,} places'
+    body = (f'<h1><span>{heading}</span></h1><div class="gsgwcjk">{cards}</div>'
+            f'<script id="data-deferred-state-0" type="application/json">{json.dumps(state)}</script>')
+    return page_shell('Airbnb | Lisbon', body, random.Random(offset), 20).encode()
+
+
+class CityServer:
+    """Airbnb-style map search over `rooms`, on 127.0.0.1 in a background thread."""
+
+    def __init__(self, rooms, latency):
+        self.rooms = rooms
+        self.latency = latency
+        self.requests = 0
+        self._lock = threading.Lock()
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_GET(self):
+                with server._lock:
+                    server.requests += 1
+                time.sleep(server.latency)
+                params = {name: values[0] for name, values in parse_qs(urlsplit(self.path).query).items()}
+                area = BBox(*(float(params.get(name, default)) for name, default in zip(BBox._fields, CITY)))
+                # Inclusive on every side, as a map viewport is
+                matches = [room for room in server.rooms
+                           if area.sw_lat <= room[1] <= area.ne_lat and area.sw_lng <= room[2] <= area.ne_lng]
+                offset = json.loads(base64.b64decode(params['cursor']))['items_offset'] if 'cursor' in params else 0
+                body = search_page(matches, offset)
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/html; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self._server.daemon_threads = True
+
+    @property
+    def base_url(self):
+        return f'http://127.0.0.1:{self._server.server_address[1]}'
+
+    def __enter__(self):
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+class NoBrowserPool:
+    """Driver pool stand-in: every page must be served by the HTTP fast path."""
+
+    def checkout(self, timeout=None):
+        raise RuntimeError("the benchmark runs without a browser")
+
+    def checkin(self, driver):
+        pass
+
+
+def crawl(url, workers, max_pages=MAX_PAGES):
+    crawler = AirbnbCrawler(NoBrowserPool(), None, workers=workers, max_pages=max_pages)
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        urls = crawler.crawl(url)
+    return time.perf_counter() - start, len(urls), crawler.pages, crawler.tiles
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--listings', type=int, default=5000, help='rooms in the generated city')
+    parser.add_argument('--latency', type=float, default=0.2, help='seconds per response')
+    parser.add_argument('--workers', default='1,4,8', help='comma-separated worker counts for the tile crawl')
+    parser.add_argument('--rate', type=float, default=50, help='client requests/s allowed by the rate controller')
+    args = parser.parse_args()
+
+    rooms = make_city(args.listings)
+    with CityServer(rooms, args.latency) as server:
+        rate_control.configure(rate=args.rate, max_rate=args.rate, burst=max(4, int(args.rate)))
+        search = f'{server.base_url}/s/Lisbon/homes?adults=2'
+        print(f"{len(rooms)} listings, {args.latency * 1000:.0f} ms per response")
+        print(f"{'':26}{'time s':>8}{'listings':>10}{'coverage':>10}{'pages':>7}{'areas':>7}")
+        runs = [('one page', search, 1, 1), ('page cursors', search, 4, MAX_PAGES)]
+        runs += [(f'map tiles, {n} workers', area_url(search, CITY), n, MAX_PAGES)
+                 for n in (int(n) for n in args.workers.split(','))]
+        for name, url, workers, max_pages in runs:
+            elapsed, found, pages, tiles = crawl(url, workers, max_pages)
+            print(f"{name:26}{elapsed:8.2f}{found:10}{found / len(rooms):10.1%}{pages:7}{tiles:7}")
+
+
+if __name__ == '__main__':
+    main()
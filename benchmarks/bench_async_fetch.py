@@ -0,0 +1,106 @@
+"""
+Compare the old serial page loop with the concurrent AsyncFetcher.
+
+A local mock server answers eBay-style search URLs after a fixed latency,
+so the benchmark runs offline:
+
+    python benchmarks/bench_async_fetch.py --pages 5 --latency 0.5 --delay 2
+"""
+import argparse
+import os
+import random
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from async_fetch import AsyncFetcher
+from rate_control import current_rates, get_controller
+from ebay import EbayScraper
+
+ITEMS_PER_PAGE = 50
+
+
+def make_handler(latency, total_pages):
+    class MockEbayHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            time.sleep(latency)
+            params = parse_qs(urlsplit(self.path).query)
+            page = int(params.get('_pgn', ['1'])[0])
+            items = ''.join(
+                f'<div class="s-item__wrapper"><a class="s-item__link" '
+                f'href="http://{self.headers["Host"]}/itm/{page * 1000 + i}?hash=x">item</a></div>'
+                for i in range(ITEMS_PER_PAGE)
+            )
+            next_link = '<a class="pagination__next" aria-label="Next page" href="#">Next</a>' if page < total_pages else ''
+            body = f'<html><body>{items}{next_link}</body></html>'.encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/html')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    return MockEbayHandler
+
+
+def serial_fetch(session, urls, delay):
+    """The pre-AsyncFetcher loop: one blocking request, then a random sleep."""
+    responses = []
+    for i, url in enumerate(urls):
+        responses.append(session.get(url))
+        if i < len(urls) - 1:
+            time.sleep(random.uniform(delay / 2, delay))
+    return responses
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--pages', type=int, default=5, help='number of result pages per query')
+    parser.add_argument('--latency', type=float, default=0.5, help='mock server latency per page (s)')
+    parser.add_argument('--delay', type=float, default=2.0, help='upper bound of the serial loop sleep (s)')
+    parser.add_argument('--per-host-limit', type=int, default=4, help='AsyncFetcher in-flight limit')
+    parser.add_argument('--rate', type=float, default=1.0, help='starting requests/s of the mock host rate controller')
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), make_handler(args.latency, args.pages))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f'http://127.0.0.1:{server.server_address[1]}'
+    get_controller(base_url, rate=args.rate)
+
+    scraper = EbayScraper()
+    scraper.base_url = base_url
+    scraper.cache = None
+    urls = [scraper.build_search_url('benchmark query', page) for page in range(1, args.pages + 1)]
+
+    start = time.perf_counter()
+    serial_fetch(requests.Session(), urls, args.delay)
+    serial_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    AsyncFetcher(requests.Session(), per_host_limit=args.per_host_limit).fetch_pages(urls)
+    async_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    products = scraper.search_products('benchmark query', max_pages=args.pages, per_host_limit=args.per_host_limit)
+    scraper_time = time.perf_counter() - start
+
+    server.shutdown()
+
+    print()
+    print(f"Pages: {args.pages}, latency: {args.latency}s, serial delay: up to {args.delay}s")
+    print(f"Serial loop:             {serial_time:6.2f}s")
+    print(f"AsyncFetcher:            {async_time:6.2f}s  ({serial_time / async_time:.1f}x faster)")
+    print(f"EbayScraper end to end:  {scraper_time:6.2f}s  ({len(products)} URLs)")
+    print(f"Mock host rate after run: {current_rates()[base_url.split('//')[1]]:.2f} req/s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,77 @@
+"""
+Measure how distributed crawling scales with the number of workers.
+
+A replay server (benchmarks/replay_server.py) serves the recorded eBay and
+Walmart pages with `--latency` seconds per response. `--queries` searches
+per platform are queued, and 1, 2, 4, ... worker processes
+(`distributed.py worker`) drain the queue, each with its own rate limit of
+`--rate` requests/s, as separate hosts would have. The queue is a SQLite
+file, or with --redis the Redis stand-in (benchmarks/redis_standin.py):
+
+    python benchmarks/bench_distributed.py --queries 20 --workers 1,2,4 --redis
+
+The replay server returns the same pages for every query, so the merged
+output holds each recorded product once however many searches found it.
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from distributed import submit
+from redis_standin import RedisStandIn
+from replay_server import ReplayServer
+from task_queue import open_queue
+
+
+def run(workers, queue_url, base_url, args):
+    queue = open_queue(queue_url)
+    submit(queue, [f'query {i}' for i in range(args.queries)], ['ebay', 'walmart'])
+    command = [
+        sys.executable, os.path.join(ROOT, 'distributed.py'), '--queue', queue_url, 'worker',
+        '--threads', '1', '--exit-when-idle', '--no-cache', '--rate', str(args.rate),
+        '--base-url', f'ebay={base_url}', '--base-url', f'walmart={base_url}',
+    ]
+    start = time.perf_counter()
+    processes = [subprocess.Popen(command + ['--name', f'worker-{i}'], stdout=subprocess.DEVNULL)
+                 for i in range(workers)]
+    for process in processes:
+        process.wait()
+    elapsed = time.perf_counter() - start
+    counts = queue.counts()
+    queue.close()
+    return elapsed, counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--queries', type=int, default=20, help='searches per platform')
+    parser.add_argument('--workers', default='1,2,4', help='comma-separated worker counts')
+    parser.add_argument('--latency', type=float, default=0.3, help='seconds per response')
+    parser.add_argument('--rate', type=float, default=2, help='requests/s each worker may send')
+    parser.add_argument('--redis', action='store_true', help='use the Redis stand-in instead of SQLite')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory, ReplayServer(args.latency) as server:
+        print(f"{args.queries} queries on eBay and Walmart, {args.latency * 1000:.0f} ms per response, "
+              f"{args.rate} requests/s per worker, {'Redis stand-in' if args.redis else 'SQLite'} queue")
+        single = None
+        for workers in [int(n) for n in args.workers.split(',')]:
+            if args.redis:
+                with RedisStandIn() as redis:
+                    elapsed, counts = run(workers, redis.url, server.base_url, args)
+            else:
+                elapsed, counts = run(workers, os.path.join(directory, f'queue{workers}.sqlite'), server.base_url, args)
+            single = single or elapsed * workers
+            print(f"{workers} workers: {elapsed:6.2f}s  {counts['done'] / elapsed:5.1f} pages/s  "
+                  f"{counts['results']} unique URLs  {counts['failed']} failed  "
+                  f"({single / elapsed:.1f}x of one worker)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,76 @@
+"""
+Measure connection reuse of the shared HTTP client (http_client.py).
+
+Fetches the recorded eBay pages `--requests` times from the replay server,
+first with a bare `requests.get` per page (a new TCP and, with --tls, TLS
+connection every time, as the Walmart scraper used to), then through the
+process-wide client with `--threads` threads, which keeps connections
+alive between requests:
+
+    python benchmarks/bench_http_client.py --requests 200 --threads 4 --tls
+
+--tls serves HTTPS with a throwaway self-signed certificate made by the
+openssl command-line tool.
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+import urllib3
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from http_client import client_stats, get_session
+from replay_server import ReplayServer
+
+
+def make_certificate(directory):
+    path = os.path.join(directory, 'replay.pem')
+    subprocess.run(
+        ['openssl', 'req', '-x509', '-newkey', 'rsa:2048', '-nodes', '-days', '1', '-subj', '/CN=127.0.0.1',
+         '-keyout', path, '-out', path],
+        check=True, capture_output=True,
+    )
+    return path
+
+
+def run(get, urls, threads):
+    start = time.perf_counter()
+    with ThreadPoolExecutor(threads) as executor:
+        sizes = list(executor.map(lambda url: len(get(url).content), urls))
+    return time.perf_counter() - start, sum(sizes)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=200, help='pages to fetch per run')
+    parser.add_argument('--threads', type=int, default=4, help='concurrent requests')
+    parser.add_argument('--tls', action='store_true', help='serve HTTPS (needs the openssl command)')
+    args = parser.parse_args()
+
+    urllib3.disable_warnings()
+    with tempfile.TemporaryDirectory() as directory:
+        certfile = make_certificate(directory) if args.tls else None
+        with ReplayServer(certfile=certfile) as server:
+            urls = [f'{server.base_url}/sch/i.html?_nkw=s24+ultra&_pgn={i % 3 + 1}' for i in range(args.requests)]
+            print(f"{args.requests} requests over {server.scheme.upper()}, {args.threads} threads")
+
+            elapsed, size = run(lambda url: requests.get(url, timeout=30, verify=False), urls, args.threads)
+            print(f"New connection per request: {elapsed:6.2f}s  {args.requests / elapsed:7.1f} req/s  "
+                  f"{args.requests} connections")
+
+            client = get_session()
+            elapsed, size = run(lambda url: client.get(url, timeout=30, verify=False), urls, args.threads)
+            host = client_stats()[server.host]
+            print(f"Shared client:              {elapsed:6.2f}s  {args.requests / elapsed:7.1f} req/s  "
+                  f"{host['connections']} connections, {host['reuse_rate']:.1%} reused, "
+                  f"{host['mean_connect_ms']} ms per new connection")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,127 @@
+"""
+Compare Selenium page loads with the lean browser profile on and off.
+
+A local server answers an Amazon-style result page that references many
+images, fonts, stylesheets and tracker scripts, each served after a fixed
+latency. For both profiles the benchmark reports the mean time until the
+page is ready and the RSS of the browser processes. Needs Chrome and
+chromedriver (psutil for the RSS column):
+
+    python benchmarks/bench_lean_browser.py --loads 5 --assets 40 --latency 0.2
+"""
+import argparse
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from amazon import setup_driver
+from browser_profiles import is_blocked
+from driver_pool import DriverPool
+from readiness import wait_until_ready
+
+RESULTS_PER_PAGE = 48
+ASSET_TYPES = [('png', 'image/png'), ('woff2', 'font/woff2'), ('css', 'text/css'), ('js', 'application/javascript')]
+
+
+def asset_path(i):
+    extension, _ = ASSET_TYPES[i % len(ASSET_TYPES)]
+    folder = 'tracking' if extension == 'js' else 'static'
+    return f'/{folder}/asset{i}.{extension}'
+
+
+def make_handler(assets, latency):
+    class MockAssetHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.startswith('/s'):
+                self.send_page()
+                return
+            time.sleep(latency)
+            extension = self.path.rsplit('.', 1)[-1]
+            content_type = dict(ASSET_TYPES).get(extension, 'application/octet-stream')
+            body = b'\0' * 20_000 if extension in ('png', 'woff2') else b''
+            self.send_response(200)
+            self.send_header('Content-Type', content_type)
+            self.send_header('Content-Length', str(len(body)))
+            self.send_header('Cache-Control', 'no-store')
+            self.end_headers()
+            self.wfile.write(body)
+
+        def send_page(self):
+            head = []
+            for i in range(assets):
+                path = asset_path(i)
+                if path.endswith('.css'):
+                    head.append(f'<link rel="stylesheet" href="{path}">')
+                elif path.endswith('.woff2'):
+                    head.append(f'<link rel="preload" as="font" crossorigin href="{path}">')
+                elif path.endswith('.js'):
+                    head.append(f'<script src="{path}"></script>')
+                else:
+                    head.append(f'<link rel="preload" as="image" href="{path}">')
+            cards = ''.join(
+                f'<div data-component-type="s-search-result" class="s-result-item">'
+                f'<a class="a-link-normal s-no-outline" href="/dp/B0{i:08d}">'
+                f'<img src="/images/product{i}.png"></a></div>'
+                for i in range(RESULTS_PER_PAGE)
+            )
+            body = f'<html><head>{"".join(head)}</head><body>{cards}</body></html>'.encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/html')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+    return MockAssetHandler
+
+
+def run_profile(base_url, lean, loads):
+    pool = DriverPool(lambda: setup_driver(lean), size=1)
+    try:
+        with pool.driver() as driver:
+            times = []
+            for i in range(loads):
+                start = time.perf_counter()
+                driver.get(f'{base_url}/s?k=benchmark&page={i}')
+                wait_until_ready(driver, 'amazon')
+                times.append(time.perf_counter() - start)
+            memory = pool.memory_mb(driver)
+    finally:
+        pool.close()
+    return sum(times) / len(times), memory
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--loads', type=int, default=5, help='page loads per profile')
+    parser.add_argument('--assets', type=int, default=40, help='subresources referenced by each page')
+    parser.add_argument('--latency', type=float, default=0.2, help='mock server latency per subresource (s)')
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), make_handler(args.assets, args.latency))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f'http://127.0.0.1:{server.server_address[1]}'
+    blocked = sum(is_blocked('amazon', base_url + asset_path(i)) for i in range(args.assets))
+    print(f"Lean Amazon profile blocks {blocked} of {args.assets} subresources of the page")
+
+    results = {}
+    for lean in (False, True):
+        results[lean] = run_profile(base_url, lean, args.loads)
+    server.shutdown()
+
+    print()
+    print(f"Loads: {args.loads}, assets per page: {args.assets}, asset latency: {args.latency}s")
+    for lean, label in ((False, 'Full profile'), (True, 'Lean profile')):
+        mean_time, memory = results[lean]
+        rss = f"{memory:7.0f} MB" if memory is not None else "    n/a"
+        print(f"{label}:  {mean_time:6.2f}s per page  {rss} browser RSS")
+    print(f"Speedup: {results[False][0] / results[True][0]:.1f}x")
+
+
+if __name__ == '__main__':
+    main()
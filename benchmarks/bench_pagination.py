@@ -0,0 +1,89 @@
+"""
+Compare serial next-link pagination with count-driven parallel pagination.
+
+A replay server (benchmarks/replay_server.py) serves a generated eBay
+search of `--pages` pages with `--latency` seconds per response. The serial
+run follows the "Next page" link one page at a time, as the scrapers used
+to; the planned runs are EbayScraper.search_products, which reads the page
+count from page 1 and fetches the remaining pages with the given numbers of
+concurrent requests:
+
+    python benchmarks/bench_pagination.py --pages 50 --latency 0.2 --limits 2,4,8
+"""
+import argparse
+import contextlib
+import io
+import os
+import random
+import sys
+import tempfile
+import time
+
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ebay import EbayAdapter, EbayScraper
+from extraction import extract_links
+from make_fixtures import ebay_page
+from rate_control import get_controller
+from replay_server import ReplayServer
+
+
+def write_pages(directory, pages):
+    rng = random.Random(20240101)
+    for page in range(1, pages + 1):
+        with open(os.path.join(directory, f'ebay_page{page}.html'), 'w', encoding='utf-8') as f:
+            f.write(ebay_page(rng, page, total_pages=pages))
+
+
+def serial_search(base_url, query):
+    """Fetch page after page for as long as each one links to a next page."""
+    adapter = EbayAdapter(base_url)
+    session = requests.Session()
+    urls, page = [], 1
+    while True:
+        links = extract_links('ebay', session.get(adapter.search_url(query, page), timeout=30).text)
+        urls.extend(links.hrefs)
+        if not links.has_next:
+            return urls
+        page += 1
+
+
+def planned_search(base_url, query, per_host_limit):
+    scraper = EbayScraper()
+    scraper.base_url = base_url
+    scraper.cache = None
+    with contextlib.redirect_stdout(io.StringIO()):
+        return scraper.search_products(query, per_host_limit=per_host_limit)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--pages', type=int, default=30, help='result pages of the generated search')
+    parser.add_argument('--latency', type=float, default=0.2, help='seconds per response')
+    parser.add_argument('--limits', default='2,4,8', help='comma-separated concurrent request limits')
+    parser.add_argument('--rate', type=float, default=50, help='client requests/s allowed by the rate controller')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        write_pages(directory, args.pages)
+        with ReplayServer(args.latency, fixtures_dir=directory) as server:
+            get_controller(server.base_url, rate=args.rate, max_rate=args.rate, burst=max(4, int(args.rate)))
+            print(f"{args.pages} pages, {args.latency * 1000:.0f} ms per response")
+
+            start = time.perf_counter()
+            urls = serial_search(server.base_url, 's24 ultra')
+            serial_time = time.perf_counter() - start
+            print(f"Serial next-link:     {serial_time:6.2f}s  {len(urls)} links")
+
+            for limit in [int(n) for n in args.limits.split(',')]:
+                start = time.perf_counter()
+                urls = planned_search(server.base_url, 's24 ultra', limit)
+                elapsed = time.perf_counter() - start
+                print(f"Planned, {limit:>2} at a time: {elapsed:6.2f}s  {len(urls)} URLs  "
+                      f"({serial_time / elapsed:.1f}x)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,66 @@
+"""
+Measure how link extraction scales with the parse process pool.
+
+The recorded pages in benchmarks/fixtures/ are extracted `--pages` times in
+total, first in-process on one thread, then through ParsePool with 1, 2, 4
+and 8 worker processes (the pages are submitted all at once, as in a batch
+crawl with many searches in flight):
+
+    python benchmarks/bench_parse_pool.py --pages 200 --backend soup
+
+Speedups are bounded by the number of CPU cores.
+"""
+import argparse
+import glob
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from extraction import BACKENDS, extract_links
+from parse_pool import ParsePool
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+
+
+def load_pages(count):
+    recorded = []
+    for path in sorted(glob.glob(os.path.join(FIXTURES_DIR, '*.html'))):
+        with open(path, 'rb') as f:
+            recorded.append((os.path.basename(path).split('_')[0], f.read()))
+    return [recorded[i % len(recorded)] for i in range(count)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--pages', type=int, default=200, help='pages to extract per run')
+    parser.add_argument('--backend', choices=BACKENDS, default='soup', help='extraction backend (default: %(default)s)')
+    parser.add_argument('--workers', default='1,2,4,8', help='comma-separated pool sizes')
+    args = parser.parse_args()
+
+    pages = load_pages(args.pages)
+    print(f"{len(pages)} pages ({sum(len(data) for _, data in pages) // 1024} KB), "
+          f"backend {args.backend}, {os.cpu_count()} CPU cores")
+
+    start = time.perf_counter()
+    expected = [extract_links(platform, data.decode('utf-8'), backend=args.backend).hrefs for platform, data in pages]
+    serial_time = time.perf_counter() - start
+    print(f"In-process:  {serial_time:6.2f}s  {len(pages) / serial_time:7.1f} pages/s")
+
+    for workers in [int(n) for n in args.workers.split(',')]:
+        pool = ParsePool(workers)
+        # Start the workers before timing so process startup is not counted
+        pool.extract(*pages[0], backend=args.backend)
+        start = time.perf_counter()
+        futures = [pool.submit(platform, data, args.backend) for platform, data in pages]
+        results = [future.result().hrefs for future in futures]
+        elapsed = time.perf_counter() - start
+        pool.close()
+        status = 'ok' if results == expected else 'MISMATCH'
+        print(f"{workers} workers:  {elapsed:6.2f}s  {len(pages) / elapsed:7.1f} pages/s  "
+              f"({serial_time / elapsed:.1f}x)  {status}")
+
+
+if __name__ == '__main__':
+    main()
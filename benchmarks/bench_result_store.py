@@ -0,0 +1,105 @@
+"""
+Compare the memory a large result set takes as a list of dicts, the way the
+scrapers and jobs have kept rows, with result_store.ResultStore.
+
+`--urls` canonical URLs are generated, spread over eBay, Walmart, Amazon
+and Airbnb and `--queries` queries, and stored both ways. Memory is
+measured with tracemalloc, and the pandas DataFrame built from each is
+measured as well:
+
+    python benchmarks/bench_result_store.py --urls 1000000
+"""
+import argparse
+import gc
+import os
+import random
+import string
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from result_store import ResultStore
+
+
+def make_rows(count, queries, seed=20240101):
+    rng = random.Random(seed)
+    query_names = [f'query {i}' for i in range(queries)]
+    for _ in range(count):
+        platform = rng.choice(('ebay', 'walmart', 'amazon', 'airbnb'))
+        if platform == 'ebay':
+            url = f'https://www.ebay.com/itm/{rng.randrange(10 ** 11, 4 * 10 ** 11)}'
+        elif platform == 'walmart':
+            url = f'https://www.walmart.com/ip/{rng.randrange(10 ** 8, 10 ** 10)}'
+        elif platform == 'amazon':
+            url = 'https://www.amazon.com/dp/B0' + ''.join(rng.choices(string.ascii_uppercase + string.digits, k=8))
+        else:
+            url = f'https://www.airbnb.com/rooms/{rng.randrange(10 ** 7, 10 ** 18)}'
+        yield platform, rng.choice(query_names), url
+
+
+def measure(build):
+    """
+    Run build() twice: timed, then under tracemalloc (which slows it down).
+    Returns (result, bytes it holds, seconds).
+    """
+    gc.collect()
+    start = time.perf_counter()
+    build()
+    elapsed = time.perf_counter() - start
+    gc.collect()
+    tracemalloc.start()
+    result = build()
+    held = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return result, held, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--urls', type=int, default=200_000)
+    parser.add_argument('--queries', type=int, default=1000)
+    parser.add_argument('--no-pandas', action='store_true', help='skip the DataFrame measurements')
+    args = parser.parse_args()
+
+    # Every URL is generated as its own string, as a scraper produces them
+    rows = list(make_rows(args.urls, args.queries))
+    print(f"{args.urls} URLs, {args.queries} queries")
+
+    dicts, dict_bytes, dict_seconds = measure(
+        lambda: [{'platform': platform, 'query': query, 'url': url} for platform, query, url in rows])
+    # The dicts share the URL strings of `rows`, so count those strings too
+    dict_bytes += sum(sys.getsizeof(url) for _, _, url in rows)
+
+    def build_store(dedupe):
+        store = ResultStore(dedupe=dedupe)
+        for platform, query, url in rows:
+            store.append(platform, query, url)
+        return store
+
+    store, store_bytes, store_seconds = measure(lambda: build_store(False))
+    deduped, deduped_bytes, deduped_seconds = measure(lambda: build_store(True))
+    assert list(store.urls()) == [url for _, _, url in rows]
+
+    print(f"{'':24}{'bytes/URL':>10}{'total MB':>10}{'build s':>10}")
+    for name, held, seconds in (('list of dicts', dict_bytes, dict_seconds),
+                                ('ResultStore', store_bytes, store_seconds),
+                                ('ResultStore(dedupe)', deduped_bytes, deduped_seconds)):
+        print(f"{name:24}{held / args.urls:10.1f}{held / 1e6:10.1f}{seconds:10.2f}")
+
+    if args.no_pandas:
+        return
+    import pandas as pd
+    frame, frame_bytes, frame_seconds = measure(lambda: pd.DataFrame(dicts))
+    frame_bytes = max(frame_bytes, int(frame.memory_usage(deep=True).sum()))
+    del frame
+    store_frame, store_frame_bytes, store_frame_seconds = measure(lambda: store.to_pandas(full_urls=False))
+    del store_frame
+    print(f"{'DataFrame of dicts':24}{frame_bytes / args.urls:10.1f}{frame_bytes / 1e6:10.1f}{frame_seconds:10.2f}")
+    print(f"{'ResultStore.to_pandas':24}{store_frame_bytes / args.urls:10.1f}"
+          f"{store_frame_bytes / 1e6:10.1f}{store_frame_seconds:10.2f}")
+
+
+if __name__ == '__main__':
+    main()
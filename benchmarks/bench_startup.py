@@ -0,0 +1,98 @@
+"""
+Measure the Streamlit app's startup time and rerun latency.
+
+Every variant runs in a fresh Python process and drives streamlit_app.py
+with Streamlit's AppTest:
+
+- import: the time to import everything the app needs before its first run,
+- first run: the first script run (a new browser session on a cold server),
+- rerun: the mean time of `--reruns` reruns while a finished eBay job with
+  1,000 rows and `--spans` recorded timing spans is on screen, as after a
+  long crawl. Streamlit reruns the whole script on every interaction, and
+  every second while a job is running.
+
+The eager variant imports every scraper module (with Selenium) and pandas
+before the app, as the app used to at its top. Scrapes are replaced with
+a stub that returns recorded-looking URLs, so no network is needed:
+
+    python benchmarks/bench_startup.py --reruns 20
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+HEAVY_MODULES = ('selenium', 'selenium_stealth', 'bs4', 'lxml', 'pyarrow', 'pandas')
+
+
+def fake_run_platform(platform, query, num_pages=5, page_callback=None, **kwargs):
+    urls = [f'https://www.ebay.com/itm/{100000000000 + i}' for i in range(1000)]
+    if page_callback:
+        page_callback(1, urls)
+    return urls
+
+
+def child(args):
+    start = time.perf_counter()
+    if args.eager:
+        import airbnb, amazon, ebay, pandas, walmart  # noqa: F401,E401
+    from streamlit.testing.v1 import AppTest
+    imported = time.perf_counter() - start
+
+    import fanout
+    from metrics import metrics
+    fanout.run_platform = fake_run_platform
+    for i in range(args.spans):
+        metrics.observe('fetch', 0.01, host='www.ebay.com')
+
+    app = AppTest.from_file(os.path.join(ROOT, 'streamlit_app.py'), default_timeout=120)
+    start = time.perf_counter()
+    app.run()
+    first_run = time.perf_counter() - start
+    heavy = [name for name in HEAVY_MODULES if name in sys.modules]
+
+    app.selectbox[0].select('eBay').run()
+    app.text_input[0].input('laptop').run()
+    app.button[0].click().run()
+    app.run()
+    reruns = []
+    for _ in range(args.reruns):
+        start = time.perf_counter()
+        app.run()
+        reruns.append(time.perf_counter() - start)
+    if app.exception:
+        raise RuntimeError(app.exception[0].message)
+    if not app.dataframe:
+        raise RuntimeError("the job's results are not on screen")
+    print(json.dumps({'import': imported, 'first_run': first_run, 'rerun': sum(reruns) / len(reruns),
+                      'heavy': heavy, 'loaded': sorted(set(HEAVY_MODULES) & set(sys.modules))}))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--reruns', type=int, default=10)
+    parser.add_argument('--spans', type=int, default=50_000, help='timing spans recorded before the reruns')
+    parser.add_argument('--eager', action='store_true', help=argparse.SUPPRESS)
+    parser.add_argument('--child', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        child(args)
+        return
+
+    print(f"{'':10}{'import s':>10}{'first run s':>13}{'rerun ms':>10}  heavy modules at first run")
+    for name, extra in (('eager', ['--eager']), ('lazy', [])):
+        command = [sys.executable, os.path.abspath(__file__), '--child', '--reruns', str(args.reruns),
+                   '--spans', str(args.spans)] + extra
+        output = subprocess.run(command, capture_output=True, text=True, check=True, cwd=ROOT).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        print(f"{name:10}{result['import']:10.2f}{result['first_run']:13.2f}{result['rerun'] * 1000:10.1f}  "
+              f"{', '.join(result['heavy']) or '-'}")
+
+
+if __name__ == '__main__':
+    main()
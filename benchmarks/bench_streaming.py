@@ -0,0 +1,157 @@
+"""
+Measure streamed result pages (streaming.py) against reading whole pages.
+
+A local server serves generated eBay and Walmart result pages padded with
+`--script-kb` of inline scripts after the results, as real result pages
+are, to `--mbps` megabits/s per connection after `--latency` seconds. For
+each platform:
+
+- time to first URL: each page is fetched `--repeat` times, read whole and
+  then parsed, versus parsed as it arrives (StreamingSession),
+- a `--pages` page search with EbayScraper/WalmartScraper.search_products,
+  with `stream` off and on: wall time, megabytes the server sent, and
+  whether both found the same URLs.
+
+    python benchmarks/bench_streaming.py --script-kb 2048 --mbps 20
+"""
+import argparse
+import contextlib
+import io
+import os
+import random
+import statistics
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import rate_control
+from ebay import EbayScraper
+from extraction import extract_links
+from http_client import get_session
+from make_fixtures import ebay_page, filler_script, walmart_page
+from replay_server import route
+from streaming import StreamingSession
+from walmart import WalmartScraper
+
+CHUNK = 16 * 1024
+
+
+def make_pages(pages, script_kb, seed=20240101):
+    """Map (platform, page) to page bytes with `script_kb` more of scripts after the results."""
+    rng = random.Random(seed)
+    result = {}
+    for page in range(1, pages + 1):
+        for platform, html in (('ebay', ebay_page(rng, page, pages)), ('walmart', walmart_page(rng, page, pages))):
+            html = html.replace('<footer>', filler_script(rng, script_kb * 1024) + '<footer>')
+            result[(platform, page)] = html.encode('utf-8')
+    return result
+
+
+class SlowServer:
+    """Serves `pages` on 127.0.0.1 at `bandwidth` bytes/s per connection, counting the bytes sent."""
+
+    def __init__(self, pages, latency, bandwidth):
+        self.pages = pages
+        self.latency = latency
+        self.bandwidth = bandwidth
+        self.bytes_sent = 0
+        self._lock = threading.Lock()
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def handle(self):
+                try:
+                    super().handle()
+                except (BrokenPipeError, ConnectionResetError):
+                    pass
+
+            def do_GET(self):
+                time.sleep(server.latency)
+                body = server.pages.get(route(self.path), b'<html><body></body></html>')
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/html; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                for start in range(0, len(body), CHUNK):
+                    self.wfile.write(body[start:start + CHUNK])
+                    with server._lock:
+                        server.bytes_sent += min(CHUNK, len(body) - start)
+                    time.sleep(CHUNK / server.bandwidth)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self._server.daemon_threads = True
+
+    @property
+    def base_url(self):
+        return f'http://127.0.0.1:{self._server.server_address[1]}'
+
+    def __enter__(self):
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+def first_url_times(platform, urls, repeat):
+    """Median seconds to the first URL of a page: (read whole, then parsed), (streamed)."""
+    whole, streamed = [], []
+    for _ in range(repeat):
+        for url in urls:
+            start = time.perf_counter()
+            links = extract_links(platform, get_session().get(url, timeout=60).text)
+            assert links.hrefs
+            whole.append(time.perf_counter() - start)
+            streamed.append(StreamingSession(get_session(), platform).get(url, timeout=60).first_url)
+    return statistics.median(whole), statistics.median(streamed)
+
+
+def search(server, platform, pages, stream):
+    scraper = EbayScraper() if platform == 'ebay' else WalmartScraper()
+    scraper.base_url = server.base_url
+    scraper.cache = None
+    scraper.stream = stream
+    sent = server.bytes_sent
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        urls = scraper.search_products('s24 ultra', max_pages=pages)
+    return time.perf_counter() - start, server.bytes_sent - sent, urls
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--pages', type=int, default=5)
+    parser.add_argument('--script-kb', type=int, default=2048, help='inline scripts added after the results')
+    parser.add_argument('--mbps', type=float, default=20, help='megabits/s per connection')
+    parser.add_argument('--latency', type=float, default=0.1, help='seconds before each response')
+    parser.add_argument('--repeat', type=int, default=2, help='fetches per page for the time to first URL')
+    args = parser.parse_args()
+
+    pages = make_pages(args.pages, args.script_kb)
+    rate_control.configure(rate=50, max_rate=50, burst=50)
+    size = statistics.mean(len(body) for body in pages.values()) / 1e6
+    print(f"{args.pages} pages per platform of {size:.2f} MB, {args.mbps:g} Mbit/s, {args.latency * 1000:.0f} ms latency")
+    with SlowServer(pages, args.latency, args.mbps * 1e6 / 8) as server:
+        print(f"{'':10}{'first URL s':>14}{'':>6}{'search s':>12}{'':>6}{'MB sent':>11}")
+        print(f"{'':10}{'whole':>10}{'stream':>10}{'whole':>9}{'stream':>9}{'whole':>8}{'stream':>9}  same URLs")
+        for platform in ('ebay', 'walmart'):
+            path = '/sch/i.html?_nkw=s24+ultra&_ipg=240&_pgn=' if platform == 'ebay' else '/search?q=s24+ultra&page='
+            whole_first, stream_first = first_url_times(
+                platform, [f'{server.base_url}{path}{page}' for page in range(1, args.pages + 1)], args.repeat)
+            whole = search(server, platform, args.pages, False)
+            streamed = search(server, platform, args.pages, True)
+            print(f"{platform:10}{whole_first:10.2f}{stream_first:10.2f}{whole[0]:9.2f}{streamed[0]:9.2f}"
+                  f"{whole[1] / 1e6:8.1f}{streamed[1] / 1e6:9.1f}  {'yes' if whole[2] == streamed[2] else 'NO'}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,82 @@
+"""
+Verify that a `batch.py --delta` run interrupted with Ctrl+C keeps the URLs
+its running tasks found.
+
+A delta crawl records every URL it finds in the URL index as soon as its
+page is processed, so a later run no longer reports it as new: an
+interrupted task's URLs have to reach the output file. The check runs
+run_batch() with an eBay query against a ReplayServer
+(benchmarks/replay_server.py), sends SIGINT to the process once page 1 has
+been processed, and compares the rows written with the URLs in the index.
+
+    python benchmarks/check_batch.py
+
+Exits with status 1 if an indexed URL is missing from the output.
+"""
+import contextlib
+import csv
+import io
+import os
+import signal
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import ebay
+from batch import run_batch
+from rate_control import get_controller
+from replay_server import ReplayServer
+from url_index import UrlIndex
+
+QUERY = 's24 ultra'
+
+
+def interrupting_scraper(base_url, after_page):
+    """An EbayScraper for `base_url` that sends SIGINT to this process once page `after_page` is processed."""
+
+    class InterruptingScraper(ebay.EbayScraper):
+        def __init__(self):
+            super().__init__()
+            self.base_url = base_url
+            self.cache = None
+
+        def search_products(self, *args, page_callback=None, **kwargs):
+            def on_page(page, urls):
+                if page == after_page:
+                    os.kill(os.getpid(), signal.SIGINT)
+            return super().search_products(*args, page_callback=on_page, **kwargs)
+
+    return InterruptingScraper
+
+
+def main():
+    with tempfile.TemporaryDirectory() as directory, ReplayServer(0.1) as server:
+        get_controller(server.base_url, rate=50, max_rate=50, burst=50)
+        index = UrlIndex(os.path.join(directory, 'index.sqlite'))
+        output = os.path.join(directory, 'results.csv')
+        original = ebay.EbayScraper
+        ebay.EbayScraper = interrupting_scraper(server.base_url, after_page=1)
+        try:
+            with contextlib.redirect_stdout(io.StringIO()):
+                run_batch([QUERY], ['eBay'], output, os.path.join(directory, 'state.jsonl'), concurrency=1,
+                          num_pages=5, index=index)
+        finally:
+            ebay.EbayScraper = original
+        with open(output, encoding='utf-8') as f:
+            written = [row['url'] for row in csv.DictReader(f) if row['change'] == 'new']
+        with open(os.path.join(directory, 'state.jsonl'), encoding='utf-8') as f:
+            checkpointed = f.read().strip()
+        indexed = index.count('ebay', QUERY)
+        index.close()
+
+    print(f"interrupted run: {indexed} URLs in the index, {len(written)} written, "
+          f"{'checkpointed' if checkpointed else 'not checkpointed'}")
+    if not indexed or len(written) != indexed or checkpointed:
+        print("The interrupted task lost URLs or was checkpointed")
+        sys.exit(1)
+    print("\nThe interrupted task's URLs were written and the task is retried on the next run.")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,176 @@
+"""
+Verify that the scrapers running on engine.ScrapeEngine return the same
+URLs, in the same order and page by page, as the per-scraper loops they
+replaced, on the fixtures in benchmarks/fixtures/.
+
+Both sides fetch from a ReplayServer (benchmarks/replay_server.py). The
+old loops are kept here as they were before the engine, reduced to their
+pagination rules (no page cache, and no browser: a page the HTTP fetch
+finds nothing on ends the Amazon and Airbnb searches, as it did without a
+browser):
+
+    eBay     stop at a failed or empty page, a page with nothing new, or no next-page link
+    Walmart  stop at a failed or empty page
+    Amazon   load every requested page
+    Airbnb   read the one search page
+
+The engine runs a second time with a parse pool (parse_pool.py) of
+--parse-workers processes, which must return the same URLs and parse every
+page in the pool rather than on the fetch threads.
+
+    python benchmarks/check_engine.py [--pages 5] [--parse-workers 2]
+
+Exits with status 1 if any platform differs.
+"""
+import argparse
+import contextlib
+import io
+import os
+import sys
+from urllib.parse import quote_plus, urljoin
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import requests
+
+import parse_pool
+from extraction import extract_links
+from rate_control import get_controller
+from replay_server import ReplayServer
+from run_benchmarks import Scenario, run_search
+from tiered import fetch_tiered
+from url_canon import Deduper
+
+QUERY = 's24 ultra'
+
+
+def no_browser():
+    raise RuntimeError("no browser")
+
+
+def old_ebay(base_url, pages, page_callback):
+    products, deduper = [], Deduper('ebay')
+    for page in range(1, pages + 1):
+        url = f"{base_url}/sch/i.html?_nkw={quote_plus(QUERY)}&_ipg=240"
+        response = requests.get(url if page == 1 else f"{url}&_pgn={page}", timeout=30)
+        if response.status_code != 200:
+            break
+        links = extract_links('ebay', response.text)
+        if not links.hrefs:
+            break
+        page_products = [url for url in map(deduper.add, links.hrefs) if url]
+        products.extend(page_products)
+        page_callback(page, page_products)
+        if not page_products or not links.has_next:
+            break
+    return products
+
+
+def old_walmart(base_url, pages, page_callback):
+    products, deduper = [], Deduper('walmart')
+    for page in range(1, pages + 1):
+        response = requests.get(f"{base_url}/search?q={QUERY.replace(' ', '+')}&page={page}", timeout=30)
+        if response.status_code != 200:
+            break
+        links = extract_links('walmart', response.text)
+        if not links.hrefs:
+            break
+        page_products = [url for url in (deduper.add(urljoin(base_url, href)) for href in links.hrefs) if url]
+        products.extend(page_products)
+        page_callback(page, page_products)
+    return products
+
+
+def old_amazon(base_url, pages, page_callback):
+    products, deduper = [], Deduper('amazon')
+    try:
+        for page in range(1, pages + 1):
+            html = fetch_tiered('amazon', f"{base_url}/s?k={QUERY.replace(' ', '+')}&page={page}", no_browser)[0]
+            page_urls = [url for url in (deduper.add(base_url + href) for href in extract_links('amazon', html).hrefs)
+                         if url]
+            products.extend(page_urls)
+            page_callback(page, page_urls)
+    except Exception:
+        pass
+    return products
+
+
+def old_airbnb(base_url, pages, page_callback):
+    deduper = Deduper('airbnb')
+    html = fetch_tiered('airbnb', f"{base_url}/s/Lisbon/homes", no_browser)[0]
+    urls = [url for url in (deduper.add(base_url + href) for href in extract_links('airbnb', html).hrefs) if url]
+    page_callback(1, urls)
+    return urls
+
+
+OLD_LOOPS = {'ebay': old_ebay, 'walmart': old_walmart, 'amazon': old_amazon, 'airbnb': old_airbnb}
+
+
+def counting_pool(workers):
+    """Configure the process-wide parse pool and count the pages submitted to it in `pool.submitted`."""
+    pool = parse_pool.configure(workers)
+    submit = pool.submit
+    pool.submitted = 0
+
+    def counting_submit(*args, **kwargs):
+        pool.submitted += 1
+        return submit(*args, **kwargs)
+
+    pool.submit = counting_submit
+    return pool
+
+
+def run(search):
+    """(URLs, [(page, URLs of the page)]) of one search, with the scrapers' output hidden."""
+    pages = []
+    with contextlib.redirect_stdout(io.StringIO()):
+        urls = search(lambda page, new: pages.append((page, list(new))))
+    return urls, pages
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--pages', type=int, default=5, help='result pages requested per search')
+    parser.add_argument('--parse-workers', type=int, default=2, help='parse pool size of the second run (0: skip it)')
+    args = parser.parse_args()
+
+    failures = 0
+    with ReplayServer() as server:
+        get_controller(server.base_url, rate=50, max_rate=50, burst=50)
+        for platform, old_loop in OLD_LOOPS.items():
+            pages = 1 if platform == 'airbnb' else args.pages
+            scenario = Scenario(platform, platform, pages, 0, None, 50)
+            old_urls, old_pages = run(lambda callback: old_loop(server.base_url, pages, callback))
+            new_urls, new_pages = run(lambda callback: run_search(scenario, server.base_url, callback))
+            same = new_urls == old_urls and new_pages == old_pages
+            failures += not same
+            print(f"{platform:<9} old {len(old_urls):>4} URLs in {len(old_pages)} pages, "
+                  f"engine {len(new_urls):>4} URLs in {len(new_pages)} pages  {'same' if same else 'DIFFERENT'}")
+
+        if args.parse_workers:
+            print(f"\nWith a parse pool of {args.parse_workers} workers:")
+            pool = counting_pool(args.parse_workers)
+            try:
+                for platform, old_loop in OLD_LOOPS.items():
+                    pages = 1 if platform == 'airbnb' else args.pages
+                    scenario = Scenario(platform, platform, pages, 0, None, 50)
+                    old_urls, old_pages = run(lambda callback: old_loop(server.base_url, pages, callback))
+                    pool.submitted = 0
+                    new_urls, new_pages = run(lambda callback: run_search(scenario, server.base_url, callback))
+                    same = new_urls == old_urls and new_pages == old_pages
+                    pooled = pool.submitted >= len(new_pages)
+                    failures += not (same and pooled)
+                    print(f"{platform:<9} engine {len(new_urls):>4} URLs in {len(new_pages)} pages, "
+                          f"{pool.submitted} parsed in the pool  "
+                          f"{'same' if same else 'DIFFERENT'}{'' if pooled else ', NOT PARSED IN THE POOL'}")
+            finally:
+                parse_pool.configure(0)
+
+    if failures:
+        print(f"\n{failures} platforms differ")
+        sys.exit(1)
+    print("\nThe engine returned the same URLs as the old loops.")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,94 @@
+"""
+Verify that every extraction backend returns identical links on the
+fixtures in benchmarks/fixtures/, and time each backend. Pages of platforms
+that can be streamed are also fed to extraction.StreamExtractor in 16 KB
+chunks, as they arrive over the network, and must give the same links
+(reported as they are parsed and at the end) from the part read before the
+cut.
+
+    python benchmarks/check_extraction.py [--repeat 5]
+
+Exits with status 1 if any backend disagrees with the BeautifulSoup path.
+"""
+import argparse
+import glob
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import extraction
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+
+
+def available_backends():
+    return [backend for backend in extraction.BACKENDS if backend != 'lxml' or extraction.lxml is not None]
+
+
+def stream_extract(platform, data, chunk_size=16 * 1024):
+    """(PageLinks, hrefs reported while feeding, bytes fed) of `data` fed to a StreamExtractor in chunks."""
+    reported = []
+    extractor = extraction.StreamExtractor(platform, reported.append, encoding='utf-8')
+    fed = 0
+    while fed < len(data):
+        fed += chunk_size
+        if extractor.feed(data[fed - chunk_size:fed]):
+            break
+    return extractor.close(), reported, min(fed, len(data))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=5, help='timing repetitions per page')
+    args = parser.parse_args()
+
+    backends = available_backends()
+    timings = {backend: 0.0 for backend in backends}
+    failures = 0
+
+    for path in sorted(glob.glob(os.path.join(FIXTURES_DIR, '*.html'))):
+        name = os.path.basename(path)
+        platform = name.split('_')[0]
+        with open(path, encoding='utf-8') as f:
+            html = f.read()
+
+        expected = extraction.extract_links(platform, html, backend='soup')
+        for backend in backends:
+            result = extraction.extract_links(platform, html, backend=backend)
+            if result != expected:
+                failures += 1
+                print(f"MISMATCH {name} [{backend}]: {len(result.hrefs)} links vs {len(expected.hrefs)} "
+                      f"(has_next {result.has_next} vs {expected.has_next})")
+
+            start = time.perf_counter()
+            for _ in range(args.repeat):
+                extraction.extract_links(platform, html, backend=backend)
+            timings[backend] += (time.perf_counter() - start) / args.repeat
+
+        streamed = ''
+        if extraction.lxml is not None and extraction.PLATFORM_SELECTORS[platform].get('stream_end'):
+            data = html.encode('utf-8')
+            result, reported, fed = stream_extract(platform, data)
+            if result != expected or reported != expected.hrefs:
+                failures += 1
+                print(f"MISMATCH {name} [stream]: {len(result.hrefs)} links, {len(reported)} reported "
+                      f"vs {len(expected.hrefs)}")
+            streamed = f"  streamed {fed // 1024} of {len(data) // 1024} KB"
+
+        print(f"{name:<22} {len(expected.hrefs):>3} links  has_next={expected.has_next}{streamed}")
+
+    print()
+    for backend in backends:
+        print(f"{backend:<9} {timings[backend] * 1000:8.1f} ms for all fixtures "
+              f"({timings['soup'] / timings[backend]:.1f}x vs soup)")
+
+    if failures:
+        print(f"\n{failures} mismatches")
+        sys.exit(1)
+    print("\nAll backends returned identical links.")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,135 @@
+"""
+Generate the search-result fixtures in benchmarks/fixtures/.
+
+The pages reproduce the result markup the scrapers rely on (listing
+containers, product links, pagination and count headings) surrounded by the
+kind of bulk real result pages carry: navigation, sponsored blocks and large
+inline scripts. Output is deterministic, so regenerating does not change the
+committed files.
+
+    python benchmarks/make_fixtures.py
+"""
+import json
+import os
+import random
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+
+
+def filler_script(rng, size):
+    state = {'modules': [{'id': rng.randrange(10**9), 'payload': 'x' * 200} for _ in range(size // 260)]}
+    return f'<script type="application/json">{json.dumps(state)}</script>'
+
+
+def page_shell(title, body, rng, script_kb):
+    nav = ''.join(f'<li><a href="/b/category-{i}">Category {i}</a></li>' for i in range(60))
+    return (
+        f'<!DOCTYPE html><html lang="en"><head><meta charset="utf-8"><title>{title}</title>'
+        f'<link rel="stylesheet" href="/static/site.css"><script src="/static/app.js"></script></head>'
+        f'<body><header><nav><ul>{nav}</ul></nav></header><main>{body}</main>'
+        f'{filler_script(rng, script_kb * 1024)}<footer><p>Footer &amp; legal</footer></body></html>'
+    )
+
+
+def ebay_page(rng, page, total_pages, per_page=60):
+    items = []
+    for i in range(per_page):
+        item_id = 100000000000 + page * 1000 + i
+        href = f'https://www.ebay.com/itm/{item_id}?hash=item{item_id:x}:g:abc&amp;_trksid=p4432023.m570.l1313'
+        if i % 17 == 0:
+            # Promoted block without a product page
+            href = f'https://www.ebay.com/sch/i.html?_ssn=store{i}'
+        items.append(
+            f'<li class="s-item s-item__pl-on-bottom"><div class="s-item__wrapper clearfix">'
+            f'<div class="s-item__image-section"><a href="{href}" tabindex="-1"><img src="/img/{item_id}.jpg"></a></div>'
+            f'<div class="s-item__info clearfix"><a class="s-item__link" href="{href}">'
+            f'<div class="s-item__title"><span role="heading">Item {item_id}</span></div></a>'
+            f'<div class="s-item__details"><span class="s-item__price">${rng.randrange(10, 999)}.99</span></div>'
+            f'</div></div></li>'
+        )
+    numbers = ''.join(
+        f'<li><a class="pagination__item" href="/sch/i.html?_nkw=s24+ultra&amp;_pgn={n}">{n}</a></li>'
+        for n in range(1, total_pages + 1)
+    )
+    next_link = ''
+    if page < total_pages:
+        next_link = (f'<a class="pagination__next icon-link" aria-label="Next page" '
+                     f'href="/sch/i.html?_nkw=s24+ultra&amp;_pgn={page + 1}">Next</a>')
+    pagination = f'<nav class="pagination"><ol class="pagination__items">{numbers}</ol>{next_link}</nav>'
+    body = (
+        f'<div class="srp-controls"><h1 class="srp-controls__count-heading"><span class="BOLD">'
+        f'{total_pages * per_page:,}</span> results for <span class="BOLD">s24 ultra</span></h1></div>'
+        f'<ul class="srp-results srp-list clearfix">{"".join(items)}</ul>{pagination}'
+    )
+    return page_shell('s24 ultra | eBay', body, rng, 200)
+
+
+def walmart_page(rng, page, total_pages, per_page=40):
+    items = []
+    for i in range(per_page):
+        item_id = 5000000 + page * 1000 + i
+        items.append(
+            f'<div data-item-id="{item_id}" class="mb0 ph1 pa0-xl bb b--near-white w-25">'
+            f'<a link-identifier="{item_id}" class="absolute w-100 h-100 z-1 hide-sibling-opacity" '
+            f'href="/ip/Samsung-Galaxy-S24-Ultra-{i}/{item_id}?classType=REGULAR&amp;athbdg=L1600">'
+            f'<span class="w_iUH7">Samsung Galaxy S24 Ultra {i}</span></a>'
+            f'<div class="flex flex-wrap"><span>${rng.randrange(100, 1500)}.00</span></div></div>'
+        )
+    numbers = ''.join(
+        f'<li><a data-automation-id="page-number" href="/search?q=s24+ultra&amp;page={n}">{n}</a></li>'
+        for n in range(1, total_pages + 1)
+    )
+    body = (f'<section><h2>Results for "s24 ultra"</h2><div class="flex flex-wrap w-100">{"".join(items)}</div>'
+            f'<nav aria-label="pagination"><ul>{numbers}</ul></nav></section>')
+    return page_shell('s24 ultra - Walmart.com', body, rng, 300)
+
+
+def amazon_page(rng, page, per_page=48):
+    cards = []
+    for i in range(per_page):
+        asin = f'B0{rng.randrange(16**8):08X}'
+        href = f'/Samsung-Galaxy-Smartphone-{i}/dp/{asin}/ref=sr_1_{i + 1}?keywords=s24+ultra&amp;qid=1700000000&amp;sr=8-{i + 1}'
+        if i % 12 == 0:
+            href = f'/sspa/click?ie=UTF8&amp;spc=MTo0&amp;url=%2FSamsung-Galaxy%2Fdp%2F{asin}%2Fref%3Dsr_1_{i + 1}_sspa'
+        cards.append(
+            f'<div data-asin="{asin}" data-index="{i}" data-component-type="s-search-result" class="sg-col-4-of-24 s-result-item s-asin">'
+            f'<div class="s-product-image-container"><a class="a-link-normal s-no-outline" href="{href}">'
+            f'<img class="s-image" src="/images/{asin}.jpg"></a></div>'
+            f'<h2><a class="a-link-normal s-underline-text s-link-style a-text-normal" href="{href}">'
+            f'<span class="a-size-medium a-color-base a-text-normal">Samsung Galaxy {i}</span></a></h2></div>'
+        )
+    body = f'<div class="s-main-slot s-result-list s-search-results sg-row">{"".join(cards)}</div>'
+    return page_shell('Amazon.com : s24 ultra', body, rng, 200)
+
+
+def airbnb_page(rng, per_page=18):
+    cards = []
+    for i in range(per_page):
+        room_id = 40000000 + rng.randrange(10**7)
+        cards.append(
+            f'<div itemprop="itemListElement"><a target="listing_{room_id}" aria-labelledby="title_{room_id}" '
+            f'href="/rooms/{room_id}?adults=2&amp;search_mode=regular_search&amp;check_in=2024-06-01">'
+            f'<div id="title_{room_id}">Room {i}</div></a></div>'
+        )
+    body = f'<div class="gsgwcjk">{"".join(cards)}</div>'
+    return page_shell('Airbnb | Lisbon', body, rng, 150)
+
+
+def main():
+    rng = random.Random(20240101)
+    os.makedirs(FIXTURES_DIR, exist_ok=True)
+    pages = {}
+    for page in (1, 2, 3):
+        pages[f'ebay_page{page}.html'] = ebay_page(rng, page, total_pages=3)
+        pages[f'walmart_page{page}.html'] = walmart_page(rng, page, total_pages=3)
+        pages[f'amazon_page{page}.html'] = amazon_page(rng, page)
+    pages['airbnb_page1.html'] = airbnb_page(rng)
+
+    for name, html in pages.items():
+        with open(os.path.join(FIXTURES_DIR, name), 'w', encoding='utf-8') as f:
+            f.write(html)
+        print(f"Wrote {name} ({len(html) // 1024} KB)")
+
+
+if __name__ == '__main__':
+    main()
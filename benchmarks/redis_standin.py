@@ -0,0 +1,281 @@
+"""
+In-memory stand-in for a Redis server, speaking the Redis protocol (RESP2)
+for the commands task_queue.RedisTaskQueue uses. It lets the distributed
+mode run and be benchmarked without installing Redis:
+
+    python benchmarks/redis_standin.py --port 6379
+    python distributed.py worker --queue redis://127.0.0.1:6379/0
+
+Every command runs under one lock, so each is atomic as in Redis. Data is
+kept in memory only and is lost when the server stops.
+"""
+import argparse
+import bisect
+import socketserver
+import threading
+
+
+class RespError(Exception):
+    pass
+
+
+class Store:
+    """Databases of lists, sets, hashes and sorted sets (plain string values are not needed)."""
+
+    def __init__(self):
+        self.databases = {}
+        self.lock = threading.Lock()
+
+    def run(self, db, name, args):
+        handler = getattr(self, 'cmd_' + name.lower(), None)
+        if handler is None:
+            raise RespError(f"ERR unknown command '{name}'")
+        with self.lock:
+            return handler(self.databases.setdefault(db, {}), *args)
+
+    def _get(self, data, key, kind):
+        value = data.get(key)
+        if value is not None and not isinstance(value, kind):
+            raise RespError("WRONGTYPE Operation against a key holding the wrong kind of value")
+        return value
+
+    def cmd_ping(self, data, *args):
+        return args[0] if args else 'PONG'
+
+    def cmd_flushdb(self, data):
+        data.clear()
+        return 'OK'
+
+    def cmd_del(self, data, *keys):
+        return sum(data.pop(key, None) is not None for key in keys)
+
+    # Lists
+    def cmd_rpush(self, data, key, *values):
+        items = self._get(data, key, list)
+        if items is None:
+            items = data[key] = []
+        items.extend(values)
+        return len(items)
+
+    def cmd_lpop(self, data, key):
+        items = self._get(data, key, list)
+        if not items:
+            return None
+        value = items.pop(0)
+        if not items:
+            del data[key]
+        return value
+
+    def cmd_llen(self, data, key):
+        return len(self._get(data, key, list) or [])
+
+    def cmd_lrange(self, data, key, start, stop):
+        items = self._get(data, key, list) or []
+        start, stop = int(start), int(stop)
+        stop = len(items) if stop == -1 else stop + 1
+        return items[start:stop]
+
+    # Sets
+    def cmd_sadd(self, data, key, *members):
+        items = self._get(data, key, set)
+        if items is None:
+            items = data[key] = set()
+        added = len(set(members) - items)
+        items.update(members)
+        return added
+
+    def cmd_sismember(self, data, key, member):
+        return int(member in (self._get(data, key, set) or ()))
+
+    def cmd_scard(self, data, key):
+        return len(self._get(data, key, set) or ())
+
+    # Hashes
+    def _hash(self, data, key):
+        items = self._get(data, key, dict)
+        if items is None:
+            items = data[key] = {}
+        return items
+
+    def cmd_hset(self, data, key, *pairs):
+        items = self._hash(data, key)
+        added = 0
+        for field, value in zip(pairs[::2], pairs[1::2]):
+            added += field not in items
+            items[field] = value
+        return added
+
+    def cmd_hsetnx(self, data, key, field, value):
+        items = self._hash(data, key)
+        if field in items:
+            return 0
+        items[field] = value
+        return 1
+
+    def cmd_hget(self, data, key, field):
+        return (self._get(data, key, dict) or {}).get(field)
+
+    def cmd_hincrby(self, data, key, field, amount):
+        items = self._hash(data, key)
+        items[field] = str(int(items.get(field, 0)) + int(amount))
+        return int(items[field])
+
+    def cmd_hlen(self, data, key):
+        return len(self._get(data, key, dict) or {})
+
+    def cmd_hgetall(self, data, key):
+        return [item for pair in (self._get(data, key, dict) or {}).items() for item in pair]
+
+    # Sorted sets
+    def _zset(self, data, key):
+        items = self._get(data, key, ZSet)
+        if items is None:
+            items = data[key] = ZSet()
+        return items
+
+    def cmd_zadd(self, data, key, *args):
+        flags = set()
+        while args and args[0].upper() in ('XX', 'NX', 'CH'):
+            flags.add(args[0].upper())
+            args = args[1:]
+        items = self._zset(data, key)
+        added = 0
+        for score, member in zip(args[::2], args[1::2]):
+            exists = member in items
+            if ('XX' in flags and not exists) or ('NX' in flags and exists):
+                continue
+            added += not exists
+            items[member] = float(score)
+        if not items:
+            del data[key]
+        return added
+
+    def cmd_zrem(self, data, key, *members):
+        items = self._get(data, key, ZSet) or ZSet()
+        removed = sum(items.pop(member, None) is not None for member in members)
+        if not items and key in data:
+            del data[key]
+        return removed
+
+    def cmd_zscore(self, data, key, member):
+        score = (self._get(data, key, ZSet) or {}).get(member)
+        return None if score is None else repr(score)
+
+    def cmd_zcard(self, data, key):
+        return len(self._get(data, key, ZSet) or ())
+
+    def cmd_zrangebyscore(self, data, key, low, high):
+        items = self._get(data, key, ZSet) or ZSet()
+        ordered = sorted(items.items(), key=lambda item: (item[1], item[0]))
+        scores = [score for _, score in ordered]
+        start = bisect.bisect_left(scores, float(low))
+        stop = bisect.bisect_right(scores, float(high))
+        return [member for member, _ in ordered[start:stop]]
+
+
+class ZSet(dict):
+    """A sorted set as {member: score}."""
+
+
+def encode(value):
+    if value is None:
+        return b'$-1\r\n'
+    if isinstance(value, RespError):
+        return b'-%s\r\n' % str(value).encode()
+    if isinstance(value, int):
+        return b':%d\r\n' % value
+    if isinstance(value, list):
+        return b'*%d\r\n' % len(value) + b''.join(encode(item) for item in value)
+    if value == 'OK' or value == 'PONG':
+        return b'+%s\r\n' % value.encode()
+    data = str(value).encode('utf-8')
+    return b'$%d\r\n%s\r\n' % (len(data), data)
+
+
+def read_command(stream):
+    """Read one RESP array of bulk strings; returns None at end of stream."""
+    line = stream.readline()
+    if not line:
+        return None
+    if not line.startswith(b'*'):
+        # Inline command, e.g. typed into telnet
+        return line.decode('utf-8').split()
+    args = []
+    for _ in range(int(line[1:])):
+        length = int(stream.readline()[1:])
+        args.append(stream.read(length + 2)[:-2].decode('utf-8'))
+    return args
+
+
+def make_handler(store):
+    class Handler(socketserver.StreamRequestHandler):
+        def handle(self):
+            db = 0
+            while True:
+                command = read_command(self.rfile)
+                if command is None:
+                    return
+                if not command:
+                    continue
+                name, args = command[0].upper(), command[1:]
+                try:
+                    if name == 'SELECT':
+                        db, reply = int(args[0]), 'OK'
+                    elif name == 'AUTH':
+                        reply = 'OK'
+                    else:
+                        reply = store.run(db, name, args)
+                except RespError as e:
+                    reply = e
+                except (TypeError, ValueError, IndexError):
+                    reply = RespError(f"ERR wrong arguments for '{name}' command")
+                self.wfile.write(encode(reply))
+
+    return Handler
+
+
+class RedisStandIn:
+    """A threaded stand-in server on 127.0.0.1 (port 0 picks a free port), usable as a context manager."""
+
+    def __init__(self, port=0):
+        self.store = Store()
+        self._server = socketserver.ThreadingTCPServer(('127.0.0.1', port), make_handler(self.store))
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        return f'redis://127.0.0.1:{self._server.server_address[1]}/0'
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--port', type=int, default=6379)
+    args = parser.parse_args()
+    server = RedisStandIn(args.port)
+    print(f"Redis stand-in listening on {server.url} (Ctrl+C to stop)")
+    try:
+        server._server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server._server.server_close()
+
+
+if __name__ == '__main__':
+    main()
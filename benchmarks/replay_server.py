@@ -0,0 +1,175 @@
+"""
+Local HTTP server that replays the recorded result pages in
+benchmarks/fixtures/ with each platform's URL scheme and pagination:
+
+    eBay     /sch/i.html?_nkw=<query>&_pgn=<page>
+    Walmart  /search?q=<query>&page=<page>
+    Amazon   /s?k=<query>&page=<page>
+    Airbnb   /s/<place>/homes
+
+Pages past the recorded ones come back without results. Every response is
+delayed by `latency` (plus up to `jitter`) seconds, and with `rate_limit`
+the server answers 429 with a Retry-After header once clients exceed that
+many requests per second. With a `certfile` (a PEM file holding a
+certificate and its key) it serves HTTPS. Run it standalone to point a
+scraper at it:
+
+    python benchmarks/replay_server.py --port 8800 --latency 0.2 --rate-limit 5
+"""
+import argparse
+import glob
+import os
+import random
+import ssl
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+
+EMPTY_PAGE = b'<!DOCTYPE html><html><head><title>No results</title></head><body><main></main></body></html>'
+
+
+def load_fixtures(directory=FIXTURES_DIR):
+    """Map (platform, page) to the recorded page bytes."""
+    pages = {}
+    for path in glob.glob(os.path.join(directory, '*_page*.html')):
+        platform, page = os.path.basename(path)[:-len('.html')].split('_page')
+        with open(path, 'rb') as f:
+            pages[(platform, int(page))] = f.read()
+    return pages
+
+
+def route(path):
+    """Return (platform, page) for a request path, or None."""
+    parts = urlsplit(path)
+    params = parse_qs(parts.query)
+    if parts.path == '/sch/i.html':
+        return 'ebay', int(params.get('_pgn', ['1'])[0])
+    if parts.path == '/search':
+        return 'walmart', int(params.get('page', ['1'])[0])
+    if parts.path == '/s':
+        return 'amazon', int(params.get('page', ['1'])[0])
+    if parts.path.startswith('/s/') and parts.path.endswith('/homes'):
+        return 'airbnb', 1
+    return None
+
+
+class ReplayServer:
+    """A ThreadingHTTPServer serving the fixtures on 127.0.0.1 in a background thread."""
+
+    def __init__(self, latency=0.0, jitter=0.0, rate_limit=None, port=0, fixtures_dir=FIXTURES_DIR, certfile=None):
+        self.latency = latency
+        self.jitter = jitter
+        self.rate_limit = rate_limit
+        self.pages = load_fixtures(fixtures_dir)
+        self.requests = 0
+        self.throttled = 0
+        self._window = []
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(('127.0.0.1', port), self._make_handler())
+        self.scheme = 'http'
+        if certfile:
+            context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+            context.load_cert_chain(certfile)
+            self._server.socket = context.wrap_socket(self._server.socket, server_side=True)
+            self.scheme = 'https'
+        self._thread = None
+
+    @property
+    def base_url(self):
+        return f'{self.scheme}://127.0.0.1:{self._server.server_address[1]}'
+
+    @property
+    def host(self):
+        return urlsplit(self.base_url).netloc
+
+    def _over_limit(self):
+        # Sliding one-second window of accepted requests
+        with self._lock:
+            self.requests += 1
+            if not self.rate_limit:
+                return False
+            now = time.monotonic()
+            self._window = [t for t in self._window if now - t < 1.0]
+            if len(self._window) >= self.rate_limit:
+                self.throttled += 1
+                return True
+            self._window.append(now)
+            return False
+
+    def _make_handler(self):
+        server = self
+
+        class ReplayHandler(BaseHTTPRequestHandler):
+            # Keep connections open between requests, as real sites do
+            protocol_version = 'HTTP/1.1'
+
+            def do_GET(self):
+                if server._over_limit():
+                    self.respond(429, b'Too Many Requests', {'Retry-After': '1'})
+                    return
+                time.sleep(server.latency + random.uniform(0, server.jitter))
+                target = route(self.path)
+                if target is None:
+                    self.respond(404, b'Not Found')
+                    return
+                self.respond(200, server.pages.get(target, EMPTY_PAGE), {'Content-Type': 'text/html; charset=utf-8'})
+
+            def handle(self):
+                try:
+                    super().handle()
+                except (BrokenPipeError, ConnectionResetError):
+                    pass  # the client stopped reading after the results (see streaming.py)
+
+            def respond(self, status, body, headers=None):
+                self.send_response(status)
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return ReplayHandler
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--port', type=int, default=8800)
+    parser.add_argument('--latency', type=float, default=0.2, help='seconds added to every response')
+    parser.add_argument('--jitter', type=float, default=0.0, help='random extra latency up to this many seconds')
+    parser.add_argument('--rate-limit', type=float, help='requests per second before answering 429')
+    args = parser.parse_args()
+
+    server = ReplayServer(args.latency, args.jitter, args.rate_limit, args.port)
+    print(f"Replaying {len(server.pages)} recorded pages on {server.base_url} (Ctrl+C to stop)")
+    try:
+        server._server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server._server.server_close()
+        print(f"Served {server.requests} requests, {server.throttled} answered with 429")
+
+
+if __name__ == '__main__':
+    main()
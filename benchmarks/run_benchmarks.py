@@ -0,0 +1,219 @@
+"""
+Offline end-to-end benchmarks of the scrapers against the replay server.
+
+Each scenario starts a ReplayServer (benchmarks/replay_server.py) with its
+own latency and rate limit and drives a real entry point through it:
+EbayScraper/WalmartScraper.search_products, amazon.extract_product_urls and
+airbnb.extract_urls (HTTP fast path only; no browser, no page cache). The
+report shows pages/s and URLs/s (the median of --repeat runs, so one slow
+run does not fail the comparison), p50/p95 page fetch latency and peak RSS,
+and is compared with the stored baseline in benchmarks/baseline.json:
+
+    python benchmarks/run_benchmarks.py                   # all scenarios, compare with the baseline
+    python benchmarks/run_benchmarks.py ebay amazon       # selected scenarios
+    python benchmarks/run_benchmarks.py --save-baseline   # record a new baseline
+
+Exits with status 1 when a scenario returns a different number of URLs than
+the baseline, or is slower than it by more than --tolerance.
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import statistics
+import sys
+import threading
+import time
+from collections import namedtuple
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+try:
+    import psutil
+except ImportError:  # peak RSS falls back to the process high-water mark
+    psutil = None
+    import resource
+
+import airbnb
+import amazon
+from ebay import EbayScraper
+from metrics import metrics
+from rate_control import get_controller
+from replay_server import ReplayServer
+from walmart import WalmartScraper
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline.json')
+
+# `client_rate` is the starting requests/s of the scraper's rate controller for the replay host
+Scenario = namedtuple('Scenario', ['name', 'platform', 'pages', 'latency', 'rate_limit', 'client_rate'])
+
+SCENARIOS = [
+    Scenario('ebay', 'ebay', 5, 0.2, None, 20),
+    Scenario('walmart', 'walmart', 5, 0.2, None, 20),
+    Scenario('amazon', 'amazon', 3, 0.3, None, 20),
+    Scenario('airbnb', 'airbnb', 1, 0.5, None, 20),
+    # The server allows 2 requests/s, so the scraper has to back off on 429s
+    Scenario('ebay-rate-limited', 'ebay', 5, 0.05, 2, 20),
+]
+
+
+class NoBrowserPool:
+    """Driver pool stand-in: scenarios must be served by the HTTP fast path."""
+
+    def checkout(self, timeout=None):
+        raise RuntimeError("benchmark scenarios run without a browser")
+
+    def checkin(self, driver):
+        pass
+
+
+def run_search(scenario, base_url, page_callback):
+    if scenario.platform in ('ebay', 'walmart'):
+        scraper = EbayScraper() if scenario.platform == 'ebay' else WalmartScraper()
+        scraper.base_url = base_url
+        scraper.cache = None
+        return scraper.search_products('s24 ultra', max_pages=scenario.pages, page_callback=page_callback)
+    if scenario.platform == 'amazon':
+        original = amazon.AmazonAdapter.base_url
+        amazon.AmazonAdapter.base_url = base_url
+        try:
+            rows = amazon.extract_product_urls('s24 ultra', scenario.pages, pool=NoBrowserPool(), cache=False,
+                                               page_callback=page_callback)
+        finally:
+            amazon.AmazonAdapter.base_url = original
+        return [row['url'] for row in rows]
+    rows = airbnb.extract_urls(f'{base_url}/s/Lisbon/homes', pool=NoBrowserPool(), cache=False,
+                               page_callback=page_callback)
+    return [row['url'] for row in rows]
+
+
+class PeakRss:
+    """Samples this process's RSS in the background and keeps the peak (in MB)."""
+
+    def __init__(self, interval=0.02):
+        self.interval = interval
+        self.peak = 0.0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _sample(self):
+        if psutil is not None:
+            return psutil.Process().memory_info().rss / (1024 * 1024)
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024  # KB on Linux
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.peak = max(self.peak, self._sample())
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, self._sample())
+
+
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+    if len(values) == 1:
+        return values[0]
+    return statistics.quantiles(values, n=100, method='inclusive')[round(fraction * 100) - 1]
+
+
+def run_scenario(scenario, repeat, verbose=False):
+    throttled = 0
+    pages_per_s, urls_per_s = [], []
+    latencies = []
+    url_counts = set()
+    with PeakRss() as rss:
+        for _ in range(repeat):
+            # The scrapers' output (including late requests after an early stop) is hidden unless --verbose
+            output = contextlib.nullcontext() if verbose else contextlib.redirect_stdout(io.StringIO())
+            with output, ReplayServer(scenario.latency, rate_limit=scenario.rate_limit) as server:
+                get_controller(server.base_url, rate=scenario.client_rate, max_rate=scenario.client_rate * 2)
+                metrics.reset()
+                page_count = []
+                start = time.perf_counter()
+                found = run_search(scenario, server.base_url, lambda page, new: page_count.append(page))
+                elapsed = time.perf_counter() - start
+                pages_per_s.append(len(page_count) / elapsed)
+                urls_per_s.append(len(found) / elapsed)
+                url_counts.add(len(found))
+                latencies.extend(metrics.span_durations('fetch'))
+                throttled += server.throttled
+    return {
+        'urls': max(url_counts),
+        'pages_per_s': round(statistics.median(pages_per_s), 2),
+        'urls_per_s': round(statistics.median(urls_per_s), 1),
+        'p50_ms': round(percentile(latencies, 0.50) * 1000, 1),
+        'p95_ms': round(percentile(latencies, 0.95) * 1000, 1),
+        'peak_rss_mb': round(rss.peak, 1),
+        'throttled': throttled,
+    }
+
+
+def compare(name, result, baseline, tolerance):
+    """Return the problems of `result` relative to the baseline entry."""
+    problems = []
+    if result['urls'] != baseline['urls']:
+        problems.append(f"returned {result['urls']} URLs, baseline {baseline['urls']}")
+    for key in ('pages_per_s', 'urls_per_s'):
+        if result[key] < baseline[key] * (1 - tolerance):
+            problems.append(f"{key} {result[key]} vs baseline {baseline[key]}")
+    if result['p95_ms'] > baseline['p95_ms'] * (1 + tolerance) + 5:
+        problems.append(f"p95 {result['p95_ms']} ms vs baseline {baseline['p95_ms']} ms")
+    return problems
+
+
+def main():
+    names = [scenario.name for scenario in SCENARIOS]
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('scenarios', nargs='*', help=f"scenarios to run (default: all of {', '.join(names)})")
+    parser.add_argument('--repeat', type=int, default=5, help='runs per scenario; rates are their median')
+    parser.add_argument('--baseline', default=BASELINE_PATH, help='baseline file (default: %(default)s)')
+    parser.add_argument('--save-baseline', action='store_true', help='store these results as the new baseline')
+    parser.add_argument('--verbose', action='store_true', help="show the scrapers' own output")
+    parser.add_argument('--tolerance', type=float, default=0.25, help='allowed relative slowdown (default: %(default)s)')
+    args = parser.parse_args()
+
+    unknown = set(args.scenarios) - set(names)
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+    selected = [scenario for scenario in SCENARIOS if not args.scenarios or scenario.name in args.scenarios]
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)
+
+    results = {}
+    failures = 0
+    print(f"{'scenario':<20}{'URLs':>6}{'pages/s':>10}{'URLs/s':>10}{'p50 ms':>9}{'p95 ms':>9}{'RSS MB':>9}{'429s':>6}")
+    for scenario in selected:
+        result = results[scenario.name] = run_scenario(scenario, args.repeat, args.verbose)
+        print(f"{scenario.name:<20}{result['urls']:>6}{result['pages_per_s']:>10}{result['urls_per_s']:>10}"
+              f"{result['p50_ms']:>9}{result['p95_ms']:>9}{result['peak_rss_mb']:>9}{result['throttled']:>6}")
+        if not args.save_baseline and scenario.name in baseline:
+            for problem in compare(scenario.name, result, baseline[scenario.name], args.tolerance):
+                print(f"  REGRESSION: {problem}")
+                failures += 1
+
+    if args.save_baseline:
+        baseline.update(results)
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(baseline, f, indent=2, sort_keys=True)
+            f.write('\n')
+        print(f"Baseline saved to {args.baseline}")
+    elif not baseline:
+        print("No baseline to compare with; record one with --save-baseline")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,92 @@
+"""
+Lean Chrome profiles for the Selenium scrapers.
+
+Only `page_source` is read from the browser, so images, fonts, media,
+stylesheets and ad/analytics scripts are wasted work. A lean profile turns
+them off with Chrome preferences, blocks their URLs through the DevTools
+protocol (Network.setBlockedURLs) and adds memory-saving flags. Each
+platform lists in `block` the resource types its result links render
+without.
+"""
+from fnmatch import fnmatch
+
+# URL patterns per blockable resource type (DevTools wildcard syntax)
+RESOURCE_PATTERNS = {
+    'image': ['*.png', '*.png?*', '*.jpg', '*.jpg?*', '*.jpeg', '*.jpeg?*', '*.gif', '*.gif?*',
+              '*.webp', '*.webp?*', '*.avif', '*.avif?*', '*.svg', '*.svg?*', '*.ico', '*.ico?*'],
+    'font': ['*.woff', '*.woff?*', '*.woff2', '*.woff2?*', '*.ttf', '*.ttf?*', '*.otf', '*.otf?*'],
+    'media': ['*.mp4', '*.mp4?*', '*.webm', '*.webm?*', '*.m3u8', '*.m3u8?*', '*.mp3', '*.mp3?*'],
+    'stylesheet': ['*.css', '*.css?*'],
+    'tracking': ['*doubleclick.net*', '*googletagmanager.com*', '*google-analytics.com*',
+                 '*googlesyndication.com*', '*facebook.net*', '*amazon-adsystem.com*',
+                 '*fls-na.amazon.com*', '*unagi.amazon.com*', '*bat.bing.com*',
+                 '*scorecardresearch.com*', '*adnxs.com*', '*criteo.com*', '*criteo.net*', '*hotjar.com*',
+                 '*branch.io*'],
+}
+
+LEAN_PROFILES = {
+    'amazon': {
+        'block': ('image', 'font', 'media', 'stylesheet', 'tracking'),
+        'extra_blocked': ['*images-na.ssl-images-amazon.com/images/*'],
+    },
+    'airbnb': {
+        # Lazy-loaded result cards render as they scroll into view, which needs the layout stylesheets
+        'block': ('image', 'font', 'media', 'tracking'),
+        # Airbnb's own event logging endpoint
+        'extra_blocked': ['*a0.muscache.com/im/*', '*airbnb.com/tracking/*'],
+    },
+}
+
+# Flags that cut browser memory and background work for short-lived scraping sessions
+LEAN_FLAGS = [
+    "--blink-settings=imagesEnabled=false",
+    "--disable-extensions",
+    "--disable-background-networking",
+    "--disable-default-apps",
+    "--disable-sync",
+    "--disable-component-update",
+    "--disable-features=Translate,MediaRouter,OptimizationHints",
+    "--mute-audio",
+    "--no-first-run",
+    "--renderer-process-limit=2",
+    "--disk-cache-size=33554432",
+]
+
+def blocked_patterns(platform):
+    """URL patterns blocked for `platform`."""
+    profile = LEAN_PROFILES[platform]
+    patterns = []
+    for resource in profile['block']:
+        patterns.extend(RESOURCE_PATTERNS[resource])
+    patterns.extend(profile['extra_blocked'])
+    return patterns
+
+def is_blocked(platform, url):
+    """Whether the lean profile of `platform` blocks `url` (for checking a profile offline)."""
+    return any(fnmatch(url, pattern) for pattern in blocked_patterns(platform))
+
+def apply_lean_options(options, platform):
+    """Add the lean preferences and flags for `platform` to Chrome `options`."""
+    profile = LEAN_PROFILES[platform]
+    content_settings = {'notifications': 2, 'geolocation': 2, 'media_stream': 2}
+    if 'image' in profile['block']:
+        content_settings['images'] = 2
+    options.add_experimental_option('prefs', {
+        f'profile.managed_default_content_settings.{name}': value
+        for name, value in content_settings.items()
+    })
+    for flag in LEAN_FLAGS:
+        if flag.startswith('--blink-settings') and 'images' not in content_settings:
+            continue
+        options.add_argument(flag)
+    return options
+
+def enable_request_blocking(driver, platform):
+    """Block the profile's URL patterns in a running Chrome driver via DevTools."""
+    try:
+        driver.execute_cdp_cmd('Network.enable', {})
+        driver.execute_cdp_cmd('Network.setBlockedURLs', {'urls': blocked_patterns(platform)})
+    except Exception as e:  # not a Chromium driver, or DevTools unavailable
+        print(f"Request blocking unavailable for {platform}: {e}")
+        return False
+    return True
@@ -0,0 +1,246 @@
+"""
+Distributed crawling: searches are split into (platform, query, page) tasks
+on a shared queue (see task_queue.py), and any number of workers, on one
+host or several, claim and run them with the regular platform adapters.
+
+    # Queue the searches (page 1 of each; workers queue the following pages)
+    python distributed.py submit queries.txt --queue redis://queue-host:6379/0 --platforms eBay,Walmart
+    # On every worker host
+    python distributed.py worker --queue redis://queue-host:6379/0 --threads 4
+    # Progress, then the merged, deduplicated results
+    python distributed.py status --queue redis://queue-host:6379/0
+    python distributed.py export --queue redis://queue-host:6379/0 --output results.csv
+
+The worker that runs page 1 of a search reads how many pages it has (see
+pagination.py) and queues the rest, so the pages of one large search are
+spread over the workers as well. Workers keep renewing the lease of the
+tasks they are running; the task of a worker that died goes to another
+worker once its lease expires. Results are deduplicated per platform across
+all workers. A single-host queue needs no server: use
+`--queue sqlite:///crawl_queue.sqlite`.
+"""
+import argparse
+import os
+import socket
+import threading
+
+import platforms
+import rate_control
+from batch import read_queries
+from metrics import metrics
+from page_cache import get_default_cache
+from sinks import open_sink
+from task_queue import DEFAULT_LEASE, Task, open_queue
+from url_canon import Deduper
+
+# Display names used by the other CLIs and the app, mapped to platform ids
+PLATFORMS = {platform.id: platform.name for platform in platforms.PLATFORMS.values()}
+
+RESULT_FIELDS = ['platform', 'query', 'page', 'url']
+
+def make_adapter(platform, base_url=None, cache=True):
+    """A PlatformAdapter for one task, set up like the platform's own scraper."""
+    if platform not in PLATFORMS:
+        raise ValueError(f"Unknown platform: {platform}")
+    # Only the platforms a worker actually runs are imported (Amazon and Airbnb load Selenium)
+    module = platforms.load(platform)
+    if platform == 'ebay':
+        scraper = module.EbayScraper()
+        return module.EbayAdapter(base_url or scraper.base_url, scraper.session, scraper.headers, 1,
+                                  scraper.cache if cache else None, scraper.backend, scraper.stream)
+    if platform == 'walmart':
+        scraper = module.WalmartScraper()
+        return module.WalmartAdapter(base_url or scraper.base_url, None, scraper.headers, 1,
+                                     scraper.cache if cache else None, scraper.backend, scraper.stream)
+    if platform == 'amazon':
+        adapter = module.AmazonAdapter(module.get_driver_pool(), get_default_cache() if cache else None)
+    else:
+        adapter = module.AirbnbAdapter(module.get_driver_pool(headless=True), get_default_cache() if cache else None)
+    if base_url:
+        adapter.base_url = base_url
+    return adapter
+
+def run_task(adapter, task):
+    """
+    Fetch and extract one page. Returns (canonical URLs, follow-up tasks):
+    page 1 queues the pages it reports, and when the page count is unknown
+    each page queues the next one while the platform's pagination rule
+    says to go on.
+    """
+    html = adapter.fetch_page(task.query, task.page)
+    if html is None:
+        raise RuntimeError(f"page {task.page} could not be fetched")
+    links = adapter.extract(html)
+    deduper = Deduper(task.platform)
+    urls = [url for url in (deduper.add(adapter.resolve(href)) for href in links.hrefs) if url]
+
+    limit = min(task.max_pages or adapter.page_limit, adapter.page_limit)
+    if task.page == 1:
+        planned = adapter.plan_pages(html)
+        if planned is not None:
+            # The pages carry the planned count, so none of them queues pages past it
+            limit = min(planned, limit)
+            return urls, [Task(task.platform, task.query, page, limit) for page in range(2, limit + 1)]
+    if task.page < limit and adapter.should_continue(task.page, links, urls):
+        return urls, [Task(task.platform, task.query, task.page + 1, task.max_pages)]
+    return urls, []
+
+def submit(queue, queries, platforms, max_pages=None):
+    """Queue page 1 of every (platform, query); returns the number of new tasks."""
+    return queue.put([Task(platform, query, 1, max_pages) for query in queries for platform in platforms])
+
+class Worker:
+    """
+    Claims tasks from a queue and runs them on `threads` threads. Leases are
+    renewed in the background every third of `lease` seconds. `base_urls`
+    maps platform ids to a replacement site URL (e.g. a replay server).
+    """
+
+    def __init__(self, queue, name=None, threads=1, lease=DEFAULT_LEASE, base_urls=None, cache=True,
+                 poll_interval=1.0):
+        self.queue = queue
+        self.name = name or f"{socket.gethostname()}-{os.getpid()}"
+        self.threads = threads
+        self.lease = lease
+        self.base_urls = base_urls or {}
+        self.cache = cache
+        self.poll_interval = poll_interval
+        self.stop_event = threading.Event()
+        self.tasks_done = 0
+        self.tasks_failed = 0
+        self.urls = 0
+        self._active = set()
+        self._lock = threading.Lock()
+
+    def _renew_leases(self):
+        while not self.stop_event.wait(self.lease / 3):
+            with self._lock:
+                active = list(self._active)
+            for task in active:
+                if not self.queue.renew(task, self.name, self.lease):
+                    print(f"Lost the lease of {task.platform} '{task.query}' page {task.page}")
+
+    def _work(self, exit_when_idle):
+        while not self.stop_event.is_set():
+            task = self.queue.claim(self.name, self.lease)
+            if task is None:
+                counts = self.queue.counts()
+                # Running tasks elsewhere may still queue follow-up pages
+                if exit_when_idle and not counts['queued'] and not counts['leased']:
+                    return
+                self.stop_event.wait(self.poll_interval)
+                continue
+            with self._lock:
+                self._active.add(task)
+            try:
+                adapter = make_adapter(task.platform, self.base_urls.get(task.platform), self.cache)
+                try:
+                    urls, next_tasks = run_task(adapter, task)
+                finally:
+                    adapter.close()
+                added = self.queue.complete(task, self.name, urls, next_tasks)
+                metrics.count('tasks_done', platform=task.platform)
+                with self._lock:
+                    self.tasks_done += 1
+                    self.urls += added
+                print(f"[{self.name}] {task.platform} '{task.query}' page {task.page}: "
+                      f"{added} new URLs, {len(next_tasks)} pages queued")
+            except Exception as e:
+                metrics.count('tasks_failed', platform=task.platform)
+                with self._lock:
+                    self.tasks_failed += 1
+                print(f"[{self.name}] {task.platform} '{task.query}' page {task.page} failed: {e}")
+                self.queue.fail(task, self.name, e)
+            finally:
+                with self._lock:
+                    self._active.discard(task)
+
+    def run(self, exit_when_idle=False):
+        """Work until stop_event is set (Ctrl+C) or, with `exit_when_idle`, until the queue is drained."""
+        renewer = threading.Thread(target=self._renew_leases, daemon=True)
+        renewer.start()
+        threads = [threading.Thread(target=self._work, args=(exit_when_idle,), daemon=True)
+                   for _ in range(self.threads)]
+        for thread in threads:
+            thread.start()
+        try:
+            for thread in threads:
+                while thread.is_alive():
+                    thread.join(0.5)
+        except KeyboardInterrupt:
+            print("\nStopping: unfinished tasks go back on the queue when their leases expire")
+        finally:
+            self.stop_event.set()
+        print(f"[{self.name}] {self.tasks_done} tasks done, {self.tasks_failed} failed, {self.urls} new URLs")
+
+def parse_platforms(parser, names):
+    known = {name.lower(): platform for platform, name in PLATFORMS.items()}
+    platforms = []
+    for name in names.split(','):
+        if name.strip().lower() not in known:
+            parser.error(f"unknown platform {name.strip()!r} (choose from {', '.join(PLATFORMS.values())})")
+        platforms.append(known[name.strip().lower()])
+    return platforms
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--queue', default='sqlite:///crawl_queue.sqlite',
+                        help='sqlite:///path or redis://host:port/db (default: %(default)s)')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    submit_parser = commands.add_parser('submit', help='queue searches')
+    submit_parser.add_argument('queries', help='file with one search query per line, or - for stdin')
+    submit_parser.add_argument('--platforms', default='Amazon,eBay,Walmart',
+                               help='comma-separated platforms (default: %(default)s)')
+    submit_parser.add_argument('--num-pages', type=int, help='result pages per search (default: all pages)')
+
+    worker_parser = commands.add_parser('worker', help='claim and run tasks')
+    worker_parser.add_argument('--threads', type=int, default=2, help='tasks run at once (default: %(default)s)')
+    worker_parser.add_argument('--lease', type=float, default=DEFAULT_LEASE,
+                               help='seconds a claimed task stays reserved without renewal (default: %(default)s)')
+    worker_parser.add_argument('--name', help='worker name (default: host-pid)')
+    worker_parser.add_argument('--exit-when-idle', action='store_true', help='stop once no task is queued or running')
+    worker_parser.add_argument('--base-url', action='append', default=[], metavar='PLATFORM=URL',
+                               help='fetch a platform from another site, e.g. a replay server')
+    worker_parser.add_argument('--no-cache', action='store_true', help='do not use the page cache')
+    worker_parser.add_argument('--rate', type=float, help='starting requests/s per host')
+
+    commands.add_parser('status', help='show task counts and failures')
+
+    export_parser = commands.add_parser('export', help='write the merged results')
+    export_parser.add_argument('--output', default='distributed_results.csv',
+                               help='.csv, .jsonl or .parquet file (default: %(default)s)')
+    args = parser.parse_args()
+
+    queue = open_queue(args.queue)
+    try:
+        if args.command == 'submit':
+            platforms = parse_platforms(submit_parser, args.platforms)
+            queries = read_queries(args.queries)
+            added = submit(queue, queries, platforms, args.num_pages)
+            print(f"Queued {added} new searches ({len(queries)} queries on {len(platforms)} platforms)")
+        elif args.command == 'worker':
+            base_urls = {}
+            for value in args.base_url:
+                name, _, url = value.partition('=')
+                base_urls[parse_platforms(worker_parser, name)[0]] = url
+            if args.rate:
+                rate_control.configure(rate=args.rate, max_rate=args.rate * 2, burst=max(4, int(args.rate)))
+            Worker(queue, args.name, args.threads, args.lease, base_urls, not args.no_cache).run(args.exit_when_idle)
+        elif args.command == 'status':
+            counts = queue.counts()
+            print(', '.join(f"{state}: {count}" for state, count in counts.items()))
+            for task, error in queue.failures():
+                print(f"  failed: {task.platform} '{task.query}' page {task.page}: {error}")
+        elif args.command == 'export':
+            with open_sink(args.output, RESULT_FIELDS) as sink:
+                count = 0
+                for record in queue.results():
+                    sink.write(record)
+                    count += 1
+            print(f"Wrote {count} URLs to {args.output}")
+    finally:
+        queue.close()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,175 @@
+import atexit
+import queue
+import threading
+import time
+from contextlib import contextmanager
+
+from metrics import metrics
+
+try:
+    import psutil
+except ImportError:  # memory-based recycling is skipped without psutil
+    psutil = None
+
+class DriverPool:
+    """
+    A pool of long-lived Selenium WebDrivers.
+
+    Drivers are created lazily by `factory` (e.g. `setup_driver`) up to
+    `size` at a time, handed out with checkout() and returned with checkin().
+    A driver is health-checked before every checkout and is recycled once it
+    has served `max_uses` checkouts or its browser processes exceed
+    `max_memory_mb` of RSS.
+    """
+
+    def __init__(self, factory, size=2, max_uses=50, max_memory_mb=None, checkout_timeout=60, name=None):
+        self.factory = factory
+        self.name = name
+        self.size = size
+        self.max_uses = max_uses
+        self.max_memory_mb = max_memory_mb
+        self.checkout_timeout = checkout_timeout
+        # LIFO so the most recently used (warmest) driver is handed out first
+        self._idle = queue.LifoQueue()
+        self._uses = {}
+        self._created = 0
+        self._lock = threading.Lock()
+        self._closed = False
+
+    def _launch(self):
+        start = time.perf_counter()
+        with metrics.span('driver_startup', pool=self.name):
+            driver = self.factory()
+        print(f"Started browser in {time.perf_counter() - start:.2f}s")
+        self._uses[id(driver)] = 0
+        return driver
+
+    def _discard(self, driver):
+        self._uses.pop(id(driver), None)
+        with self._lock:
+            self._created -= 1
+        try:
+            driver.quit()
+        except Exception as e:
+            print(f"Error shutting down browser: {e}")
+
+    def _is_healthy(self, driver):
+        try:
+            return driver.execute_script("return 1") == 1
+        except Exception:
+            return False
+
+    def memory_mb(self, driver):
+        """Return the combined RSS of the driver's browser processes, or None if unknown."""
+        if psutil is None:
+            return None
+        try:
+            process = psutil.Process(driver.service.process.pid)
+            processes = [process] + process.children(recursive=True)
+            return sum(p.memory_info().rss for p in processes) / (1024 * 1024)
+        except (AttributeError, psutil.Error):
+            return None
+
+    def checkout(self, timeout=None):
+        """
+        Return a healthy driver, launching one if the pool is below its size.
+
+        Raises TimeoutError if no driver becomes available within `timeout`
+        seconds (defaults to the pool's checkout_timeout).
+        """
+        if self._closed:
+            raise RuntimeError("Driver pool is closed")
+        timeout = self.checkout_timeout if timeout is None else timeout
+        deadline = time.monotonic() + timeout
+
+        while True:
+            try:
+                driver = self._idle.get_nowait()
+            except queue.Empty:
+                with self._lock:
+                    can_launch = self._created < self.size
+                    if can_launch:
+                        self._created += 1
+                if can_launch:
+                    try:
+                        return self._launch()
+                    except Exception:
+                        with self._lock:
+                            self._created -= 1
+                        raise
+                remaining = deadline - time.monotonic()
+                try:
+                    driver = self._idle.get(timeout=max(remaining, 0))
+                except queue.Empty:
+                    raise TimeoutError(f"No browser available after {timeout}s")
+
+            if self._is_healthy(driver):
+                return driver
+            print("Discarding unresponsive browser")
+            self._discard(driver)
+
+    def checkin(self, driver):
+        """Return a driver to the pool, recycling it if it is worn out."""
+        uses = self._uses.get(id(driver), 0) + 1
+        self._uses[id(driver)] = uses
+
+        if self._closed or uses >= self.max_uses:
+            self._discard(driver)
+            return
+        if self.max_memory_mb is not None:
+            memory = self.memory_mb(driver)
+            if memory is not None and memory > self.max_memory_mb:
+                print(f"Recycling browser using {memory:.0f} MB")
+                self._discard(driver)
+                return
+        if not self._is_healthy(driver):
+            self._discard(driver)
+            return
+        self._idle.put(driver)
+
+    @contextmanager
+    def driver(self, timeout=None):
+        """Check out a driver for the duration of a `with` block."""
+        driver = self.checkout(timeout)
+        try:
+            yield driver
+        finally:
+            self.checkin(driver)
+
+    def warm(self, count=None):
+        """Launch idle drivers ahead of time so the first search starts warm."""
+        drivers = [self.checkout() for _ in range(count or self.size)]
+        for driver in drivers:
+            self.checkin(driver)
+
+    def close(self):
+        """Quit all idle drivers; checked-out drivers are quit on checkin."""
+        self._closed = True
+        while True:
+            try:
+                driver = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self._discard(driver)
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+def get_pool(name, factory, **kwargs):
+    """
+    Return the process-wide pool registered under `name`, creating it with
+    `factory` and `kwargs` on first use. Every scraper and Streamlit session
+    in the process shares the same pool.
+    """
+    with _pools_lock:
+        if name not in _pools:
+            _pools[name] = DriverPool(factory, name=name, **kwargs)
+        return _pools[name]
+
+@atexit.register
+def close_all_pools():
+    """Quit every pooled browser; runs automatically at interpreter exit."""
+    with _pools_lock:
+        for pool in _pools.values():
+            pool.close()
+        _pools.clear()
@@ -1,9 +1,43 @@
-import requests
-from bs4 import BeautifulSoup
-import csv
-import time
-import random
-from urllib.parse import urljoin, quote_plus
+from urllib.parse import quote_plus
+from engine import HttpAdapter, ScrapeEngine
+from http_client import get_session
+from page_cache import get_default_cache
+from sinks import CsvSink
+
+class EbayAdapter(HttpAdapter):
+    """eBay search pages: 240 items per page; the page count is read from page 1 and a page without a next-page link ends the search."""
+
+    platform = 'ebay'
+    page_size = 240
+    # eBay shows at most 10,000 results, 42 pages of 240
+    page_limit = 42
+
+    def __init__(self, base_url="https://www.ebay.com", *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.base_url = base_url
+
+    def search_url(self, query, page):
+        # Construct the search URL with pagination
+        encoded_query = quote_plus(query)
+        if page == 1:
+            return f"{self.base_url}/sch/i.html?_nkw={encoded_query}&_ipg=240"  # 240 items per page
+        return f"{self.base_url}/sch/i.html?_nkw={encoded_query}&_ipg=240&_pgn={page}"
+
+    def should_continue(self, page, links, new_urls):
+        if not links.hrefs:
+            print("No more products found.")
+            return False
+        if not new_urls:
+            print("No new products found on this page.")
+            return False
+        # Get total number of items if available
+        if links.total_count:
+            print(f"Total items found: {links.total_count}")
+        # Check for next page button
+        if not links.has_next:
+            print("No next page button found.")
+            return False
+        return True
 
 class EbayScraper:
     def __init__(self):
@@ -21,116 +55,65 @@ class EbayScraper:
             'Upgrade-Insecure-Requests': '1',
             'DNT': '1'  # Do Not Track header
         }
-        self.session = requests.Session()
-        
-    def search_products(self, query):
-        products = []
-        page = 1
-        
-        try:
-            while True:
-                print(f"Scraping page {page}...")
-                
-                # Construct the search URL with pagination
-                encoded_query = quote_plus(query)
-                if page == 1:
-                    search_url = f"{self.base_url}/sch/i.html?_nkw={encoded_query}&_ipg=240"  # 240 items per page
-                else:
-                    search_url = f"{self.base_url}/sch/i.html?_nkw={encoded_query}&_ipg=240&_pgn={page}"
-                
-                print(f"Fetching URL: {search_url}")
-                
-                # Use session to maintain cookies
-                response = self.session.get(search_url, headers=self.headers)
-                
-                if response.status_code != 200:
-                    print(f"Failed to fetch page {page}. Status code: {response.status_code}")
-                    break
-                
-                soup = BeautifulSoup(response.text, 'html.parser')
-                
-                # Find all product listings
-                product_listings = soup.find_all('div', class_='s-item__wrapper')
-                
-                if not product_listings:
-                    # Try alternative selector
-                    product_listings = soup.find_all('div', class_='s-item')
-                    
-                if not product_listings:
-                    print("No product listings found. Trying alternative selectors...")
-                    # Try to find direct product links
-                    product_listings = soup.find_all('a', class_='s-item__link')
-                
-                if not product_listings:
-                    print("No more products found.")
-                    break
-                
-                new_products_found = False
-                for listing in product_listings:
-                    # Try to find the product link
-                    product_link = listing.find('a', class_='s-item__link') if hasattr(listing, 'find') else listing
-                    
-                    if product_link and product_link.get('href'):
-                        product_url = product_link['href']
-                        
-                        # Filter out non-product URLs and sponsored links
-                        if '/itm/' in product_url and product_url not in products:
-                            # Clean the URL by removing tracking parameters
-                            clean_url = product_url.split('?')[0]
-                            print(f"Found product URL: {clean_url}")
-                            products.append(clean_url)
-                            new_products_found = True
-                
-                if not new_products_found:
-                    print("No new products found on this page.")
-                    break
-                
-                # Check for next page button
-                next_button = soup.find('a', {'aria-label': 'Next page'})
-                if not next_button:
-                    print("No next page button found.")
-                    break
-                
-                # Get total number of items if available
-                total_items = soup.find('h1', class_='srp-controls__count-heading')
-                if total_items:
-                    print(f"Total items found: {total_items.text.strip()}")
-                
-                # Random delay between requests (2-4 seconds)
-                delay = random.uniform(2, 4)
-                print(f"Waiting {delay:.2f} seconds before next request...")
-                time.sleep(delay)
-                
-                page += 1
-                
-                # Optional: limit to first 5 pages
-                if page > 5:
-                    print("Reached maximum page limit.")
-                    break
-                
-        except Exception as e:
-            print(f"An error occurred: {str(e)}")
-            import traceback
-            print(traceback.format_exc())
+        # Keep-alive connections and cookies shared with every other scrape in the process
+        self.session = get_session()
+        # Extraction backend: None picks the fastest available (see extraction.py)
+        self.backend = None
+        # Page cache shared with the other scrapers; set to None to always hit the network
+        self.cache = get_default_cache()
+        # Parse pages as they download and stop reading after the results (see streaming.py)
+        self.stream = True
         
-        return products
+    def build_search_url(self, query, page):
+        return EbayAdapter(self.base_url).search_url(query, page)
+
+    def search_products(self, query, max_pages=None, per_host_limit=4, progress_callback=None, seen=None,
+                        page_callback=None, cancel_event=None, index=None, url_callback=None, strict=False):
+        """
+        Fetch the result pages of `query` and extract the product URLs from
+        them in page order (see engine.py). Page 1 tells how many pages there
+        are; the rest are fetched concurrently, at most `per_host_limit` at a
+        time, up to `max_pages` (None: every page, up to the adapter's
+        `page_limit`).
+
+        URLs are reduced to `https://www.ebay.com/itm/<item id>` and
+        deduplicated; pass a persistent `seen` set (see url_canon) to also
+        skip items found by earlier runs. `page_callback(page, urls)` receives
+        the new URLs of each page as soon as it is processed, and setting
+        `cancel_event` stops the search after the current page. With a
+        url_index.UrlIndex as `index`, only URLs new since earlier runs of the
+        query are returned (a delta crawl). With `stream` on, `url_callback(page,
+        url)` receives every product URL the moment it is parsed, before its
+        page has finished downloading (duplicates included). With `strict`, a
+        search that fails part way raises engine.ScrapeError instead of
+        returning the URLs found so far.
+        """
+        # Use session to maintain cookies
+        adapter = EbayAdapter(self.base_url, self.session, self.headers, per_host_limit, self.cache, self.backend,
+                              self.stream, url_callback)
+        delta = index.start_run('ebay', query) if index is not None else None
+        return ScrapeEngine(adapter).run(
+            query, max_pages, seen=seen, page_callback=page_callback,
+            progress_callback=progress_callback, cancel_event=cancel_event, delta=delta, strict=strict,
+        )
     
     def save_to_csv(self, products, filename):
-        with open(filename, 'w', newline='', encoding='utf-8') as file:
-            writer = csv.writer(file)
-            writer.writerow(['Product URL'])
-            for url in products:
-                writer.writerow([url])
+        with CsvSink(filename, ['Product URL']) as sink:
+            sink.write_many({'Product URL': url} for url in products)
 
 def main():
     scraper = EbayScraper()
     search_query = input("Enter your search query (e.g., 's24 ultra'): ")
     
-    print("Starting scraping process...")
-    products = scraper.search_products(search_query)
-    
     filename = f"ebay_{search_query.replace(' ', '_')}_products.csv"
-    scraper.save_to_csv(products, filename)
+    
+    print("Starting scraping process...")
+    # Rows are written to the CSV page by page as they are extracted
+    with CsvSink(filename, ['Product URL']) as sink:
+        products = scraper.search_products(
+            search_query,
+            page_callback=lambda page, urls: sink.write_many({'Product URL': url} for url in urls),
+        )
     
     print(f"\nScraping completed!")
     print(f"Found {len(products)} unique product URLs")
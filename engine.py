@@ -0,0 +1,414 @@
+"""
+Pipelined scraping engine shared by all platform scrapers.
+
+A search runs as three stages joined by bounded queues:
+
+    fetch (adapter.fetch_pages) -> parse/extract (adapter.extract) -> collect
+
+so fetching page N+1 overlaps with extracting page N, and a slow stage
+holds the others back by at most `queue_size` pages. With a parse pool
+(see parse_pool.py), extraction runs in worker processes and several pages
+can be parsed at once. Each platform plugs in
+a PlatformAdapter that knows its search URLs, how to fetch a page, how to
+extract result links and when pagination ends. Collecting (canonical URLs,
+deduplication, callbacks) happens on the calling thread.
+"""
+import queue
+import threading
+from concurrent.futures import Future
+from contextlib import closing
+from urllib.parse import urljoin, urlsplit
+
+from async_fetch import AsyncFetcher
+from extraction import extract_links
+from metrics import metrics
+from pagination import parse_count, plan_page_count
+from parse_pool import get_parse_pool
+from tiered import fetch_tiered
+from url_canon import Deduper, canonicalize
+
+# End of a stage's output: _END after the last page of the results, _DONE after a page cap or a failure
+_DONE = object()
+_END = object()
+
+class StageError:
+    """Carries an exception from a pipeline stage to the collecting thread."""
+
+    def __init__(self, error):
+        self.error = error
+
+class ScrapeError(Exception):
+    """A search that could not be finished; `urls` holds the URLs found before it failed."""
+
+    def __init__(self, message, urls=()):
+        super().__init__(message)
+        self.urls = list(urls)
+
+class PlatformAdapter:
+    """
+    Describes how one platform's search pages are fetched and read.
+
+    Subclasses set `platform` and `base_url` and implement search_url() and
+    fetch_pages(); extract(), resolve() and should_continue() have defaults.
+    `page_limit` bounds searches run without `max_pages`, and fetch_pages()
+    sets `page_count` once it knows how many pages it will fetch, and
+    `reached_end` once it has fetched the last page of the results (not just
+    the last page allowed by `max_pages` or `page_limit`). With `stream`,
+    HTTP pages are parsed while they download (see streaming.py).
+    """
+
+    platform = None
+    base_url = None
+    backend = None
+    stream = False
+    url_callback = None
+    page_limit = 50
+    page_count = None
+    reached_end = False
+
+    def search_url(self, query, page):
+        raise NotImplementedError
+
+    def fetch_pages(self, query, max_pages):
+        """
+        Yield (page, html) in page order; html is None when the page could
+        not be fetched. `max_pages` None means every page up to `page_limit`.
+        """
+        raise NotImplementedError
+
+    def fetch_page(self, query, page):
+        """Fetch a single result page; returns its html or None."""
+        raise NotImplementedError
+
+    def plan_pages(self, html):
+        """Number of result pages reported by page 1, or None when it does not say."""
+        return None
+
+    def extract(self, html):
+        # A streamed page (see streaming.py) was parsed while it downloaded
+        links = getattr(html, 'links', None)
+        if links is not None:
+            return links
+        return extract_links(self.platform, html, backend=self.backend)
+
+    def submit_extract(self, parse_pool, html):
+        """Start extract() in a parse pool worker and return a Future of its PageLinks."""
+        return parse_pool.submit(self.platform, html, self.backend)
+
+    def resolve(self, href):
+        return urljoin(self.base_url, href)
+
+    def should_continue(self, page, links, new_urls):
+        """Pagination rule, checked after each page: by default stop at the first empty page."""
+        return bool(links.hrefs)
+
+    def close(self):
+        """Release resources held for a search (e.g. a borrowed browser)."""
+
+class HttpAdapter(PlatformAdapter):
+    """
+    Adapter for platforms whose result pages are fetched with `requests`
+    through AsyncFetcher.
+
+    The first `per_host_limit` pages are requested at once, and page 1's
+    result count and pagination bar tell how many pages the search has (see
+    pagination.py); the remaining pages are then requested together, at
+    most `per_host_limit` at a time. `page_size` is the number of results
+    per page, when the search URL fixes it.
+
+    With `stream`, pages are parsed while they download and cut after their
+    results (see streaming.py), and `url_callback(page, url)` receives each
+    product URL (canonical, not yet deduplicated) as soon as it is parsed,
+    or read from the page cache.
+    """
+
+    page_size = None
+
+    def __init__(self, session=None, headers=None, per_host_limit=4, cache=None, backend=None, stream=False,
+                 url_callback=None):
+        self.session = session
+        self.headers = headers
+        self.per_host_limit = per_host_limit
+        self.cache = cache
+        self.backend = backend
+        self.stream = stream
+        self.url_callback = url_callback
+        self._pages = {}
+
+    def plan_pages(self, html):
+        return plan_page_count(self.extract(html), self.page_size)
+
+    def _fetcher(self):
+        return AsyncFetcher(self.session, self.headers, self.per_host_limit, cache=self.cache,
+                            stream=self.platform if self.stream else None,
+                            on_href=self._on_href if self.url_callback else None)
+
+    def _on_href(self, url, href):
+        # Runs on a fetch thread, while the page is still downloading
+        self.url_callback(self._pages.get(url), canonicalize(self.platform, self.resolve(href)))
+
+    def fetch_page(self, query, page):
+        return list(self._fetch(self._fetcher(), query, [page]))[0][1]
+
+    def _fetch(self, fetcher, query, pages):
+        urls = [self.search_url(query, page) for page in pages]
+        cache_keys = [(self.platform, query, page) for page in pages]
+        self._pages.update(zip(urls, pages))
+        with closing(fetcher.iter_pages(urls, cache_keys)) as responses:
+            for page, response in zip(pages, responses):
+                if response is None or response.status_code != 200:
+                    status = response.status_code if response is not None else 'no response'
+                    print(f"Failed to fetch page {page}. Status code: {status}")
+                    yield page, None
+                else:
+                    if getattr(response, 'cut', False):
+                        print(f"Page {page}: {response.report()}")
+                    yield page, response.text
+
+    def fetch_pages(self, query, max_pages):
+        cap = min(max_pages, self.page_limit) if max_pages else self.page_limit
+        limit = cap
+        self.reached_end = False
+        fetcher = self._fetcher()
+        # Page 1 is requested together with the next few pages, so a short
+        # search still takes a single round trip
+        window = list(range(1, min(self.per_host_limit, limit) + 1))
+        planned = None
+        with closing(self._fetch(fetcher, query, window)) as first_pages:
+            for page, html in first_pages:
+                if page > limit:
+                    break
+                yield page, html
+                if page == 1:
+                    if html is None:
+                        return
+                    planned = self.plan_pages(html)
+                    if planned is not None:
+                        # Pages past the last one would only come back empty
+                        limit = min(limit, planned)
+                        self.page_count = limit
+                        print(f"Page 1 reports {planned} pages.")
+        start = window[-1] + 1
+        if planned is None:
+            # Without a page count, request one window of pages at a time so
+            # that little is fetched past the end of the results
+            if start <= limit:
+                print(f"Page count unknown, fetching up to {limit} pages, {self.per_host_limit} at a time...")
+            for first in range(start, limit + 1, self.per_host_limit):
+                yield from self._fetch(fetcher, query, list(range(first, min(first + self.per_host_limit, limit + 1))))
+            return
+        if start <= limit:
+            pages = f"pages {start}-{limit}" if limit > start else f"page {start}"
+            print(f"Fetching {pages} with up to {self.per_host_limit} concurrent requests...")
+            yield from self._fetch(fetcher, query, list(range(start, limit + 1)))
+        # Page 1's count was not cut by the cap, so its last page has been fetched
+        self.reached_end = planned <= cap
+
+class BrowserAdapter(PlatformAdapter):
+    """
+    Adapter for platforms that may need a browser: pages are fetched over
+    HTTP first and rendered with a pooled WebDriver only when that finds no
+    results (see tiered.py). The driver is checked out on first use.
+    """
+
+    stream = True
+
+    def __init__(self, pool, cache=None, http=True):
+        self.pool = pool
+        self.cache = cache
+        self.http = http
+        self.driver = None
+
+    def render(self, url):
+        """Load `url` in the browser and return its page source."""
+        raise NotImplementedError
+
+    def _render(self, url):
+        if self.driver is None:
+            self.driver = self.pool.checkout()
+        return self.render(url)
+
+    def fetch_page(self, query, page):
+        url = self.search_url(query, page)
+        fetch = lambda: fetch_tiered(self.platform, url, lambda: self._render(url), http=self.http, stream=self.stream)[0]
+        if self.cache:
+            return self.cache.get_or_render(self.platform, query, page, fetch, urlsplit(url).netloc)[0]
+        return fetch()
+
+    def fetch_pages(self, query, max_pages):
+        for page in range(1, (max_pages or self.page_limit) + 1):
+            yield page, self.fetch_page(query, page)
+
+    def close(self):
+        if self.driver is not None:
+            self.pool.checkin(self.driver)
+            self.driver = None
+
+class ScrapeEngine:
+    """
+    Runs a search for one PlatformAdapter as a fetch -> extract -> collect
+    pipeline. `parse_pool` defaults to the process-wide parse pool, if one
+    is configured. With a parse pool, pages are read whole and parsed in the
+    pool instead of being streamed, unless the adapter has a `url_callback`
+    that needs each URL while its page downloads.
+    """
+
+    def __init__(self, adapter, queue_size=2, parse_pool=None):
+        self.adapter = adapter
+        self.queue_size = queue_size
+        self.parse_pool = parse_pool if parse_pool is not None else get_parse_pool()
+        if self.parse_pool is not None and adapter.url_callback is None:
+            # A streamed page is parsed on its fetch thread, holding the GIL the pool is there to avoid
+            adapter.stream = False
+
+    def _put(self, out, item, stop):
+        # Bounded put that gives up once the search has stopped
+        while not stop.is_set():
+            try:
+                out.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _fetch_stage(self, query, max_pages, out, stop):
+        try:
+            with closing(self.adapter.fetch_pages(query, max_pages)) as pages:
+                for page, html in pages:
+                    if not self._put(out, (page, html), stop):
+                        return
+        except Exception as e:
+            self._put(out, StageError(e), stop)
+        finally:
+            # Released on this thread, the one that used the adapter's resources
+            self.adapter.close()
+            self._put(out, _END if self.adapter.reached_end else _DONE, stop)
+
+    def _extract_stage(self, source, out, stop):
+        while not stop.is_set():
+            try:
+                item = source.get(timeout=0.1)
+            except queue.Empty:
+                continue
+            if isinstance(item, StageError):
+                self._put(out, item, stop)
+                continue
+            if item is _DONE or item is _END:
+                self._put(out, item, stop)
+                return
+            page, html = item
+            try:
+                if html is None:
+                    links = None
+                elif self.parse_pool is not None and getattr(html, 'links', None) is None:
+                    # The future is resolved by the collector, so the next pages can be submitted meanwhile
+                    links = self.adapter.submit_extract(self.parse_pool, html)
+                else:
+                    links = self.adapter.extract(html)
+            except Exception as e:
+                self._put(out, StageError(e), stop)
+                continue
+            if not self._put(out, (page, links), stop):
+                return
+
+    def run(self, query, max_pages=5, seen=None, page_callback=None, progress_callback=None, cancel_event=None,
+            delta=None, strict=False):
+        """
+        Search `query` over up to `max_pages` pages (None: as many as the
+        adapter finds, up to its `page_limit`) and return the new canonical
+        URLs in page order.
+
+        `page_callback(page, urls)` receives each page's new URLs as soon as
+        it is processed, `progress_callback(fraction)` the progress, and
+        setting `cancel_event` stops the search after the current page.
+
+        With `delta` (a url_index.DeltaRun), only URLs that are new since
+        earlier runs are returned, pagination stops at the first page with
+        nothing new (unless `delta.stop_early` is False), and a run that
+        reached the end of the results (the
+        adapter's should_continue() stopped it, or every page of a planned
+        page count was fetched) marks the URLs it did not see as gone. A run
+        stopped by `max_pages` or `page_limit` marks nothing.
+
+        A page that cannot be fetched or read, or a page 1 without results
+        that does not report zero results (a block page), ends the search.
+        With `strict`, that raises ScrapeError once the search has stopped;
+        otherwise the URLs found so far are returned.
+        """
+        deduper = Deduper(self.adapter.platform, seen)
+        fetched = queue.Queue(self.queue_size)
+        extracted = queue.Queue(self.queue_size)
+        stop = threading.Event()
+        stages = [
+            threading.Thread(target=self._fetch_stage, args=(query, max_pages, fetched, stop), daemon=True),
+            threading.Thread(target=self._extract_stage, args=(fetched, extracted, stop), daemon=True),
+        ]
+        for stage in stages:
+            stage.start()
+
+        products = []
+        complete = False
+        error = None
+        try:
+            while True:
+                if cancel_event is not None and cancel_event.is_set():
+                    print("Search cancelled.")
+                    break
+                try:
+                    item = extracted.get(timeout=0.1)
+                except queue.Empty:
+                    continue
+                if item is _END:
+                    complete = True
+                    break
+                if item is _DONE:
+                    break
+                if isinstance(item, StageError):
+                    raise item.error
+                page, links = item
+                if isinstance(links, Future):
+                    links = links.result()
+                if links is None:
+                    error = f"page {page} could not be fetched"
+                    break
+                if page == 1 and not links.hrefs and parse_count(links.total_count) != 0:
+                    print("Page 1 has no results and no result count, it may be a block page.")
+                    error = "page 1 has no results"
+                    break
+
+                print(f"Scraping page {page}...")
+                page_urls = []
+                for href in links.hrefs:
+                    # Canonicalize (drops tracking parameters) and skip duplicates
+                    url = deduper.add(self.adapter.resolve(href))
+                    if url:
+                        page_urls.append(url)
+                found_urls = page_urls
+                if delta is not None:
+                    page_urls = delta.observe(page_urls)
+                products.extend(page_urls)
+                metrics.count('pages', platform=self.adapter.platform)
+                metrics.count('urls', len(page_urls), platform=self.adapter.platform)
+
+                if page_callback:
+                    page_callback(page, page_urls)
+                if progress_callback:
+                    total_pages = self.adapter.page_count or max_pages or self.adapter.page_limit
+                    progress_callback(min(page / total_pages, 1.0))
+                if delta is not None and delta.stop_early and links.hrefs and not page_urls:
+                    print("Only known URLs on this page, stopping the delta crawl.")
+                    break
+                if not self.adapter.should_continue(page, links, found_urls):
+                    complete = True
+                    break
+        except Exception as e:
+            print(f"An error occurred: {e}")
+            error = str(e)
+        finally:
+            # The stages notice the stop within a queue timeout and finish on their own
+            stop.set()
+            if delta is not None:
+                delta.finish(complete)
+        if strict and error is not None:
+            raise ScrapeError(f"{self.adapter.platform} search for {query!r} failed: {error}", products)
+        return products
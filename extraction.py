@@ -0,0 +1,433 @@
+"""
+Link extraction from search-result pages.
+
+The selectors for each platform are defined once in PLATFORM_SELECTORS and
+evaluated by one of three interchangeable backends:
+
+- "lxml":     lxml's C parser with compiled CSS selectors (needs lxml and cssselect)
+- "strainer": BeautifulSoup that only builds the subtrees the selectors can match
+- "soup":     a full BeautifulSoup 'html.parser' tree (the original behaviour)
+
+The fastest available backend is used by default, and the full "soup" path
+is used as a fallback whenever a fast backend fails. StreamExtractor runs
+the lxml selectors over a page as it arrives, chunk by chunk.
+"""
+import base64
+import binascii
+import json
+import re
+from collections import namedtuple
+from urllib.parse import unquote
+
+from bs4 import BeautifulSoup, SoupStrainer
+import soupsieve
+
+from metrics import metrics
+
+try:
+    import lxml.html
+    from cssselect import GenericTranslator
+    from lxml import etree
+    from lxml.cssselect import CSSSelector
+except ImportError:
+    lxml = None
+
+PLATFORM_SELECTORS = {
+    'ebay': {
+        # Listing containers, tried in order until one of them matches
+        'listings': ['div.s-item__wrapper', 'div.s-item', 'a.s-item__link'],
+        'link': 'a.s-item__link',
+        'href_contains': '/itm/',
+        'next_page': 'a.pagination__next',
+        'total_count': 'h1.srp-controls__count-heading',
+        # Page links of the pagination bar, read to plan the remaining pages (see pagination.py)
+        'page_numbers': 'a.pagination__item',
+        # Last element the selectors above need; a streamed page is cut after it (see StreamExtractor)
+        'stream_end': 'nav.pagination',
+    },
+    'walmart': {
+        'listings': ['a[href*="/ip/"]'],
+        'link': None,
+        'page_numbers': 'a[data-automation-id="page-number"]',
+        'stream_end': 'nav[aria-label="pagination"]',
+    },
+    'amazon': {
+        'listings': ['div[data-component-type="s-search-result"]'],
+        'link': 'a.a-link-normal.s-no-outline',
+        'stream_end': 'div.s-main-slot',
+    },
+    'airbnb': {
+        # Airbnb links are matched on the raw HTML, no parsing involved
+        'pattern': re.compile(r'labelledby="[^"]+" href="(/rooms/\d+[^"]+)"'),
+        # Listings are also read from the JSON state embedded for the client-side app
+        'embedded_json': True,
+        # Result count heading, e.g. "Over 1,000 places" or "312 homes"
+        'count_pattern': re.compile(r'>((?:Over )?\d[\d,]*\+? (?:places|homes|stays)\b[^<]*)<'),
+        # "Next" link of the pagination bar, for pages without pagination state
+        'next_cursor_pattern': re.compile(r'<a[^>]*aria-label="Next"[^>]*href="[^"]*[?&;]cursor=([^"&]+)'),
+    },
+}
+
+BACKENDS = ('lxml', 'strainer', 'soup')
+DEFAULT_BACKEND = 'lxml' if lxml is not None else 'strainer'
+
+PageLinks = namedtuple('PageLinks', ['hrefs', 'has_next', 'total_count', 'last_page'])
+
+def _selector_parts(spec):
+    """All selectors that can match a top-level element of interest."""
+    parts = list(spec['listings'])
+    for key in ('next_page', 'total_count', 'page_numbers'):
+        if spec.get(key):
+            parts.append(spec[key])
+    return parts
+
+def _collect(spec, hrefs):
+    if spec.get('href_contains'):
+        return [href for href in hrefs if spec['href_contains'] in href]
+    return hrefs
+
+def _last_page(texts):
+    """Highest page number among the pagination links' texts, or None."""
+    numbers = [int(text.strip()) for text in texts if text.strip().isdigit()]
+    return max(numbers) if numbers else None
+
+# Minimal parser for the selector subset used above: tag, .class, [attr], [attr="v"], [attr*="v"]
+_SIMPLE_SELECTOR = re.compile(r'^(?P<tag>[a-z0-9]+)?(?P<rest>(?:\.[\w-]+|\[[^\]]+\])*)$')
+_SIMPLE_PART = re.compile(r'\.(?P<cls>[\w-]+)|\[(?P<attr>[\w-]+)(?:(?P<op>\*?=)"(?P<value>[^"]*)")?\]')
+
+def _compile_simple(selector):
+    match = _SIMPLE_SELECTOR.match(selector)
+    if not match:
+        raise ValueError(f"Unsupported selector for the strainer backend: {selector}")
+    tag = match.group('tag')
+    classes, attrs = [], []
+    for part in _SIMPLE_PART.finditer(match.group('rest')):
+        if part.group('cls'):
+            classes.append(part.group('cls'))
+        else:
+            attrs.append((part.group('attr'), part.group('op'), part.group('value')))
+
+    def matches(name, tag_attrs):
+        if tag and name != tag:
+            return False
+        if classes:
+            tag_classes = tag_attrs.get('class') or ''
+            if isinstance(tag_classes, str):
+                tag_classes = tag_classes.split()
+            if not all(cls in tag_classes for cls in classes):
+                return False
+        for attr, op, value in attrs:
+            actual = tag_attrs.get(attr)
+            if actual is None:
+                return False
+            if op == '=' and actual != value:
+                return False
+            if op == '*=' and value not in actual:
+                return False
+        return True
+
+    return matches
+
+class SelectorStrainer(SoupStrainer):
+    """SoupStrainer that keeps every top-level tag matching any of several simple selectors."""
+
+    def __init__(self, selectors):
+        super().__init__()
+        self.matchers = [_compile_simple(selector) for selector in selectors]
+
+    def _allowed(self, name, attrs):
+        attrs = dict(attrs or {})
+        return any(matcher(name, attrs) for matcher in self.matchers)
+
+    # bs4 >= 4.13
+    def allow_tag_creation(self, nsprefix, name, attrs):
+        return self._allowed(name, attrs)
+
+    def allow_string_creation(self, string):
+        return False
+
+    # bs4 < 4.13
+    def search_tag(self, markup_name=None, markup_attrs={}):
+        if isinstance(markup_name, str):
+            return self._allowed(markup_name, markup_attrs)
+        return super().search_tag(markup_name, markup_attrs)
+
+def _extract_with_soup(soup, spec):
+    hrefs = []
+    for selector in spec['listings']:
+        listings = soup.select(selector)
+        if listings:
+            break
+    for listing in listings:
+        link = listing
+        if spec['link'] and not soupsieve.match(spec['link'], listing):
+            link = listing.select_one(spec['link'])
+        if link is not None and link.get('href'):
+            hrefs.append(link['href'])
+
+    has_next = bool(spec.get('next_page') and soup.select_one(spec['next_page']))
+    total = soup.select_one(spec['total_count']) if spec.get('total_count') else None
+    pages = soup.select(spec['page_numbers']) if spec.get('page_numbers') else []
+    return PageLinks(_collect(spec, hrefs), has_next, total.get_text().strip() if total else None,
+                     _last_page(page.get_text() for page in pages))
+
+def _extract_soup(html, spec):
+    with metrics.span('parse', backend='soup'):
+        soup = BeautifulSoup(html, 'html.parser')
+    return _extract_with_soup(soup, spec)
+
+_strainers = {}
+
+def _extract_strainer(html, spec):
+    key = id(spec)
+    if key not in _strainers:
+        _strainers[key] = SelectorStrainer(_selector_parts(spec))
+    parser = 'lxml' if lxml is not None else 'html.parser'
+    with metrics.span('parse', backend='strainer'):
+        soup = BeautifulSoup(html, parser, parse_only=_strainers[key])
+    return _extract_with_soup(soup, spec)
+
+_compiled = {}
+
+def _css(selector):
+    if selector not in _compiled:
+        _compiled[selector] = CSSSelector(selector)
+    return _compiled[selector]
+
+def _extract_lxml(html, spec):
+    if lxml is None:
+        raise RuntimeError("The lxml backend needs the lxml and cssselect packages")
+    if isinstance(html, str):
+        # lxml refuses str input that carries an XML encoding declaration
+        html = html.encode('utf-8')
+    with metrics.span('parse', backend='lxml'):
+        tree = lxml.html.fromstring(html)
+    return _extract_tree(tree, spec)
+
+def _extract_tree(tree, spec):
+    hrefs = []
+    for selector in spec['listings']:
+        listings = _css(selector)(tree)
+        if listings:
+            break
+    for listing in listings:
+        href = _listing_href(listing, spec)
+        if href:
+            hrefs.append(href)
+
+    has_next = bool(spec.get('next_page') and _css(spec['next_page'])(tree))
+    total = _css(spec['total_count'])(tree) if spec.get('total_count') else None
+    pages = _css(spec['page_numbers'])(tree) if spec.get('page_numbers') else []
+    return PageLinks(_collect(spec, hrefs), has_next, total[0].text_content().strip() if total else None,
+                     _last_page(page.text_content() for page in pages))
+
+def _listing_href(listing, spec):
+    link = listing
+    if spec['link']:
+        # CSSSelector matches descendant-or-self, so a listing that is itself the link comes first
+        links = _css(spec['link'])(listing)
+        link = links[0] if links else None
+    return link.get('href') if link is not None else None
+
+_matchers = {}
+
+def _matches(selector):
+    """An XPath that returns [element] when `element` itself matches a CSS selector."""
+    if selector not in _matchers:
+        _matchers[selector] = etree.XPath(GenericTranslator().css_to_xpath(selector, prefix='self::'))
+    return _matchers[selector]
+
+class StreamExtractor:
+    """
+    Incremental lxml extraction of one page fed in chunks (bytes or str).
+
+    feed() parses what has arrived and calls `on_href(href)` for each
+    listing as soon as its element is complete. It returns True once the
+    platform's `stream_end` element (the last one the selectors need, e.g.
+    eBay's pagination bar) has ended after at least one listing: the rest
+    of the page, usually scripts, need not be read. close() returns the
+    PageLinks of everything fed, the same as extract_links() returns for
+    the whole page.
+    """
+
+    def __init__(self, platform, on_href=None, encoding=None):
+        if lxml is None:
+            raise RuntimeError("Streaming extraction needs the lxml and cssselect packages")
+        self.spec = PLATFORM_SELECTORS[platform]
+        self.on_href = on_href
+        self.listings = 0
+        self.done = False
+        self._parser = etree.HTMLPullParser(events=('end',), encoding=encoding)
+        self._parser.set_element_class_lookup(lxml.html.HtmlElementClassLookup())
+        # Links are reported from the first listing selector; close() still tries them all
+        self._listing = _matches(self.spec['listings'][0])
+        self._end = _matches(self.spec['stream_end']) if self.spec.get('stream_end') else None
+
+    def feed(self, data):
+        """Parse another chunk; returns True when the rest of the page can be skipped."""
+        if self.done:
+            return True
+        with metrics.span('parse', backend='stream'):
+            self._parser.feed(data)
+            for _, element in self._parser.read_events():
+                if self._listing(element):
+                    self.listings += 1
+                    href = _listing_href(element, self.spec)
+                    if href and self.on_href and _collect(self.spec, [href]):
+                        self.on_href(href)
+                elif self.listings and self._end is not None and self._end(element):
+                    self.done = True
+                    break
+        return self.done
+
+    def close(self):
+        """PageLinks of the page fed so far."""
+        try:
+            with metrics.span('parse', backend='stream'):
+                tree = self._parser.close()
+        except etree.XMLSyntaxError:
+            # Nothing but whitespace was fed
+            tree = None
+        if tree is None:
+            return PageLinks([], False, None, None)
+        return _extract_tree(tree, self.spec)
+
+_JSON_SCRIPT = re.compile(r'<script[^>]*type="application/json"[^>]*>(.*?)</script>', re.S)
+_LISTING_ID = re.compile(r'Listing:(\d+)$')
+# Keys of the JSON state that hold a search's own results (e.g. staysSearch.results.searchResults);
+# listings elsewhere in the state are recommendations, wish lists or ads
+_SEARCH_RESULT_KEYS = ('searchResults',)
+
+def _room_id(value):
+    """A numeric room ID, or one wrapped as base64("...Listing:<id>") in GraphQL state."""
+    value = str(value)
+    if value.isdigit():
+        return value
+    try:
+        decoded = base64.b64decode(value, validate=True).decode('ascii')
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        return None
+    match = _LISTING_ID.search(decoded)
+    return match.group(1) if match else None
+
+def _walk_listing_ids(node, ids):
+    if isinstance(node, dict):
+        typename = node.get('__typename') or ''
+        if typename.endswith('Listing') and 'id' in node:
+            room_id = _room_id(node['id'])
+            if room_id:
+                ids.append(room_id)
+        if 'listingId' in node:
+            room_id = _room_id(node['listingId'])
+            if room_id:
+                ids.append(room_id)
+        for value in node.values():
+            _walk_listing_ids(value, ids)
+    elif isinstance(node, list):
+        for value in node:
+            _walk_listing_ids(value, ids)
+
+def _walk_search_results(node, ids):
+    if isinstance(node, dict):
+        for key, value in node.items():
+            if key in _SEARCH_RESULT_KEYS:
+                _walk_listing_ids(value, ids)
+            else:
+                _walk_search_results(value, ids)
+    elif isinstance(node, list):
+        for value in node:
+            _walk_search_results(value, ids)
+
+def _json_states(html):
+    """The parsed JSON state scripts of a page."""
+    states = []
+    for script in _JSON_SCRIPT.findall(html):
+        try:
+            states.append(json.loads(script))
+        except ValueError:
+            continue
+    return states
+
+def _find_pagination(node):
+    """The first `paginationInfo` object ({pageCursors, nextPageCursor}) in a JSON state, or None."""
+    if isinstance(node, dict):
+        if isinstance(node.get('paginationInfo'), dict):
+            return node['paginationInfo']
+        children = node.values()
+    elif isinstance(node, list):
+        children = node
+    else:
+        return None
+    for child in children:
+        found = _find_pagination(child)
+        if found is not None:
+            return found
+    return None
+
+def extract_embedded_rooms(html, states=None):
+    """
+    Room paths (`/rooms/<id>`) of the search results in the JSON state
+    scripts of an Airbnb page, in page order.
+    """
+    ids = []
+    for state in _json_states(html) if states is None else states:
+        _walk_search_results(state, ids)
+    return [f"/rooms/{room_id}" for room_id in dict.fromkeys(ids)]
+
+def extract_page_cursors(html, states=None):
+    """
+    Pagination cursors of an Airbnb search page: (cursors of every result
+    page in order, cursor of the next page). Either may be empty/None.
+    """
+    for state in _json_states(html) if states is None else states:
+        pagination = _find_pagination(state)
+        if pagination is not None:
+            return list(pagination.get('pageCursors') or []), pagination.get('nextPageCursor')
+    match = PLATFORM_SELECTORS['airbnb']['next_cursor_pattern'].search(html)
+    return [], unquote(match.group(1)) if match else None
+
+def extract_airbnb_page(html):
+    """
+    PageLinks of an Airbnb search page plus its cursors (see
+    extract_page_cursors), reading the embedded JSON state once.
+    """
+    spec = PLATFORM_SELECTORS['airbnb']
+    states = _json_states(html)
+    hrefs = spec['pattern'].findall(html) + extract_embedded_rooms(html, states)
+    cursors, next_cursor = extract_page_cursors(html, states)
+    count = spec['count_pattern'].search(html)
+    links = PageLinks(hrefs, next_cursor is not None, count.group(1).strip() if count else None, len(cursors) or None)
+    return links, cursors, next_cursor
+
+_EXTRACTORS = {
+    'lxml': _extract_lxml,
+    'strainer': _extract_strainer,
+    'soup': _extract_soup,
+}
+
+def extract_links(platform, html, backend=None):
+    """
+    Extract the result links of one search page.
+
+    Returns a PageLinks tuple of (hrefs in page order, whether a next page
+    link exists, the total-count heading text or None, the highest page
+    number in the pagination bar or None).
+    """
+    with metrics.span('extract', platform=platform):
+        return _extract_links(platform, html, backend)
+
+def _extract_links(platform, html, backend):
+    spec = PLATFORM_SELECTORS[platform]
+    if 'pattern' in spec:
+        if spec.get('embedded_json'):
+            return extract_airbnb_page(html)[0]
+        return PageLinks(spec['pattern'].findall(html), False, None, None)
+
+    backend = backend or DEFAULT_BACKEND
+    try:
+        return _EXTRACTORS[backend](html, spec)
+    except Exception as e:
+        if backend == 'soup':
+            raise
+        print(f"{backend} extraction failed ({e}), falling back to BeautifulSoup")
+        return _extract_soup(html, spec)
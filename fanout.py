@@ -0,0 +1,106 @@
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import platforms
+
+# Platforms that take a search query (Airbnb takes a search URL instead)
+QUERY_PLATFORMS = ("Amazon", "eBay", "Walmart")
+
+# Seconds each platform may run in an all-platform search before it is abandoned
+DEFAULT_TIMEOUTS = {"Amazon": 180, "eBay": 90, "Walmart": 90, "Airbnb": 120}
+
+def run_platform(platform, query, num_pages=5, page_callback=None, cancel_event=None, progress_callback=None,
+                 index=None, strict=False):
+    """
+    Run the scraper for one platform and return its list of URLs, from at
+    most `num_pages` result pages (Airbnb crawls its whole search area).
+
+    `page_callback(page, urls)` receives each page's new URLs as they are
+    found; setting `cancel_event` stops the scraper after its current page.
+    With a url_index.UrlIndex as `index`, the scrape is a delta crawl that
+    only returns URLs new since earlier runs. With `strict`, a scrape that
+    fails part way raises engine.ScrapeError (carrying the URLs found)
+    instead of returning them. The platform's scraper module is imported on
+    first use (see platforms.py).
+    """
+    module = platforms.load(platform)
+    if platform == "Amazon":
+        rows = module.extract_product_urls(
+            query, num_pages, page_callback=page_callback, cancel_event=cancel_event,
+            progress_callback=progress_callback, index=index, strict=strict,
+        )
+        return [row['url'] for row in rows]
+    if platform == "eBay":
+        return module.EbayScraper().search_products(
+            query, num_pages, progress_callback=progress_callback, page_callback=page_callback, cancel_event=cancel_event,
+            index=index, strict=strict,
+        )
+    if platform == "Walmart":
+        return module.WalmartScraper().search_products(
+            query, num_pages, progress_callback=progress_callback, page_callback=page_callback, cancel_event=cancel_event,
+            index=index, strict=strict,
+        )
+    if platform == "Airbnb":
+        rows = module.extract_urls(
+            query, pool=module.get_driver_pool(headless=True), page_callback=page_callback,
+            cancel_event=cancel_event, progress_callback=progress_callback, index=index, strict=strict,
+        )
+        return [row['url'] for row in rows]
+    raise ValueError(f"Unknown platform: {platform}")
+
+def search_all(query, platforms=QUERY_PLATFORMS, num_pages=5, timeouts=None, page_callback=None, cancel_event=None):
+    """
+    Search several platforms concurrently for the same query.
+
+    Yields (platform, urls, error) as soon as each platform finishes, so the
+    total time is close to that of the slowest platform. A platform still
+    running after its timeout (see DEFAULT_TIMEOUTS) is told to stop and
+    yielded with error "timed out". `page_callback(platform, page, urls)`
+    receives results page by page while the platforms are running.
+    """
+    timeouts = {**DEFAULT_TIMEOUTS, **(timeouts or {})}
+    executor = ThreadPoolExecutor(max_workers=len(platforms), thread_name_prefix='fanout')
+    start = time.monotonic()
+    stop_events = {platform: threading.Event() for platform in platforms}
+
+    def page_forwarder(platform):
+        def on_page(page, urls):
+            # Pages that arrive after a platform timed out are dropped
+            if page_callback and not stop_events[platform].is_set():
+                page_callback(platform, page, urls)
+        return on_page
+
+    futures = {}
+    for platform in platforms:
+        future = executor.submit(run_platform, platform, query, num_pages, page_forwarder(platform), stop_events[platform])
+        futures[future] = platform
+
+    try:
+        pending = set(futures)
+        while pending:
+            if cancel_event is not None and cancel_event.is_set():
+                for future in pending:
+                    stop_events[futures[future]].set()
+                return
+
+            deadlines = {future: start + timeouts[futures[future]] for future in pending}
+            # Wake up at the next deadline, or periodically to notice cancellation
+            wait_for = max(0, min(deadlines.values()) - time.monotonic())
+            done, pending = wait(pending, timeout=min(wait_for, 1.0), return_when=FIRST_COMPLETED)
+
+            for future in done:
+                platform = futures[future]
+                try:
+                    yield platform, future.result(), None
+                except Exception as e:
+                    yield platform, [], str(e)
+
+            now = time.monotonic()
+            for future in [f for f in pending if deadlines[f] <= now]:
+                platform = futures[future]
+                stop_events[platform].set()
+                pending.discard(future)
+                yield platform, [], "timed out"
+    finally:
+        executor.shutdown(wait=False)
@@ -0,0 +1,274 @@
+"""
+Process-wide HTTP client shared by every scraper.
+
+Opening a TCP+TLS connection costs several round trips, so instead of a new
+`requests` session per scraper (or per page) all requests go through one
+client with per-host keep-alive connection pools. Connections opened by
+one scrape are reused by the next one, from any thread or Streamlit
+session. The client also:
+
+- caches DNS lookups for `DNS_TTL` seconds, trying a host's other
+  addresses when one of them refuses connections,
+- advertises only the content encodings it can decode (gzip and deflate,
+  plus br and zstd when brotli/zstandard are installed),
+- speaks HTTP/2 when httpx and h2 are installed (`pip install httpx[http2]`).
+
+`client_stats()` reports, per host, how many requests reused a connection
+and the mean time spent opening new ones (TCP connect plus TLS handshake).
+
+    from http_client import get_session
+    response = get_session().get(url, headers=headers, timeout=30)
+"""
+import socket
+import threading
+import time
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.exceptions import ConnectTimeoutError, NewConnectionError
+from urllib3.util import make_headers
+
+from metrics import metrics
+
+try:
+    import httpx
+    import h2  # noqa: F401  (needed by httpx for HTTP/2)
+except ImportError:
+    httpx = None
+
+# Encodings urllib3 can decode with the packages installed here
+ACCEPT_ENCODING = make_headers(accept_encoding=True)['accept-encoding']
+
+# Hosts with pooled connections, and connections kept per host
+POOL_HOSTS = 32
+POOL_SIZE = 16
+
+DNS_TTL = 300
+
+class DnsCache:
+    """
+    Thread-safe cache of getaddrinfo() results, kept for `ttl` seconds. An
+    address that failed to connect is moved behind the host's other
+    addresses (see demote()).
+    """
+
+    def __init__(self, ttl=DNS_TTL):
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def resolve(self, host, port):
+        """Return the addresses of `host` as IP strings, best first (IP literals are returned as-is)."""
+        key = (host, port)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[1] > now:
+                self.hits += 1
+                return list(entry[0])
+        with metrics.span('dns', host=host):
+            infos = socket.getaddrinfo(host, port, type=socket.SOCK_STREAM)
+        addresses = list(dict.fromkeys(info[4][0] for info in infos))
+        with self._lock:
+            self.misses += 1
+            self._entries[key] = (addresses, now + self.ttl)
+        return list(addresses)
+
+    def demote(self, host, port, address):
+        """Move `address` behind the other cached addresses of `host`, after it failed to connect."""
+        with self._lock:
+            entry = self._entries.get((host, port))
+            if entry and address in entry[0]:
+                entry[0].remove(address)
+                entry[0].append(address)
+
+    def forget(self, host, port):
+        """Drop the cached addresses of `host`, so the next connection resolves it again."""
+        with self._lock:
+            self._entries.pop((host, port), None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+dns_cache = DnsCache()
+
+class ClientStats:
+    """Thread-safe per-host counts of requests, connections opened and time spent opening them."""
+
+    def __init__(self):
+        self._hosts = {}
+        self._lock = threading.Lock()
+
+    def _host(self, host):
+        return self._hosts.setdefault(host, {'requests': 0, 'connections': 0, 'connect_seconds': 0.0})
+
+    def record_request(self, host):
+        metrics.count('http_requests', host=host)
+        with self._lock:
+            self._host(host)['requests'] += 1
+
+    def record_connection(self, host, seconds):
+        metrics.count('connections_opened', host=host)
+        metrics.observe('connect', seconds, host=host)
+        with self._lock:
+            counts = self._host(host)
+            counts['connections'] += 1
+            counts['connect_seconds'] += seconds
+
+    def summary(self):
+        with self._lock:
+            result = {}
+            for host, counts in self._hosts.items():
+                requests_made, connections = counts['requests'], counts['connections']
+                result[host] = {
+                    'requests': requests_made,
+                    'connections': connections,
+                    'reuse_rate': round(max(requests_made - connections, 0) / requests_made, 3) if requests_made else 0.0,
+                    'mean_connect_ms': round(counts['connect_seconds'] / connections * 1000, 1) if connections else 0.0,
+                }
+            return result
+
+    def reset(self):
+        with self._lock:
+            self._hosts.clear()
+
+stats = ClientStats()
+
+class _TimedConnectionMixin:
+    """Resolves through the DNS cache and records how long each new connection takes to open."""
+
+    def _new_conn(self):
+        # _dns_host is only used for the socket connection; TLS still uses the real host name
+        dns_host = self._dns_host
+        try:
+            addresses = dns_cache.resolve(dns_host, self.port)
+        except OSError:
+            return super()._new_conn()  # urllib3 resolves it again and reports the failure
+        try:
+            # Each address is tried in turn, as urllib3 does when it resolves the host itself
+            for address in addresses:
+                self._dns_host = address
+                try:
+                    return super()._new_conn()
+                except (NewConnectionError, ConnectTimeoutError):
+                    if address == addresses[-1]:
+                        # None of the cached addresses works; they may be stale
+                        dns_cache.forget(dns_host, self.port)
+                        raise
+                    dns_cache.demote(dns_host, self.port, address)
+        finally:
+            self._dns_host = dns_host
+
+    def connect(self):
+        start = time.perf_counter()
+        super().connect()
+        host = self.host if self.port == self.default_port else f'{self.host}:{self.port}'
+        stats.record_connection(host, time.perf_counter() - start)
+
+class TimedHTTPConnection(_TimedConnectionMixin, HTTPConnection):
+    pass
+
+class TimedHTTPSConnection(_TimedConnectionMixin, HTTPSConnection):
+    pass
+
+class TimedHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = TimedHTTPConnection
+
+class TimedHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = TimedHTTPSConnection
+
+class PooledAdapter(HTTPAdapter):
+    """HTTPAdapter with larger per-host pools whose connections go through the DNS cache and are timed."""
+
+    def __init__(self, pool_hosts=POOL_HOSTS, pool_size=POOL_SIZE):
+        super().__init__(pool_connections=pool_hosts, pool_maxsize=pool_size)
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {'http': TimedHTTPConnectionPool, 'https': TimedHTTPSConnectionPool}
+
+class HttpClient:
+    """
+    A keep-alive HTTP client with the `session.get(url, headers=..., timeout=...)`
+    interface the scrapers use, backed by a `requests` session or, with
+    `http2`, an httpx client. Transport errors are raised as
+    `requests.RequestException` either way.
+    """
+
+    def __init__(self, http2=None, pool_hosts=POOL_HOSTS, pool_size=POOL_SIZE):
+        self.http2 = httpx is not None if http2 is None else http2
+        if self.http2 and httpx is None:
+            raise RuntimeError("HTTP/2 needs httpx and h2 (pip install httpx[http2])")
+        if self.http2:
+            limits = httpx.Limits(max_connections=pool_hosts * pool_size, max_keepalive_connections=pool_hosts * pool_size)
+            self.session = httpx.Client(http2=True, limits=limits, follow_redirects=True)
+        else:
+            self.session = requests.Session()
+            adapter = PooledAdapter(pool_hosts, pool_size)
+            self.session.mount('http://', adapter)
+            self.session.mount('https://', adapter)
+
+    def get(self, url, headers=None, timeout=30, **kwargs):
+        """GET `url`; with `stream=True` the body is left unread for the caller (see streaming.py)."""
+        host = urlsplit(url).netloc
+        headers = {**(headers or {}), 'Accept-Encoding': ACCEPT_ENCODING}
+        stats.record_request(host)
+        if not self.http2:
+            return self.session.get(url, headers=headers, timeout=timeout, **kwargs)
+        stream = kwargs.pop('stream', False)
+        try:
+            request = self.session.build_request('GET', url, headers=headers, timeout=timeout,
+                                                 extensions={'trace': _ConnectTrace(host, url.startswith('https:'))},
+                                                 **kwargs)
+            return self.session.send(request, stream=stream)
+        except httpx.HTTPError as e:
+            raise requests.ConnectionError(str(e)) from e
+
+    def close(self):
+        self.session.close()
+
+class _ConnectTrace:
+    """httpx trace hook timing the TCP connect and TLS handshake of new connections."""
+
+    def __init__(self, host, tls):
+        self.host = host
+        # A new connection is open after its TLS handshake, or after the TCP connect without TLS
+        self.done_event = 'connection.start_tls.complete' if tls else 'connection.connect_tcp.complete'
+        self.start = None
+
+    def __call__(self, event, info):
+        if event == 'connection.connect_tcp.started':
+            self.start = time.perf_counter()
+        elif event == self.done_event and self.start is not None:
+            stats.record_connection(self.host, time.perf_counter() - self.start)
+            self.start = None
+
+_client = None
+_client_lock = threading.Lock()
+
+def get_session():
+    """The process-wide HttpClient, created on first use."""
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = HttpClient()
+        return _client
+
+def configure(http2=None, pool_hosts=POOL_HOSTS, pool_size=POOL_SIZE):
+    """Replace the process-wide client, e.g. to force HTTP/2 on (True) or off (False)."""
+    global _client
+    with _client_lock:
+        if _client is not None:
+            _client.close()
+        _client = HttpClient(http2, pool_hosts, pool_size)
+        return _client
+
+def client_stats():
+    """Per-host requests, connections opened, connection reuse rate and mean connect time."""
+    return stats.summary()
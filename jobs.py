@@ -0,0 +1,142 @@
+import os
+import tempfile
+import threading
+import time
+import traceback
+import uuid
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from sinks import open_sink
+
+class Job:
+    """
+    A scrape running in the background. Workers append results page by page
+    with add_results() while readers poll rows/progress/status.
+
+    Rows are streamed to `sink` (see sinks.py); only the most recent
+    `preview_rows` are kept in memory for display.
+    """
+
+    def __init__(self, platform, query, sink=None, preview_rows=1000):
+        self.id = uuid.uuid4().hex[:12]
+        self.platform = platform
+        self.query = query
+        self.status = 'queued'
+        self.progress = 0.0
+        self.message = ''
+        self.error = None
+        self.created_at = time.time()
+        self.finished_at = None
+        self.cancel_event = threading.Event()
+        self.sink = sink
+        self.row_count = 0
+        self._rows = deque(maxlen=preview_rows)
+        self._lock = threading.Lock()
+
+    @property
+    def rows(self):
+        """A copy of the most recent results (up to preview_rows)."""
+        with self._lock:
+            return list(self._rows)
+
+    @property
+    def result_path(self):
+        return self.sink.path if self.sink else None
+
+    @property
+    def finished(self):
+        return self.status in ('done', 'cancelled', 'failed')
+
+    def add_results(self, urls, **columns):
+        """Append one row per URL; `columns` (e.g. platform=...) are added to every row."""
+        rows = [{**columns, 'url': url} for url in urls]
+        with self._lock:
+            if self.sink:
+                self.sink.write_many(rows)
+            self._rows.extend(rows)
+            self.row_count += len(rows)
+
+    def close(self):
+        """Flush and close the result file."""
+        with self._lock:
+            if self.sink:
+                self.sink.close()
+
+    def set_progress(self, fraction, message=None):
+        self.progress = min(max(fraction, 0.0), 1.0)
+        if message is not None:
+            self.message = message
+
+    def cancel(self):
+        """Ask the worker to stop after the page it is working on."""
+        self.cancel_event.set()
+        if self.status == 'queued':
+            self.status = 'cancelled'
+
+class JobManager:
+    """
+    Runs scrape jobs on a thread pool shared by every Streamlit session and
+    keeps finished jobs (and their result files in `results_dir`) for
+    `retention` seconds so users can reconnect to them.
+    """
+
+    def __init__(self, max_workers=4, retention=3600, results_dir=None):
+        self.retention = retention
+        self.results_dir = results_dir or tempfile.mkdtemp(prefix='scrape-results-')
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='scrape-job')
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def submit(self, platform, query, run, fieldnames=('url',), format='csv', **kwargs):
+        """Queue `run(job, **kwargs)` and return the new Job, whose rows go to a `format` file."""
+        self._prune()
+        job = Job(platform, query)
+        job.sink = open_sink(os.path.join(self.results_dir, f"{job.id}.{format}"), list(fieldnames), format)
+        with self._lock:
+            self._jobs[job.id] = job
+        self._executor.submit(self._run, job, run, kwargs)
+        return job
+
+    def _run(self, job, run, kwargs):
+        if job.cancel_event.is_set():
+            job.status = 'cancelled'
+            job.close()
+            job.finished_at = time.time()
+            return
+        job.status = 'running'
+        try:
+            run(job, **kwargs)
+            job.status = 'cancelled' if job.cancel_event.is_set() else 'done'
+            if job.status == 'done':
+                job.progress = 1.0
+        except Exception as e:
+            job.status = 'failed'
+            job.error = str(e)
+            print(traceback.format_exc())
+        finally:
+            job.close()
+            job.finished_at = time.time()
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def cancel(self, job_id):
+        job = self.get(job_id)
+        if job:
+            job.cancel()
+        return job
+
+    def _prune(self):
+        cutoff = time.time() - self.retention
+        with self._lock:
+            for job_id in [j.id for j in self._jobs.values() if j.finished_at and j.finished_at < cutoff]:
+                job = self._jobs.pop(job_id)
+                if job.result_path and os.path.exists(job.result_path):
+                    os.remove(job.result_path)
+
+    def shutdown(self):
+        for job in list(self._jobs.values()):
+            job.cancel()
+        self._executor.shutdown(wait=False)
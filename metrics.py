@@ -0,0 +1,144 @@
+"""
+Lightweight instrumentation: timed spans and counters for every stage.
+
+Stages record spans (driver_startup, fetch, render, readiness_wait, parse,
+extract, throttle, first_url) and counters (bytes_downloaded, bytes_saved,
+pages, urls, ...) on the process-wide `metrics` object. They can be
+exported as a Chrome/Perfetto JSON trace (open it in chrome://tracing or
+ui.perfetto.dev) or in the Prometheus text exposition format.
+
+    from metrics import metrics
+    with metrics.span('fetch', platform='ebay', page=2):
+        ...
+    metrics.count('urls', 48, platform='ebay')
+"""
+import json
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+# Labels kept on individual spans in the trace but not used to aggregate totals
+TRACE_ONLY_LABELS = {'page', 'url'}
+
+class Metrics:
+    """Thread-safe store of recent spans (at most `max_spans`), span totals and counters."""
+
+    def __init__(self, max_spans=20000):
+        self._spans = deque(maxlen=max_spans)
+        self._totals = {}
+        self._counters = {}
+        self._lock = threading.Lock()
+        self._origin = time.perf_counter()
+
+    @contextmanager
+    def span(self, name, **labels):
+        """Time the enclosed block as one span of stage `name`."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, start=start, **labels)
+
+    def observe(self, name, seconds, start=None, **labels):
+        """Record a span that has already been timed (e.g. a sleep that returned its duration)."""
+        start = time.perf_counter() - seconds if start is None else start
+        key = (name, _label_key(labels))
+        with self._lock:
+            self._spans.append((name, labels, start - self._origin, seconds, threading.get_ident()))
+            total = self._totals.setdefault(key, [0, 0.0])
+            total[0] += 1
+            total[1] += seconds
+
+    def count(self, name, value=1, **labels):
+        key = (name, _label_key(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def summary(self):
+        """Rows of {stage, labels, count, total_s, mean_s} for every stage and label set."""
+        with self._lock:
+            return [
+                {'stage': name, 'labels': _format_labels(labels), 'count': count,
+                 'total_s': round(total, 4), 'mean_s': round(total / count, 4)}
+                for (name, labels), (count, total) in sorted(self._totals.items())
+            ]
+
+    def counters(self):
+        """Rows of {counter, labels, value}."""
+        with self._lock:
+            return [
+                {'counter': name, 'labels': _format_labels(labels), 'value': value}
+                for (name, labels), value in sorted(self._counters.items())
+            ]
+
+    def span_durations(self, name):
+        """Durations in seconds of the recorded spans of stage `name`, oldest first."""
+        with self._lock:
+            return [seconds for span_name, _, _, seconds, _ in self._spans if span_name == name]
+
+    def export_spans(self):
+        """The recorded spans as (name, labels, seconds), e.g. to send them from a worker process."""
+        with self._lock:
+            return [(name, labels, seconds) for name, labels, _, seconds, _ in self._spans]
+
+    def merge_spans(self, spans):
+        """Record spans exported by another process; they are placed as ending now."""
+        for name, labels, seconds in spans:
+            self.observe(name, seconds, **labels)
+
+    def to_trace(self):
+        """The recorded spans as a Chrome trace (JSON object format) with counters in its metadata."""
+        with self._lock:
+            events = [
+                {'name': name, 'cat': 'scraper', 'ph': 'X', 'pid': os.getpid(), 'tid': tid,
+                 'ts': round(start * 1e6), 'dur': round(seconds * 1e6), 'args': labels}
+                for name, labels, start, seconds, tid in self._spans
+            ]
+            counters = {f"{name}{{{_format_labels(labels)}}}": value for (name, labels), value in self._counters.items()}
+        return {'traceEvents': events, 'displayTimeUnit': 'ms', 'otherData': {'counters': counters}}
+
+    def write_trace(self, path):
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.to_trace(), f)
+
+    def to_prometheus(self, prefix='scraper'):
+        """Span totals as `<prefix>_stage_seconds` summaries and counters as `<prefix>_<name>_total`."""
+        lines = [f'# TYPE {prefix}_stage_seconds summary']
+        with self._lock:
+            for (name, labels), (count, total) in sorted(self._totals.items()):
+                label_text = _prometheus_labels((('stage', name),) + labels)
+                lines.append(f'{prefix}_stage_seconds_sum{label_text} {total:.6f}')
+                lines.append(f'{prefix}_stage_seconds_count{label_text} {count}')
+            names = sorted({name for name, _ in self._counters})
+            for counter in names:
+                lines.append(f'# TYPE {prefix}_{counter}_total counter')
+                for (name, labels), value in sorted(self._counters.items()):
+                    if name == counter:
+                        lines.append(f'{prefix}_{name}_total{_prometheus_labels(labels)} {value}')
+        return '\n'.join(lines) + '\n'
+
+    def reset(self):
+        with self._lock:
+            self._spans.clear()
+            self._totals.clear()
+            self._counters.clear()
+
+def _label_key(labels):
+    return tuple(sorted(
+        (key, str(value)) for key, value in labels.items()
+        if value is not None and key not in TRACE_ONLY_LABELS
+    ))
+
+def _format_labels(labels):
+    return ','.join(f'{key}={value}' for key, value in labels)
+
+def _prometheus_labels(labels):
+    if not labels:
+        return ''
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in labels)
+    return '{' + ','.join(f'{key}="{value}"' for (key, _), value in zip(labels, escaped)) + '}'
+
+# Shared by every scraper in the process
+metrics = Metrics()
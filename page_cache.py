@@ -0,0 +1,217 @@
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from collections import namedtuple
+from urllib.parse import urlsplit
+
+DEFAULT_CACHE_PATH = os.path.join(
+    os.environ.get('PAGE_CACHE_DIR', os.path.join(os.path.expanduser('~'), '.cache', 'product-url-extractor')),
+    'pages.sqlite',
+)
+
+CacheEntry = namedtuple('CacheEntry', ['text', 'etag', 'last_modified', 'fetched_at', 'fresh'])
+
+class CachedResponse:
+    """The subset of `requests.Response` the scrapers use, for pages served from the cache."""
+
+    def __init__(self, text, status_code=200, from_cache=True):
+        self.text = text
+        self.status_code = status_code
+        self.from_cache = from_cache
+
+def normalize_query(query):
+    """
+    Key of a query: text queries ignore case and extra whitespace. URL
+    queries (Airbnb searches and map tiles) are kept as they are, since
+    their place IDs and cursors are case-sensitive.
+    """
+    query = str(query).strip()
+    if '://' in query:
+        return query
+    return ' '.join(query.lower().split())
+
+def has_results(platform, text):
+    """
+    Whether a page is worth caching: it has result links or says there are
+    none. Block and CAPTCHA pages are not, or they would be served for the
+    whole TTL.
+    """
+    # Imported here: the cache is imported by modules that never parse a page
+    from extraction import PLATFORM_SELECTORS, extract_links
+    from pagination import parse_count
+    if platform not in PLATFORM_SELECTORS:
+        return bool(text)
+    # A streamed page (see streaming.py) already carries its links
+    links = getattr(text, 'links', None) or extract_links(platform, text)
+    return bool(links.hrefs) or parse_count(links.total_count) == 0
+
+class PageCache:
+    """
+    On-disk cache of result pages keyed by (host, platform, normalized
+    query, page), so pages of a replay server or another `base_url` are never
+    served for the real site.
+
+    Bodies are stored zlib-compressed in a SQLite file. Entries are fresh for
+    `ttl` seconds; stale entries that carry an ETag or Last-Modified header
+    are revalidated with a conditional request instead of being refetched.
+    When the stored bodies exceed `max_bytes`, the least recently used
+    entries are evicted. Only pages that have results, or say there are
+    none, are stored (see has_results).
+    """
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, ttl=3600, max_bytes=200 * 1024 * 1024):
+        self.path = path
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.revalidated = 0
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        columns = [row[1] for row in self._db.execute("PRAGMA table_info(pages)")]
+        if columns and 'host' not in columns:
+            # Pages cached before the host was part of the key cannot be told apart by site
+            self._db.execute("DROP TABLE pages")
+        self._db.execute(
+            """CREATE TABLE IF NOT EXISTS pages (
+                host TEXT NOT NULL,
+                platform TEXT NOT NULL,
+                query TEXT NOT NULL,
+                page INTEGER NOT NULL,
+                body BLOB NOT NULL,
+                size INTEGER NOT NULL,
+                etag TEXT,
+                last_modified TEXT,
+                fetched_at REAL NOT NULL,
+                last_access REAL NOT NULL,
+                PRIMARY KEY (host, platform, query, page)
+            )"""
+        )
+        self._db.commit()
+
+    def get(self, platform, query, page, allow_stale=False, host=''):
+        """Return the CacheEntry for a page, or None if it is missing (or stale and not allowed)."""
+        key = (host, platform, normalize_query(query), page)
+        with self._lock:
+            row = self._db.execute(
+                "SELECT body, etag, last_modified, fetched_at FROM pages WHERE host=? AND platform=? AND query=? AND page=?",
+                key,
+            ).fetchone()
+            if row is None:
+                return None
+            fresh = time.time() - row[3] < self.ttl
+            if not fresh and not allow_stale:
+                return None
+            self._db.execute(
+                "UPDATE pages SET last_access=? WHERE host=? AND platform=? AND query=? AND page=?", (time.time(),) + key
+            )
+            self._db.commit()
+        return CacheEntry(zlib.decompress(row[0]).decode('utf-8'), row[1], row[2], row[3], fresh)
+
+    def put(self, platform, query, page, text, etag=None, last_modified=None, host=''):
+        """Store a page body and evict least recently used pages if the cache is over size."""
+        body = zlib.compress(text.encode('utf-8'), 6)
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO pages VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (host, platform, normalize_query(query), page, body, len(body), etag, last_modified, now, now),
+            )
+            self._evict()
+            self._db.commit()
+
+    def _touch(self, platform, query, page, host=''):
+        with self._lock:
+            now = time.time()
+            self._db.execute(
+                "UPDATE pages SET fetched_at=?, last_access=? WHERE host=? AND platform=? AND query=? AND page=?",
+                (now, now, host, platform, normalize_query(query), page),
+            )
+            self._db.commit()
+
+    def _evict(self):
+        total = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM pages").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        rows = self._db.execute("SELECT host, platform, query, page, size FROM pages ORDER BY last_access").fetchall()
+        for host, platform, query, page, size in rows:
+            if total <= self.max_bytes:
+                break
+            self._db.execute("DELETE FROM pages WHERE host=? AND platform=? AND query=? AND page=?",
+                             (host, platform, query, page))
+            total -= size
+
+    def fetch(self, session, url, platform, query, page, headers=None, timeout=30):
+        """
+        Fetch a page through the cache with a `requests` session.
+
+        Returns a CachedResponse for fresh or successfully revalidated
+        entries, otherwise the live response (stored if its status is 200
+        and it has results). Entries are kept per host of `url`.
+        """
+        host = urlsplit(url).netloc
+        entry = self.get(platform, query, page, allow_stale=True, host=host)
+        if entry and entry.fresh:
+            self.hits += 1
+            return CachedResponse(entry.text)
+
+        request_headers = dict(headers or {})
+        if entry:
+            if entry.etag:
+                request_headers['If-None-Match'] = entry.etag
+            if entry.last_modified:
+                request_headers['If-Modified-Since'] = entry.last_modified
+
+        response = session.get(url, headers=request_headers, timeout=timeout)
+        if entry and response.status_code == 304:
+            self.revalidated += 1
+            self._touch(platform, query, page, host)
+            return CachedResponse(entry.text)
+
+        self.misses += 1
+        if response.status_code == 200 and has_results(platform, response.text):
+            self.put(platform, query, page, response.text,
+                     response.headers.get('ETag'), response.headers.get('Last-Modified'), host)
+        return response
+
+    def get_or_render(self, platform, query, page, render, host=''):
+        """
+        Return a cached page source, or call `render()` (e.g. a Selenium
+        page load returning `driver.page_source`) and cache its result if
+        it has results. `host` is the host the page is rendered from.
+        Returns a (text, from_cache) tuple.
+        """
+        entry = self.get(platform, query, page, host=host)
+        if entry:
+            self.hits += 1
+            return entry.text, True
+        self.misses += 1
+        text = render()
+        if text and has_results(platform, text):
+            self.put(platform, query, page, text, host=host)
+        return text, False
+
+    def clear(self):
+        with self._lock:
+            self._db.execute("DELETE FROM pages")
+            self._db.commit()
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+def get_default_cache():
+    """Return the process-wide cache at DEFAULT_CACHE_PATH (PAGE_CACHE_DIR overrides the directory)."""
+    global _default_cache
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = PageCache()
+        return _default_cache
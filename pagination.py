@@ -0,0 +1,39 @@
+"""
+Pagination planning for search results.
+
+Instead of discovering pages one at a time (fetch a page, look for a "Next
+page" link, fetch the next one), the planner reads page 1's result count
+and pagination bar, works out how many pages the query has, and the
+remaining pages are then requested together (see engine.HttpAdapter).
+"""
+import math
+import re
+
+_COUNT = re.compile(r'\d[\d,.]*')
+
+def parse_count(text):
+    """The first number in a count heading ("1,234 results for ...", "10,000+ results"), or None."""
+    match = _COUNT.search(text or '')
+    if not match:
+        return None
+    digits = re.sub(r'\D', '', match.group())
+    return int(digits) if digits else None
+
+def plan_page_count(links, page_size=None):
+    """
+    Number of result pages indicated by page 1's PageLinks, or None when
+    the page says neither.
+
+    Both the highest page number in the pagination bar and the result count
+    divided by `page_size` (default: the number of results on page 1) are
+    read, and the larger wins: a pagination bar may only show a window of
+    page numbers, and a count heading may be missing.
+    """
+    estimates = []
+    if links.last_page:
+        estimates.append(links.last_page)
+    total = parse_count(links.total_count)
+    page_size = page_size or len(links.hrefs)
+    if total and page_size:
+        estimates.append(math.ceil(total / page_size))
+    return max(estimates) if estimates else None
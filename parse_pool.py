@@ -0,0 +1,84 @@
+"""
+Process pool for link extraction.
+
+BeautifulSoup parsing is pure Python and holds the GIL, so a single process
+parses one page at a time however many pages are in flight. With a parse
+pool configured, the scraping engine sends each page's raw bytes to a worker
+process and only the extracted PageLinks come back, with the spans the
+worker recorded for the page, which are merged into this process's metrics.
+
+Workers are started with the "spawn" method: forking a process that runs
+fetch and browser threads can copy locks held by those threads into the
+child, which then deadlocks.
+
+    import parse_pool
+    parse_pool.configure(workers=4)   # every ScrapeEngine now parses in the pool
+"""
+import atexit
+import multiprocessing
+import os
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+
+from extraction import extract_links
+from metrics import metrics
+
+def _extract_bytes(platform, data, backend):
+    # Runs in a worker process, one page at a time, so its metrics hold only this page's spans
+    metrics.reset()
+    links = extract_links(platform, data.decode('utf-8', errors='replace'), backend=backend)
+    return links, metrics.export_spans()
+
+def _merge_result(source, result):
+    try:
+        links, spans = source.result()
+    except BaseException as e:
+        result.set_exception(e)
+        return
+    metrics.merge_spans(spans)
+    result.set_result(links)
+
+class ParsePool:
+    """A ProcessPoolExecutor that runs extract_links() on raw page bytes."""
+
+    def __init__(self, workers=None):
+        self.workers = workers or os.cpu_count() or 1
+        self._executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context('spawn'))
+
+    def submit(self, platform, html, backend=None):
+        """Start extracting a page (str or bytes) and return a Future of its PageLinks."""
+        data = html.encode('utf-8') if isinstance(html, str) else html
+        result = Future()
+        self._executor.submit(_extract_bytes, platform, data, backend).add_done_callback(
+            lambda source: _merge_result(source, result))
+        return result
+
+    def extract(self, platform, html, backend=None):
+        return self.submit(platform, html, backend).result()
+
+    def close(self):
+        self._executor.shutdown(wait=True, cancel_futures=True)
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def configure(workers):
+    """
+    Set the process-wide parse pool used by ScrapeEngine: `workers` worker
+    processes, or parse in-process again when `workers` is 0 or None.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close()
+        _pool = ParsePool(workers) if workers else None
+    return _pool
+
+def get_parse_pool():
+    """The configured parse pool, or None when pages are parsed in-process."""
+    return _pool
+
+@atexit.register
+def _close_pool():
+    if _pool is not None:
+        _pool.close()
@@ -0,0 +1,48 @@
+"""
+Registry of the supported platforms.
+
+Each scraper module is imported the first time its platform is used, so a
+process that only scrapes eBay never loads Selenium, and the Streamlit app
+starts without importing any scraper. Modules stay in `sys.modules`, so
+the import cost is paid once per process, not on every Streamlit rerun.
+
+    module = platforms.load('eBay')    # imports ebay.py on first use
+"""
+import importlib
+import sys
+from collections import namedtuple
+
+from metrics import metrics
+
+# `input` is what a search takes: a query, or (Airbnb) a search URL
+Platform = namedtuple('Platform', 'name id module input')
+
+PLATFORMS = {
+    'Amazon': Platform('Amazon', 'amazon', 'amazon', 'query'),
+    'eBay': Platform('eBay', 'ebay', 'ebay', 'query'),
+    'Walmart': Platform('Walmart', 'walmart', 'walmart', 'query'),
+    'Airbnb': Platform('Airbnb', 'airbnb', 'airbnb', 'url'),
+}
+
+def get_platform(name):
+    """The Platform for a display name ('eBay') or platform id ('ebay')."""
+    platform = PLATFORMS.get(name)
+    if platform is None:
+        platform = next((p for p in PLATFORMS.values() if p.id == name), None)
+    if platform is None:
+        raise ValueError(f"Unknown platform: {name}")
+    return platform
+
+def load(name):
+    """The scraper module of a platform, imported on first use."""
+    module_name = get_platform(name).module
+    module = sys.modules.get(module_name)
+    if module is None:
+        # importlib holds a per-module lock, so concurrent first uses import it once
+        with metrics.span('import', module=module_name):
+            module = importlib.import_module(module_name)
+    return module
+
+def loaded():
+    """Names of the platforms whose scraper modules are imported in this process."""
+    return [name for name, platform in PLATFORMS.items() if platform.module in sys.modules]
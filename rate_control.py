@@ -0,0 +1,136 @@
+import email.utils
+import threading
+import time
+from urllib.parse import urlsplit
+
+from metrics import metrics
+
+# Status codes that mean the host wants us to slow down
+BACKOFF_STATUSES = {429, 503}
+
+def parse_retry_after(value):
+    """Return the delay in seconds of a Retry-After header (seconds or HTTP date), or None."""
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        retry_at = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(retry_at.timestamp() - time.time(), 0.0)
+
+class RateController:
+    """
+    Token bucket for one host whose refill rate adapts with AIMD: every
+    healthy response adds `increase` requests/s (up to `max_rate`), every
+    429/503 or other 5xx multiplies the rate by `decrease` (down to
+    `min_rate`). A Retry-After header pauses the host for the requested time.
+    """
+
+    def __init__(self, rate=1.0, min_rate=0.05, max_rate=5.0, burst=4, increase=0.25, decrease=0.5, host=None):
+        self.host = host
+        self.rate = rate
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.burst = burst
+        self.increase = increase
+        self.decrease = decrease
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._blocked_until = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def current_rate(self):
+        """Requests per second currently allowed for this host."""
+        return self.rate
+
+    def _refill(self, now):
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self):
+        """Block until a request may be sent; return the number of seconds waited."""
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                delay = self._blocked_until - now
+                if delay <= 0:
+                    if self._tokens >= 1:
+                        self._tokens -= 1
+                        return waited
+                    delay = (1 - self._tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
+            metrics.observe('throttle', delay, host=self.host)
+
+    def on_response(self, status_code, retry_after=None):
+        """Adjust the rate from a response status and optional Retry-After header value."""
+        delay = parse_retry_after(retry_after)
+        with self._lock:
+            if status_code in BACKOFF_STATUSES or status_code >= 500:
+                self.rate = max(self.min_rate, self.rate * self.decrease)
+                # Without a Retry-After, pause for one interval at the new rate
+                pause = delay if delay is not None else 1 / self.rate
+                self._blocked_until = max(self._blocked_until, time.monotonic() + pause)
+                self._tokens = 0.0
+            elif status_code < 400:
+                self.rate = min(self.max_rate, self.rate + self.increase)
+
+class ThrottledSession:
+    """
+    Wraps a `requests` session so every GET waits for its host's
+    RateController and feeds the response status back into it. Responses
+    with status 429/503 are retried up to `max_retries` times after the
+    backoff the controller imposes.
+    """
+
+    def __init__(self, session, max_retries=3):
+        self.session = session
+        self.max_retries = max_retries
+        self.throttle_seconds = 0.0
+        # The session is shared by fetch threads
+        self._lock = threading.Lock()
+
+    def get(self, url, **kwargs):
+        controller = get_controller(url)
+        for attempt in range(self.max_retries + 1):
+            waited = controller.acquire()
+            with self._lock:
+                self.throttle_seconds += waited
+            response = self.session.get(url, **kwargs)
+            controller.on_response(response.status_code, response.headers.get('Retry-After'))
+            if response.status_code not in BACKOFF_STATUSES:
+                break
+            if attempt < self.max_retries:
+                # Releases the connection of a response requested with stream=True
+                response.close()
+            print(f"{urlsplit(url).netloc} returned {response.status_code}, "
+                  f"backing off to {controller.current_rate:.2f} req/s")
+        return response
+
+_controllers = {}
+_controllers_lock = threading.Lock()
+_defaults = {}
+
+def configure(**kwargs):
+    """Default RateController settings (rate, max_rate, burst, ...) for hosts seen from now on."""
+    with _controllers_lock:
+        _defaults.update(kwargs)
+
+def get_controller(url_or_host, **kwargs):
+    """Return the process-wide RateController for a host (created with `kwargs` on first use)."""
+    host = urlsplit(url_or_host).netloc or url_or_host
+    with _controllers_lock:
+        if host not in _controllers:
+            _controllers[host] = RateController(host=host, **{**_defaults, **kwargs})
+        return _controllers[host]
+
+def current_rates():
+    """Map each host seen so far to its current allowed requests per second."""
+    with _controllers_lock:
+        return {host: controller.current_rate for host, controller in _controllers.items()}
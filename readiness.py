@@ -0,0 +1,110 @@
+"""
+Event-driven readiness checks for the Selenium scrapers.
+
+Instead of sleeping a fixed number of seconds after driver.get, a page is
+considered ready once its result nodes are present and the DOM has stopped
+changing for a short quiet period (tracked with a MutationObserver). A hard
+timeout bounds the wait, and the time-to-ready of every page is recorded.
+"""
+import threading
+import time
+
+from selenium.common.exceptions import TimeoutException
+from selenium.webdriver.common.by import By
+from selenium.webdriver.support import expected_conditions as EC
+from selenium.webdriver.support.ui import WebDriverWait
+
+from metrics import metrics
+
+PLATFORM_READY = {
+    'amazon': {
+        'selector': 'div[data-component-type="s-search-result"]',
+        'timeout': 15,
+        'quiet_period': 0.5,
+        # The fixed waits this replaces, used to report the time saved
+        'fixed_wait': 4.0,
+    },
+    'airbnb': {
+        'selector': 'a[href*="/rooms/"]',
+        'timeout': 20,
+        'quiet_period': 1.0,
+        'fixed_wait': 5.0,
+    },
+}
+
+# Installs (once per document) an observer that stamps the time of the last DOM mutation
+_OBSERVE_SCRIPT = """
+if (!window.__lastMutation) {
+    window.__lastMutation = performance.now();
+    new MutationObserver(function () { window.__lastMutation = performance.now(); })
+        .observe(document, {childList: true, subtree: true, attributes: true});
+}
+return (performance.now() - window.__lastMutation) / 1000;
+"""
+
+class PageNotReady(TimeoutError):
+    """Raised when a page's results did not appear and settle within the timeout."""
+
+class ReadinessStats:
+    """Thread-safe record of time-to-ready per platform."""
+
+    def __init__(self):
+        self._times = {}
+        self._lock = threading.Lock()
+
+    def record(self, platform, seconds):
+        with self._lock:
+            self._times.setdefault(platform, []).append(seconds)
+
+    def summary(self):
+        """Map each platform to its page count, mean time-to-ready and total seconds saved."""
+        with self._lock:
+            result = {}
+            for platform, times in self._times.items():
+                fixed = PLATFORM_READY[platform]['fixed_wait']
+                result[platform] = {
+                    'pages': len(times),
+                    'mean_ready': sum(times) / len(times),
+                    'seconds_saved': sum(fixed - t for t in times),
+                }
+            return result
+
+stats = ReadinessStats()
+
+def wait_until_ready(driver, platform, timeout=None, quiet_period=None):
+    """
+    Block until the platform's result nodes are present and the DOM has been
+    quiet for `quiet_period` seconds. Returns the time-to-ready in seconds,
+    or raises PageNotReady after `timeout` seconds.
+    """
+    config = PLATFORM_READY[platform]
+    timeout = config['timeout'] if timeout is None else timeout
+    quiet_period = config['quiet_period'] if quiet_period is None else quiet_period
+    start = time.perf_counter()
+
+    try:
+        WebDriverWait(driver, timeout, poll_frequency=0.1).until(
+            EC.presence_of_element_located((By.CSS_SELECTOR, config['selector']))
+        )
+    except TimeoutException:
+        raise PageNotReady(f"{platform} results did not appear within {timeout}s") from None
+
+    # Results are present; wait for lazy-loaded cards to stop arriving
+    while True:
+        quiet_for = driver.execute_script(_OBSERVE_SCRIPT)
+        if quiet_for >= quiet_period:
+            break
+        if time.perf_counter() - start >= timeout:
+            print(f"{platform} page still changing after {timeout}s, using it as is")
+            break
+        time.sleep(max(quiet_period - quiet_for, 0.05))
+
+    elapsed = time.perf_counter() - start
+    stats.record(platform, elapsed)
+    metrics.observe('readiness_wait', elapsed, start=start, platform=platform)
+    print(f"{platform} page ready in {elapsed:.2f}s (fixed wait was {config['fixed_wait']:.0f}s)")
+    return elapsed
+
+def readiness_stats():
+    """Time-to-ready summary for all pages loaded so far in this process."""
+    return stats.summary()
@@ -0,0 +1,231 @@
+"""
+Compact in-memory table of scraped URLs for very large result sets.
+
+A list of {'platform': ..., 'query': ..., 'url': ...} dicts costs a few
+hundred bytes per URL: the dict itself, plus a full URL string that repeats
+the same `https://www.ebay.com/itm/` prefix every time. ResultStore keeps
+the same rows in array-backed columns:
+
+- platform and query: codes into tables of interned names,
+- url: a code into a table of interned prefixes (scheme, host and a short
+  first path segment, e.g. `https://www.ebay.com/itm/`) plus the rest of
+  the URL, usually just the item ID, stored as UTF-8 in one shared buffer.
+
+A canonical URL takes about 30 bytes this way (see
+benchmarks/bench_result_store.py). to_arrow() wraps the column buffers
+without copying them, and to_pandas() builds categoricals on top of them.
+
+    store = ResultStore(dedupe=True)
+    store.extend('ebay', 'laptop', urls)
+    for row in store:        # {'platform': 'ebay', 'query': 'laptop', 'url': ...}
+        ...
+    df = store.to_pandas()
+"""
+import importlib.util
+from array import array
+
+# pyarrow is imported by the first to_arrow() call, not when the store is created
+HAVE_PYARROW = importlib.util.find_spec('pyarrow') is not None
+
+# Longest first path segment kept in an interned prefix ('itm', 'dp', 'ip', 'rooms', ...)
+MAX_PREFIX_SEGMENT = 12
+
+def split_url(url):
+    """Split a URL into an interned prefix and the rest: ('https://www.ebay.com/itm/', '1234')."""
+    scheme = url.find('//')
+    slash = url.find('/', scheme + 2 if scheme >= 0 else 0)
+    if slash < 0:
+        return url, ''
+    second = url.find('/', slash + 1, slash + MAX_PREFIX_SEGMENT + 2)
+    if second < 0 or '?' in url[slash:second] or '#' in url[slash:second]:
+        return url[:slash + 1], url[slash + 1:]
+    return url[:second + 1], url[second + 1:]
+
+class ResultStore:
+    """
+    Append-only (platform, query, url) rows in columnar arrays.
+
+    With `dedupe`, append() drops a URL already stored for the same platform
+    (under any query). The dedup index is an open-addressing table of row
+    numbers, 8 bytes per row, and compares the stored rows exactly.
+
+    Arrow and pandas objects returned by to_arrow()/to_pandas() share the
+    column buffers, so the store cannot grow while they are alive; export
+    once the crawl is done.
+    """
+
+    def __init__(self, dedupe=False):
+        self.dedupe = dedupe
+        self.platforms = []
+        self.queries = []
+        self.prefixes = []
+        self._codes = ({}, {}, {})
+        self._platform = array('B')
+        self._query = array('I')
+        self._prefix = array('I')
+        self._offsets = array('q', [0])
+        self._data = bytearray()
+        # Row number + 1 per slot, 0 for an empty slot
+        self._slots = array('I', bytes(4 * 16)) if dedupe else None
+
+    def _intern(self, table, names, name):
+        code = self._codes[table].get(name)
+        if code is None:
+            code = self._codes[table][name] = len(names)
+            if table == 0 and code > 255:
+                raise ValueError("ResultStore holds at most 256 platforms")
+            names.append(name)
+        return code
+
+    def _suffix(self, row):
+        return self._data[self._offsets[row]:self._offsets[row + 1]]
+
+    def _find(self, platform, prefix, suffix):
+        """Index of the slot holding an equal row (and True), or of the empty slot where it goes."""
+        slots = self._slots
+        mask = len(slots) - 1
+        i = hash((platform, prefix, suffix)) & mask
+        while slots[i]:
+            row = slots[i] - 1
+            if self._platform[row] == platform and self._prefix[row] == prefix and self._suffix(row) == suffix:
+                return i, True
+            i = (i + 1) & mask
+        return i, False
+
+    def _grow_index(self):
+        self._slots = array('I', bytes(8 * len(self._slots)))
+        for row in range(len(self)):
+            slot, _ = self._find(self._platform[row], self._prefix[row], bytes(self._suffix(row)))
+            self._slots[slot] = row + 1
+
+    def append(self, platform, query, url):
+        """Add one row; returns False, adding nothing, for a duplicate when `dedupe` is on."""
+        platform_code = self._intern(0, self.platforms, platform)
+        prefix, suffix = split_url(url)
+        prefix_code = self._intern(2, self.prefixes, prefix)
+        suffix = suffix.encode('utf-8')
+        if self.dedupe:
+            slot, found = self._find(platform_code, prefix_code, suffix)
+            if found:
+                return False
+        row = len(self._platform)
+        self._data += suffix
+        self._offsets.append(len(self._data))
+        self._platform.append(platform_code)
+        self._query.append(self._intern(1, self.queries, query))
+        self._prefix.append(prefix_code)
+        if self.dedupe:
+            self._slots[slot] = row + 1
+            # Keep the table at most half full so probe chains stay short
+            if (row + 1) * 2 > len(self._slots):
+                self._grow_index()
+        return True
+
+    def extend(self, platform, query, urls):
+        """Append one row per URL; returns the number of rows added."""
+        return sum(self.append(platform, query, url) for url in urls)
+
+    def __contains__(self, item):
+        """`(platform, url) in store`"""
+        platform, url = item
+        platform_code = self._codes[0].get(platform)
+        prefix, suffix = split_url(url)
+        prefix_code = self._codes[2].get(prefix)
+        if platform_code is None or prefix_code is None:
+            return False
+        suffix = suffix.encode('utf-8')
+        if self.dedupe:
+            return self._find(platform_code, prefix_code, suffix)[1]
+        return any(self._platform[row] == platform_code and self._prefix[row] == prefix_code
+                   and self._suffix(row) == suffix for row in range(len(self)))
+
+    def __len__(self):
+        return len(self._platform)
+
+    def row(self, index):
+        """Row `index` as a dict with platform, query and url."""
+        if index < 0:
+            index += len(self)
+        return {
+            'platform': self.platforms[self._platform[index]],
+            'query': self.queries[self._query[index]],
+            'url': self.prefixes[self._prefix[index]] + self._suffix(index).decode('utf-8'),
+        }
+
+    def rows(self, start=0, stop=None):
+        """Iterate over rows `start` to `stop` (as for a slice) as dicts."""
+        for index in range(*slice(start, stop).indices(len(self))):
+            yield self.row(index)
+
+    def __iter__(self):
+        return self.rows()
+
+    def urls(self):
+        """Iterate over the URLs only."""
+        for index in range(len(self)):
+            yield self.prefixes[self._prefix[index]] + self._suffix(index).decode('utf-8')
+
+    def nbytes(self):
+        """Bytes held by the columns, the dedup index and the interned tables (estimated)."""
+        columns = (self._platform, self._query, self._prefix, self._offsets)
+        total = sum(column.itemsize * len(column) for column in columns) + len(self._data)
+        if self._slots is not None:
+            total += self._slots.itemsize * len(self._slots)
+        for names in (self.platforms, self.queries, self.prefixes):
+            total += sum(len(name) + 100 for name in names)
+        return total
+
+    def to_arrow(self, full_urls=True):
+        """
+        A pyarrow Table with dictionary-encoded platform and query columns.
+        With `full_urls`, the url column is assembled by Arrow (one new
+        buffer); otherwise url_prefix and url_suffix columns wrap the
+        store's buffers without any copy.
+        """
+        if not HAVE_PYARROW:
+            raise RuntimeError("to_arrow() needs the pyarrow package")
+        import pyarrow as pa
+        import pyarrow.compute as pc
+        count = len(self)
+
+        def dictionary(index_type, codes, names):
+            indices = pa.Array.from_buffers(index_type, count, [None, pa.py_buffer(codes)])
+            return pa.DictionaryArray.from_arrays(indices, pa.array(names, pa.string()))
+
+        prefix = dictionary(pa.uint32(), self._prefix, self.prefixes)
+        suffix = pa.Array.from_buffers(pa.large_string(), count,
+                                       [None, pa.py_buffer(self._offsets), pa.py_buffer(self._data)])
+        columns = {
+            'platform': dictionary(pa.uint8(), self._platform, self.platforms),
+            'query': dictionary(pa.uint32(), self._query, self.queries),
+        }
+        if full_urls:
+            separator = pa.scalar('', pa.large_string())
+            columns['url'] = pc.binary_join_element_wise(prefix.cast(pa.large_string()), suffix, separator)
+        else:
+            columns['url_prefix'] = prefix
+            columns['url_suffix'] = suffix
+        return pa.table(columns)
+
+    def to_pandas(self, full_urls=True):
+        """
+        A DataFrame with categorical platform and query columns. With
+        pyarrow, the url column stays in Arrow memory (an ArrowDtype column)
+        instead of becoming one Python string per row.
+        """
+        import pandas as pd
+        if HAVE_PYARROW:
+            import pyarrow as pa
+            strings = (pa.string(), pa.large_string())
+            return self.to_arrow(full_urls).to_pandas(
+                types_mapper=lambda arrow_type: pd.ArrowDtype(arrow_type) if arrow_type in strings else None)
+        frame = pd.DataFrame({
+            'platform': pd.Categorical.from_codes(list(self._platform), self.platforms),
+            'query': pd.Categorical.from_codes(list(self._query), self.queries),
+        })
+        if full_urls:
+            frame['url'] = list(self.urls())
+        else:
+            frame['url_prefix'] = pd.Categorical.from_codes(list(self._prefix), self.prefixes)
+            frame['url_suffix'] = [self._suffix(index).decode('utf-8') for index in range(len(self))]
+        return frame
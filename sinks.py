@@ -0,0 +1,163 @@
+import csv
+import importlib.util
+import json
+import os
+
+# pyarrow is imported by the first ParquetSink, so processes that never write Parquet skip its import time
+HAVE_PYARROW = importlib.util.find_spec('pyarrow') is not None
+
+class ResultSink:
+    """
+    Base class for result writers that stream rows to a file as they are
+    extracted instead of collecting them in memory first.
+    """
+
+    extension = ''
+    # Whether rows are in the file once write_many() returns (False: only once the sink is closed)
+    durable = True
+
+    def __init__(self, path):
+        self.path = path
+        self.count = 0
+
+    def write(self, row):
+        self.write_many([row])
+
+    def write_many(self, rows):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+class CsvSink(ResultSink):
+    """CSV writer; the header comes from `fieldnames` or the keys of the first row."""
+
+    extension = '.csv'
+
+    def __init__(self, path, fieldnames=None, append=False):
+        super().__init__(path)
+        self.fieldnames = fieldnames
+        exists = append and os.path.exists(path) and os.path.getsize(path) > 0
+        self._file = open(path, 'a' if append else 'w', newline='', encoding='utf-8')
+        self._writer = None
+        self._header_written = exists
+        if exists and fieldnames is None:
+            with open(path, newline='', encoding='utf-8') as f:
+                self.fieldnames = next(csv.reader(f))
+
+    def write_many(self, rows):
+        for row in rows:
+            if self._writer is None:
+                self.fieldnames = self.fieldnames or list(row)
+                self._writer = csv.DictWriter(self._file, fieldnames=self.fieldnames, extrasaction='ignore')
+                if not self._header_written:
+                    self._writer.writeheader()
+                    self._header_written = True
+            self._writer.writerow(row)
+            self.count += 1
+        self._file.flush()
+
+    def close(self):
+        if not self._header_written and self.fieldnames:
+            csv.writer(self._file).writerow(self.fieldnames)
+        self._file.close()
+
+class JsonlSink(ResultSink):
+    """One JSON object per line."""
+
+    extension = '.jsonl'
+
+    def __init__(self, path, append=False):
+        super().__init__(path)
+        self._file = open(path, 'a' if append else 'w', encoding='utf-8')
+
+    def write_many(self, rows):
+        for row in rows:
+            self._file.write(json.dumps(row) + '\n')
+            self.count += 1
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+class ParquetSink(ResultSink):
+    """
+    Parquet writer that buffers at most `row_group_size` rows and writes
+    each full buffer as one row group. Needs pyarrow; Parquet files cannot
+    be appended to. The file's footer is written by close(), so nothing in
+    it can be read before then.
+    """
+
+    extension = '.parquet'
+    durable = False
+
+    def __init__(self, path, fieldnames=None, row_group_size=10_000):
+        if not HAVE_PYARROW:
+            raise RuntimeError("Parquet output needs the pyarrow package")
+        import pyarrow
+        import pyarrow.parquet
+        self._pa, self._pq = pyarrow, pyarrow.parquet
+        super().__init__(path)
+        self.fieldnames = fieldnames
+        self.row_group_size = row_group_size
+        self._buffer = []
+        self._writer = None
+
+    def write_many(self, rows):
+        for row in rows:
+            self._buffer.append(row)
+            self.count += 1
+            if len(self._buffer) >= self.row_group_size:
+                self._flush()
+
+    def _flush(self):
+        if not self._buffer:
+            return
+        self.fieldnames = self.fieldnames or list(self._buffer[0])
+        columns = {name: [row.get(name) for row in self._buffer] for name in self.fieldnames}
+        pa = self._pa
+        table = pa.table({name: pa.array(values, type=pa.string()) for name, values in columns.items()})
+        if self._writer is None:
+            self._writer = self._pq.ParquetWriter(self.path, table.schema)
+        self._writer.write_table(table)
+        self._buffer = []
+
+    def close(self):
+        self._flush()
+        if self._writer is None and self.fieldnames:
+            # Still write a valid (empty) file when no rows arrived
+            schema = self._pa.schema([(name, self._pa.string()) for name in self.fieldnames])
+            self._writer = self._pq.ParquetWriter(self.path, schema)
+        if self._writer is not None:
+            self._writer.close()
+
+SINK_FORMATS = {
+    'csv': CsvSink,
+    'jsonl': JsonlSink,
+    'parquet': ParquetSink,
+}
+
+def available_formats():
+    return [name for name in SINK_FORMATS if name != 'parquet' or HAVE_PYARROW]
+
+def open_sink(path, fieldnames=None, format=None, append=False):
+    """
+    Open a sink for `path`, choosing the format from `format` or the file
+    extension (.csv, .jsonl, .parquet).
+    """
+    format = format or os.path.splitext(path)[1].lstrip('.').lower() or 'csv'
+    if format not in SINK_FORMATS:
+        raise ValueError(f"Unsupported output format: {format}")
+    if format == 'jsonl':
+        return JsonlSink(path, append=append)
+    if format == 'parquet':
+        if append and os.path.exists(path):
+            raise ValueError(f"Cannot append to existing Parquet file {path}")
+        return ParquetSink(path, fieldnames)
+    return CsvSink(path, fieldnames, append=append)
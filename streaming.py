@@ -0,0 +1,256 @@
+"""
+Streaming fetches that stop reading a result page once its results are in.
+
+eBay, Walmart and Amazon result pages carry most of their bytes after the
+results grid, in inline scripts. A StreamingSession wraps the
+`session.get()` interface the scrapers use (the shared HttpClient, a
+ThrottledSession) so that the body of a 200 response is fed to an
+extraction.StreamExtractor chunk by chunk as it arrives:
+
+- `on_href(url, href)` is called for every result link as soon as its
+  listing has been parsed, while the rest of the page is still arriving,
+- once the platform's `stream_end` element (see extraction.py) has been
+  parsed, the rest of the body is not read and the connection is closed.
+  When reading the rest at the page's download rate would take less time
+  than opening a new connection to the host takes (see
+  http_client.client_stats), the rest is read and the connection kept
+  instead. Over HTTP/2 only the stream is cancelled.
+
+The response's `text` is the HTML read, a StreamedPage that carries its
+PageLinks, so the scraping engine does not parse it again. The HTML before
+the cut extracts to the same links as the whole page, so it is also what
+the page cache stores. Bytes saved and time to the first URL are recorded
+per page (see `stream_stats()` and the `first_url` span and `bytes_saved`
+counter in metrics.py).
+
+    session = StreamingSession(get_session(), 'ebay', on_href=lambda url, href: print(href))
+    response = session.get(url, headers=headers, timeout=30)
+    response.text.links, response.first_url, response.bytes_saved
+"""
+import re
+import threading
+import time
+from urllib.parse import urlsplit
+
+import requests
+
+from extraction import PLATFORM_SELECTORS, StreamExtractor, lxml
+from http_client import client_stats, httpx
+from metrics import metrics
+
+HAVE_STREAMING = lxml is not None
+
+CHUNK_SIZE = 16 * 1024
+
+# A cut response with at most this many bytes left is always read to the end, keeping its connection open
+DRAIN_BYTES = 16 * 1024
+
+# Transport errors raised while reading an httpx body, re-raised as requests.RequestException
+READ_ERRORS = (httpx.HTTPError,) if httpx is not None else ()
+
+_CHARSET = re.compile(r'charset=["\']?([\w.:-]+)', re.I)
+
+def can_stream(platform):
+    """Whether pages of `platform` can be cut after their results."""
+    return HAVE_STREAMING and bool(PLATFORM_SELECTORS.get(platform, {}).get('stream_end'))
+
+class StreamedPage(str):
+    """HTML of a streamed page, possibly cut after its results, carrying the PageLinks extracted from it."""
+
+    def __new__(cls, text, links):
+        page = super().__new__(cls, text)
+        page.links = links
+        return page
+
+class StreamedResponse:
+    """
+    The subset of `requests.Response` the scrapers use (status_code,
+    headers, content, text), for a page read by a StreamingSession.
+
+    `bytes_read` and `bytes_total` count bytes on the wire (compressed, if
+    the page was); `bytes_total` is None when the server sent no
+    Content-Length. `first_url` is the number of seconds from sending the
+    request to parsing the first result link, or None.
+    """
+
+    from_cache = False
+
+    def __init__(self, response, content, links, encoding, bytes_read, bytes_total, first_url, cut):
+        self.status_code = response.status_code
+        self.headers = response.headers
+        self.url = str(response.url)
+        self.content = bytes(content)
+        self.text = StreamedPage(self.content.decode(encoding, errors='replace'), links)
+        self.bytes_read = bytes_read
+        self.bytes_total = bytes_total
+        self.first_url = first_url
+        self.cut = cut
+
+    @property
+    def bytes_saved(self):
+        """Bytes of the page that were never downloaded (None when the page size is unknown)."""
+        if not self.cut:
+            return 0
+        if self.bytes_total is None:
+            return None
+        return max(self.bytes_total - self.bytes_read, 0)
+
+    def report(self):
+        """One-line summary, e.g. 'first URL after 85 ms, read 48 of 2,150 KB'."""
+        first = f"first URL after {self.first_url * 1000:.0f} ms" if self.first_url is not None else "no URLs"
+        total = f" of {self.bytes_total / 1024:,.0f}" if self.bytes_total is not None else ""
+        stopped = " (stopped after the results)" if self.cut else ""
+        return f"{first}, read {self.bytes_read / 1024:,.0f}{total} KB{stopped}"
+
+class StreamStats:
+    """Thread-safe per-platform totals of streamed pages, bytes read and saved, and time to the first URL."""
+
+    def __init__(self):
+        self._platforms = {}
+        self._lock = threading.Lock()
+
+    def record(self, platform, response):
+        with self._lock:
+            counts = self._platforms.setdefault(platform, {
+                'pages': 0, 'cut_pages': 0, 'bytes_read': 0, 'bytes_saved': 0, 'first_url_s': 0.0, 'first_urls': 0,
+            })
+            counts['pages'] += 1
+            counts['cut_pages'] += response.cut
+            counts['bytes_read'] += response.bytes_read
+            counts['bytes_saved'] += response.bytes_saved or 0
+            if response.first_url is not None:
+                counts['first_url_s'] += response.first_url
+                counts['first_urls'] += 1
+
+    def summary(self):
+        with self._lock:
+            result = {}
+            for platform, counts in self._platforms.items():
+                first_urls = counts['first_urls']
+                result[platform] = {
+                    'pages': counts['pages'],
+                    'cut_pages': counts['cut_pages'],
+                    'bytes_read': counts['bytes_read'],
+                    'bytes_saved': counts['bytes_saved'],
+                    'mean_first_url_ms': round(counts['first_url_s'] / first_urls * 1000, 1) if first_urls else None,
+                }
+            return result
+
+    def reset(self):
+        with self._lock:
+            self._platforms.clear()
+
+stats = StreamStats()
+
+def _charset(response):
+    # requests assumes ISO-8859-1 for text/html without a charset; result pages are UTF-8
+    match = _CHARSET.search(response.headers.get('Content-Type', ''))
+    return match.group(1) if match else 'utf-8'
+
+def _chunks(response):
+    if hasattr(response, 'iter_content'):
+        return response.iter_content(CHUNK_SIZE)
+    return response.iter_bytes(CHUNK_SIZE)  # httpx
+
+def _wire_bytes(response):
+    raw = getattr(response, 'raw', None)
+    if raw is not None and hasattr(raw, 'tell'):
+        return raw.tell()
+    return getattr(response, 'num_bytes_downloaded', 0)  # httpx
+
+def _content_length(response):
+    value = response.headers.get('Content-Length')
+    return int(value) if value and value.isdigit() else None
+
+def _should_drain(response, host, remaining, bytes_read, seconds):
+    """Whether reading the `remaining` bytes is cheaper than opening a new connection for the next page."""
+    if remaining is None or getattr(response, 'http_version', None) == 'HTTP/2':
+        return False
+    if remaining <= DRAIN_BYTES:
+        return True
+    connect_ms = client_stats().get(host, {}).get('mean_connect_ms')
+    if not connect_ms or not bytes_read or seconds <= 0:
+        return False
+    return remaining / (bytes_read / seconds) * 1000 < connect_ms
+
+class StreamingSession:
+    """
+    Wraps a session so that GETs of `platform` result pages are parsed
+    while they download and cut after the results (see the module
+    docstring). Other responses, and every response when the platform has
+    no `stream_end` or lxml is missing, are read as usual.
+    """
+
+    def __init__(self, session, platform, on_href=None):
+        self.session = session
+        self.platform = platform
+        self.on_href = on_href
+        self.enabled = can_stream(platform)
+
+    def get(self, url, **kwargs):
+        if not self.enabled:
+            return self.session.get(url, **kwargs)
+        start = time.perf_counter()
+        response = self.session.get(url, stream=True, **kwargs)
+        if not hasattr(response, 'iter_content') and not hasattr(response, 'iter_bytes'):
+            return response  # already read, e.g. by a test double
+        if response.status_code != 200:
+            if hasattr(response, 'iter_content'):
+                response.content  # read the body as a plain request would
+            else:
+                response.read()
+            return response
+        try:
+            return self._read(url, response, start, time.perf_counter())
+        except READ_ERRORS as e:
+            raise requests.ConnectionError(str(e)) from e
+        finally:
+            response.close()
+
+    def _read(self, url, response, start, headers_at):
+        first_url = []
+
+        def on_href(href):
+            if not first_url:
+                first_url.append(time.perf_counter() - start)
+            if self.on_href:
+                self.on_href(url, href)
+
+        encoding = _charset(response)
+        extractor = StreamExtractor(self.platform, on_href, encoding)
+        body = bytearray()
+        chunks = _chunks(response)
+        cut = False
+        for chunk in chunks:
+            body += chunk
+            if extractor is None:
+                continue
+            try:
+                cut = extractor.feed(chunk)
+            except Exception as e:
+                print(f"Streaming extraction failed ({e}), reading the whole page")
+                extractor = None
+            if cut:
+                break
+        links = extractor.close() if extractor is not None else None
+        host = urlsplit(url).netloc
+        bytes_read = _wire_bytes(response)
+        bytes_total = _content_length(response)
+        remaining = bytes_total - bytes_read if bytes_total is not None else None
+        if cut and _should_drain(response, host, remaining, bytes_read, time.perf_counter() - headers_at):
+            for _ in chunks:
+                pass
+            bytes_read = _wire_bytes(response)
+
+        result = StreamedResponse(response, body, links, encoding, bytes_read, bytes_total,
+                                  first_url[0] if first_url else None, cut)
+        stats.record(self.platform, result)
+        if result.first_url is not None:
+            metrics.observe('first_url', result.first_url, platform=self.platform, host=host)
+        if result.bytes_saved:
+            metrics.count('bytes_saved', result.bytes_saved, platform=self.platform, host=host)
+        return result
+
+def stream_stats():
+    """Per-platform streamed pages, pages cut after their results, bytes read and saved, and mean time to the first URL."""
+    return stats.summary()
@@ -0,0 +1,375 @@
+"""
+Shared queues of (platform, query, page) crawl tasks for distributed.py.
+
+Workers claim a task with a lease, renew the lease while they work on it,
+and either complete it (storing its URLs, deduplicated across all tasks,
+and queueing follow-up pages) or fail it. A task whose lease runs out, e.g.
+because its worker died, goes back on the queue; after `max_attempts`
+claims it is marked failed.
+
+Two backends share that interface:
+
+- SqliteTaskQueue: one SQLite file, for workers on a single host
+  (`sqlite:///crawl_queue.sqlite`)
+- RedisTaskQueue: any server speaking the Redis protocol, for workers on
+  several hosts (`redis://host:6379/0`)
+
+    queue = open_queue('sqlite:///crawl_queue.sqlite')
+"""
+import json
+import socket
+import sqlite3
+import threading
+import time
+from collections import namedtuple
+from urllib.parse import urlsplit
+
+from url_canon import item_key
+
+# `max_pages` None means as many pages as the platform reports (see pagination.py)
+Task = namedtuple('Task', ['platform', 'query', 'page', 'max_pages'])
+
+DEFAULT_LEASE = 120
+DEFAULT_MAX_ATTEMPTS = 3
+
+class SqliteTaskQueue:
+    """Task queue and result store in one SQLite file, safe for several processes on one host."""
+
+    def __init__(self, path, max_attempts=DEFAULT_MAX_ATTEMPTS):
+        self.path = path
+        self.max_attempts = max_attempts
+        self._lock = threading.Lock()
+        # Transactions are managed explicitly; BEGIN IMMEDIATE serializes claims between processes
+        self._db = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript(
+            """CREATE TABLE IF NOT EXISTS tasks (
+                id INTEGER PRIMARY KEY,
+                platform TEXT NOT NULL,
+                query TEXT NOT NULL,
+                page INTEGER NOT NULL,
+                max_pages INTEGER,
+                state TEXT NOT NULL DEFAULT 'queued',
+                worker TEXT,
+                lease_until REAL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                error TEXT,
+                UNIQUE (platform, query, page)
+            );
+            CREATE INDEX IF NOT EXISTS tasks_state ON tasks (state, lease_until);
+            CREATE TABLE IF NOT EXISTS results (
+                id INTEGER PRIMARY KEY,
+                platform TEXT NOT NULL,
+                key TEXT NOT NULL,
+                url TEXT NOT NULL,
+                query TEXT NOT NULL,
+                page INTEGER NOT NULL,
+                worker TEXT,
+                UNIQUE (platform, key)
+            );"""
+        )
+
+    def _transaction(self, statements):
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                result = statements(self._db)
+                self._db.execute("COMMIT")
+                return result
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+
+    def put(self, tasks):
+        """Queue tasks; tasks already known (queued, running or done) are ignored. Returns the number added."""
+        def add(db):
+            before = db.total_changes
+            db.executemany(
+                "INSERT OR IGNORE INTO tasks (platform, query, page, max_pages) VALUES (?, ?, ?, ?)",
+                [tuple(task) for task in tasks],
+            )
+            return db.total_changes - before
+        return self._transaction(add)
+
+    def claim(self, worker, lease=DEFAULT_LEASE):
+        """Lease the next queued (or expired) task to `worker`; returns a Task or None."""
+        def take(db):
+            now = time.time()
+            # Expired leases go back on the queue, or fail once they have used up their attempts
+            db.execute("UPDATE tasks SET state='failed', error='lease expired' "
+                       "WHERE state='leased' AND lease_until<? AND attempts>=?", (now, self.max_attempts))
+            row = db.execute(
+                "SELECT id, platform, query, page, max_pages FROM tasks "
+                "WHERE state='queued' OR (state='leased' AND lease_until<?) ORDER BY page, id LIMIT 1",
+                (now,),
+            ).fetchone()
+            if row is None:
+                return None
+            db.execute("UPDATE tasks SET state='leased', worker=?, lease_until=?, attempts=attempts+1 WHERE id=?",
+                       (worker, now + lease, row[0]))
+            return Task(*row[1:])
+        return self._transaction(take)
+
+    def renew(self, task, worker, lease=DEFAULT_LEASE):
+        """Extend the lease of a task `worker` is still working on; False if the lease was lost."""
+        def extend(db):
+            return db.execute(
+                "UPDATE tasks SET lease_until=? WHERE platform=? AND query=? AND page=? AND state='leased' AND worker=?",
+                (time.time() + lease, task.platform, task.query, task.page, worker),
+            ).rowcount > 0
+        return self._transaction(extend)
+
+    def complete(self, task, worker, urls, next_tasks=()):
+        """Store the task's URLs (skipping ones already found by any task), queue `next_tasks`, mark it done."""
+        def finish(db):
+            before = db.total_changes
+            db.executemany(
+                "INSERT OR IGNORE INTO results (platform, key, url, query, page, worker) VALUES (?, ?, ?, ?, ?, ?)",
+                [(task.platform, item_key(task.platform, url), url, task.query, task.page, worker) for url in urls],
+            )
+            added = db.total_changes - before
+            db.executemany(
+                "INSERT OR IGNORE INTO tasks (platform, query, page, max_pages) VALUES (?, ?, ?, ?)",
+                [tuple(next_task) for next_task in next_tasks],
+            )
+            db.execute("UPDATE tasks SET state='done', lease_until=NULL, error=NULL "
+                       "WHERE platform=? AND query=? AND page=?", (task.platform, task.query, task.page))
+            return added
+        return self._transaction(finish)
+
+    def fail(self, task, worker, error):
+        """
+        Give the task back for a retry, or mark it failed once it has used up
+        its attempts. Ignored when `worker` no longer holds the lease (it
+        expired and the task was handed to another worker).
+        """
+        def give_back(db):
+            db.execute(
+                "UPDATE tasks SET state=CASE WHEN attempts>=? THEN 'failed' ELSE 'queued' END, "
+                "lease_until=NULL, error=? WHERE platform=? AND query=? AND page=? AND state='leased' AND worker=?",
+                (self.max_attempts, str(error), task.platform, task.query, task.page, worker),
+            )
+        self._transaction(give_back)
+
+    def counts(self):
+        """Number of tasks per state (queued, leased, done, failed) and of stored results."""
+        with self._lock:
+            counts = {'queued': 0, 'leased': 0, 'done': 0, 'failed': 0}
+            counts.update(self._db.execute("SELECT state, COUNT(*) FROM tasks GROUP BY state").fetchall())
+            counts['results'] = self._db.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+            return counts
+
+    def failures(self):
+        """(Task, error) for every failed task."""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT platform, query, page, max_pages, error FROM tasks WHERE state='failed' ORDER BY id"
+            ).fetchall()
+        return [(Task(*row[:4]), row[4]) for row in rows]
+
+    def results(self):
+        """Yield the deduplicated results as {platform, query, page, url} in the order they were found."""
+        with self._lock:
+            rows = self._db.execute("SELECT platform, query, page, url FROM results ORDER BY id").fetchall()
+        for platform, query, page, url in rows:
+            yield {'platform': platform, 'query': query, 'page': page, 'url': url}
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+class RespError(Exception):
+    """An error reply from a Redis-protocol server."""
+
+class RespClient:
+    """
+    Minimal client for the Redis serialization protocol (RESP2): enough to
+    send commands and read replies over one socket, without the redis
+    package. Commands are serialized with a lock, so it can be shared by
+    threads.
+    """
+
+    def __init__(self, host='127.0.0.1', port=6379, db=0, password=None, timeout=30):
+        self._sock = socket.create_connection((host, port), timeout=timeout)
+        self._file = self._sock.makefile('rb')
+        self._lock = threading.Lock()
+        if password:
+            self.execute('AUTH', password)
+        if db:
+            self.execute('SELECT', db)
+
+    def execute(self, *args):
+        payload = [f'*{len(args)}\r\n'.encode()]
+        for arg in args:
+            data = arg if isinstance(arg, bytes) else str(arg).encode('utf-8')
+            payload.append(b'$%d\r\n%s\r\n' % (len(data), data))
+        with self._lock:
+            self._sock.sendall(b''.join(payload))
+            return self._read()
+
+    def _read(self):
+        line = self._file.readline()
+        if not line:
+            raise ConnectionError("Connection closed by the server")
+        kind, rest = line[:1], line[1:-2]
+        if kind == b'+':
+            return rest.decode('utf-8')
+        if kind == b'-':
+            raise RespError(rest.decode('utf-8'))
+        if kind == b':':
+            return int(rest)
+        if kind == b'$':
+            length = int(rest)
+            if length < 0:
+                return None
+            data = self._file.read(length + 2)[:-2]
+            return data.decode('utf-8')
+        if kind == b'*':
+            length = int(rest)
+            return None if length < 0 else [self._read() for _ in range(length)]
+        raise RespError(f"Unexpected reply: {line!r}")
+
+    def close(self):
+        self._file.close()
+        self._sock.close()
+
+class RedisTaskQueue:
+    """
+    The task queue on a Redis-protocol server, for workers on several hosts.
+
+    Tasks are JSON strings. `<prefix>:tasks` is the set of every task ever
+    queued (so none is queued twice), `<prefix>:queued` a list and
+    `<prefix>:leased` a sorted set scored by lease deadline. Results are
+    deduplicated with HSETNX on `<prefix>:keys` and appended to the
+    `<prefix>:results` list. Only single commands are used (no scripts or
+    transactions), so any Redis-protocol server will do: LPOP hands a task
+    to exactly one worker and ZREM lets exactly one worker requeue an
+    expired lease. A worker killed between its LPOP and the ZADD of the
+    lease that follows it drops that one task. A worker only releases a
+    lease that `<prefix>:workers` still gives to it, so a worker whose lease
+    expired cannot release the lease of the worker the task went to next.
+    """
+
+    def __init__(self, client, prefix='crawl', max_attempts=DEFAULT_MAX_ATTEMPTS):
+        self.client = client
+        self.prefix = prefix
+        self.max_attempts = max_attempts
+
+    def _key(self, name):
+        return f'{self.prefix}:{name}'
+
+    @staticmethod
+    def _encode(task):
+        return json.dumps(list(task), separators=(',', ':'))
+
+    def _enqueue(self, tasks):
+        added = 0
+        for task in tasks:
+            payload = self._encode(task)
+            if self.client.execute('SADD', self._key('tasks'), payload):
+                self.client.execute('RPUSH', self._key('queued'), payload)
+                added += 1
+        return added
+
+    def put(self, tasks):
+        return self._enqueue(tasks)
+
+    def _requeue_expired(self):
+        expired = self.client.execute('ZRANGEBYSCORE', self._key('leased'), '-inf', time.time())
+        for payload in expired or []:
+            # Only the worker whose ZREM succeeds requeues the task
+            if not self.client.execute('ZREM', self._key('leased'), payload):
+                continue
+            if int(self.client.execute('HGET', self._key('attempts'), payload) or 0) >= self.max_attempts:
+                self.client.execute('HSET', self._key('failed'), payload, 'lease expired')
+            else:
+                self.client.execute('RPUSH', self._key('queued'), payload)
+
+    def claim(self, worker, lease=DEFAULT_LEASE):
+        self._requeue_expired()
+        while True:
+            payload = self.client.execute('LPOP', self._key('queued'))
+            if payload is None:
+                return None
+            if self.client.execute('SISMEMBER', self._key('done'), payload):
+                continue  # finished late by the worker whose lease had expired
+            self.client.execute('ZADD', self._key('leased'), time.time() + lease, payload)
+            self.client.execute('HINCRBY', self._key('attempts'), payload, 1)
+            self.client.execute('HSET', self._key('workers'), payload, worker)
+            return Task(*json.loads(payload))
+
+    def _holds_lease(self, payload, worker):
+        return self.client.execute('HGET', self._key('workers'), payload) == worker
+
+    def renew(self, task, worker, lease=DEFAULT_LEASE):
+        payload = self._encode(task)
+        if not self._holds_lease(payload, worker):
+            return False
+        # XX: only while the task is still leased
+        self.client.execute('ZADD', self._key('leased'), 'XX', time.time() + lease, payload)
+        return self.client.execute('ZSCORE', self._key('leased'), payload) is not None
+
+    def complete(self, task, worker, urls, next_tasks=()):
+        added = 0
+        for url in urls:
+            if self.client.execute('HSETNX', self._key('keys'), f'{task.platform}:{item_key(task.platform, url)}', url):
+                record = {'platform': task.platform, 'query': task.query, 'page': task.page, 'url': url}
+                self.client.execute('RPUSH', self._key('results'), json.dumps(record))
+                added += 1
+        self._enqueue(next_tasks)
+        payload = self._encode(task)
+        self.client.execute('SADD', self._key('done'), payload)
+        if self._holds_lease(payload, worker):
+            self.client.execute('ZREM', self._key('leased'), payload)
+        return added
+
+    def fail(self, task, worker, error):
+        payload = self._encode(task)
+        if not self._holds_lease(payload, worker) or not self.client.execute('ZREM', self._key('leased'), payload):
+            return  # the lease expired and the task was already handed back
+        if int(self.client.execute('HGET', self._key('attempts'), payload) or 0) >= self.max_attempts:
+            self.client.execute('HSET', self._key('failed'), payload, str(error))
+        else:
+            self.client.execute('RPUSH', self._key('queued'), payload)
+
+    def counts(self):
+        return {
+            'queued': self.client.execute('LLEN', self._key('queued')),
+            'leased': self.client.execute('ZCARD', self._key('leased')),
+            'done': self.client.execute('SCARD', self._key('done')),
+            'failed': self.client.execute('HLEN', self._key('failed')),
+            'results': self.client.execute('LLEN', self._key('results')),
+        }
+
+    def failures(self):
+        reply = self.client.execute('HGETALL', self._key('failed')) or []
+        return [(Task(*json.loads(payload)), error) for payload, error in zip(reply[::2], reply[1::2])]
+
+    def results(self, batch=1000):
+        start = 0
+        while True:
+            records = self.client.execute('LRANGE', self._key('results'), start, start + batch - 1)
+            for record in records:
+                yield json.loads(record)
+            if len(records) < batch:
+                return
+            start += batch
+
+    def close(self):
+        self.client.close()
+
+def open_queue(url, max_attempts=DEFAULT_MAX_ATTEMPTS):
+    """
+    Open a task queue from a URL: `sqlite:///path/to/file.sqlite` (or a
+    plain file path) or `redis://[:password@]host[:port][/db]`.
+    """
+    parts = urlsplit(url)
+    if parts.scheme == 'redis':
+        db = int(parts.path.lstrip('/') or 0)
+        client = RespClient(parts.hostname or '127.0.0.1', parts.port or 6379, db, parts.password)
+        return RedisTaskQueue(client, max_attempts=max_attempts)
+    if parts.scheme == 'sqlite':
+        return SqliteTaskQueue(url[len('sqlite:///'):], max_attempts)
+    if parts.scheme:
+        raise ValueError(f"Unsupported queue URL: {url}")
+    return SqliteTaskQueue(url, max_attempts)
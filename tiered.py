@@ -0,0 +1,98 @@
+"""
+Tiered page fetching for the Selenium scrapers.
+
+A plain HTTP request is about ten times cheaper than a headless Chrome page
+load, so Amazon and Airbnb pages are first fetched with `requests` and only
+rendered in a browser when the raw HTML yields no results (a CAPTCHA, an
+empty client-side shell, an HTTP error) and does not say that there are
+none (e.g. an Airbnb map area with "0 places"). HTTP pages are parsed as
+they download and cut after their results where the platform allows it
+(see streaming.py). How often each tier was used is counted per platform.
+"""
+import threading
+from urllib.parse import urlsplit
+
+import requests
+
+from extraction import extract_links
+from http_client import get_session
+from metrics import metrics
+from pagination import parse_count
+from parse_pool import get_parse_pool
+from rate_control import ThrottledSession
+from streaming import StreamedPage, StreamingSession
+
+TIERS = ('http', 'browser')
+
+HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
+    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,*/*;q=0.8',
+    'Accept-Language': 'en-US,en;q=0.9',
+}
+
+class TierStats:
+    """Thread-safe count of pages served by each tier, per platform."""
+
+    def __init__(self):
+        self._counts = {}
+        self._lock = threading.Lock()
+
+    def record(self, platform, tier):
+        with self._lock:
+            counts = self._counts.setdefault(platform, dict.fromkeys(TIERS, 0))
+            counts[tier] += 1
+
+    def summary(self):
+        """Map each platform to its per-tier page counts and the share of pages that needed a browser."""
+        with self._lock:
+            result = {}
+            for platform, counts in self._counts.items():
+                total = sum(counts.values())
+                result[platform] = {**counts, 'browser_share': counts['browser'] / total if total else 0.0}
+            return result
+
+stats = TierStats()
+
+_local = threading.local()
+
+def get_http_session():
+    """The calling thread's rate-controlled view of the shared HTTP client (see http_client.py)."""
+    if not hasattr(_local, 'session'):
+        _local.session = ThrottledSession(get_session())
+    return _local.session
+
+def fetch_tiered(platform, url, render, http=True, timeout=15, stream=True):
+    """
+    Return (html, tier) for `url`. The HTTP tier is used when its page has
+    at least one result link for `platform` or a result count of zero;
+    otherwise `render()` loads the page in a browser. With `stream`, the
+    HTTP page is parsed as it downloads (see streaming.py); otherwise it is
+    parsed in the parse pool, if one is configured (see parse_pool.py). An
+    HTTP page is returned with its links, so it is not parsed again.
+    """
+    if http:
+        try:
+            host = urlsplit(url).netloc
+            session = StreamingSession(get_http_session(), platform) if stream else get_http_session()
+            with metrics.span('fetch', platform=platform, host=host):
+                response = session.get(url, headers=HEADERS, timeout=timeout)
+            metrics.count('bytes_downloaded', len(response.content), platform=platform, host=host)
+            if response.status_code == 200:
+                links = getattr(response.text, 'links', None)
+                if links is None:
+                    pool = get_parse_pool()
+                    links = pool.extract(platform, response.text) if pool else extract_links(platform, response.text)
+                if links.hrefs or parse_count(links.total_count) == 0:
+                    stats.record(platform, 'http')
+                    return StreamedPage(response.text, links), 'http'
+            print(f"{platform} HTTP fetch returned no results (status {response.status_code}), using the browser")
+        except requests.RequestException as e:
+            print(f"{platform} HTTP fetch failed ({e}), using the browser")
+    with metrics.span('render', platform=platform):
+        html = render()
+    stats.record(platform, 'browser')
+    return html, 'browser'
+
+def tier_stats():
+    """Per-platform tier usage for all pages fetched so far in this process."""
+    return stats.summary()
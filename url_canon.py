@@ -0,0 +1,161 @@
+import hashlib
+import math
+import os
+import re
+from urllib.parse import parse_qsl, unquote, urlencode, urlsplit, urlunsplit
+
+# Query parameters that only carry tracking state and never change the page
+TRACKING_PARAMS = {
+    'hash', 'ref', 'ref_', 'pf_rd_p', 'pf_rd_r', 'pd_rd_r', 'pd_rd_w', 'pd_rd_wg',
+    'qid', 'sr', 'sprefix', 'crid', 'keywords', 'content-id', 'th', 'psc',
+    'epid', 'itmmeta', 'itmprp', 'var', 'amdata', 'mkevt', 'mkcid', 'mkrid', 'campid',
+    'athrefid', 'athsid', 'classType', 'adsRedirect', 'from', 'sid', 'source_impression_id',
+    'previous_page_section_name', 'federated_search_id', 'search_mode',
+}
+TRACKING_PREFIXES = ('utm_', '_trk', '_trksid', 'pd_rd', 'pf_rd')
+
+PLATFORM_ITEMS = {
+    # platform: (canonical host, item id pattern, canonical path format)
+    'amazon': ('https://www.amazon.com', re.compile(r'/(?:dp|gp/product|gp/aw/d)/([A-Z0-9]{10})'), '/dp/{}'),
+    'ebay': ('https://www.ebay.com', re.compile(r'/itm/(?:[^/?#]+/)?(\d+)'), '/itm/{}'),
+    'walmart': ('https://www.walmart.com', re.compile(r'/ip/(?:[^?#]*/)?(\d+)(?:[/?#]|$)'), '/ip/{}'),
+    'airbnb': ('https://www.airbnb.com', re.compile(r'/rooms/(\d+)'), '/rooms/{}'),
+}
+
+def strip_tracking(url):
+    """Drop tracking query parameters and the fragment from a URL."""
+    parts = urlsplit(url)
+    query = [
+        (key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True)
+        if key not in TRACKING_PARAMS and not key.startswith(TRACKING_PREFIXES)
+    ]
+    return urlunsplit((parts.scheme, parts.netloc, parts.path, urlencode(query), ''))
+
+def item_id(platform, url):
+    """Return the item ID (eBay item, ASIN, Walmart item or room ID) in a URL, or None."""
+    _, pattern, _ = PLATFORM_ITEMS[platform]
+    # Amazon sponsored links wrap the product path in a `url` query parameter
+    if platform == 'amazon' and '/sspa/click' in url:
+        wrapped = dict(parse_qsl(urlsplit(url).query)).get('url')
+        if wrapped:
+            url = unquote(wrapped)
+    match = pattern.search(url)
+    return match.group(1) if match else None
+
+def canonicalize(platform, url):
+    """
+    Reduce a product or listing URL to its canonical form, e.g.
+    `https://www.ebay.com/itm/<item id>`. URLs without a recognizable item
+    ID only have their tracking parameters removed.
+    """
+    host, _, path_format = PLATFORM_ITEMS[platform]
+    found_id = item_id(platform, url)
+    if found_id:
+        return host + path_format.format(found_id)
+    return strip_tracking(url)
+
+def item_key(platform, url):
+    """Return the dedup key for a URL: `platform:item id`, or the canonical URL."""
+    found_id = item_id(platform, url)
+    return f"{platform}:{found_id}" if found_id else f"{platform}:{strip_tracking(url)}"
+
+class SeenSet:
+    """
+    Exact set of seen keys. With a `path`, keys are loaded from and appended
+    to a text file (one key per line) so they survive across runs.
+    """
+
+    def __init__(self, path=None):
+        self.path = path
+        self._keys = set()
+        self._file = None
+        if path:
+            if os.path.exists(path):
+                with open(path, encoding='utf-8') as f:
+                    self._keys.update(line.rstrip('\n') for line in f if line.strip())
+            self._file = open(path, 'a', encoding='utf-8')
+
+    def add(self, key):
+        """Record a key; return True if it had not been seen before."""
+        if key in self._keys:
+            return False
+        self._keys.add(key)
+        if self._file:
+            self._file.write(key + '\n')
+        return True
+
+    def __contains__(self, key):
+        return key in self._keys
+
+    def __len__(self):
+        return len(self._keys)
+
+    def close(self):
+        if self._file:
+            self._file.close()
+            self._file = None
+
+class BloomFilter:
+    """
+    Probabilistic seen-set with fixed memory for very large crawls.
+
+    Sized for `capacity` keys at the given false-positive rate; a false
+    positive means a new URL is occasionally treated as already seen. With a
+    `path`, the bit array is loaded from and saved back to disk.
+    """
+
+    def __init__(self, capacity=10_000_000, error_rate=0.001, path=None):
+        self.num_bits = max(8, int(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.num_hashes = max(1, round(self.num_bits / capacity * math.log(2)))
+        self.path = path
+        self.count = 0
+        self._bits = bytearray((self.num_bits + 7) // 8)
+        if path and os.path.exists(path):
+            with open(path, 'rb') as f:
+                data = f.read()
+            if len(data) == len(self._bits):
+                self._bits[:] = data
+            else:
+                print(f"Ignoring {path}: it was written for a different capacity")
+
+    def _positions(self, key):
+        digest = hashlib.blake2b(key.encode('utf-8'), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        return [(h1 + i * h2) % self.num_bits for i in range(self.num_hashes)]
+
+    def add(self, key):
+        """Record a key; return True if it had (probably) not been seen before."""
+        new = False
+        for pos in self._positions(key):
+            byte, bit = divmod(pos, 8)
+            if not self._bits[byte] & (1 << bit):
+                self._bits[byte] |= 1 << bit
+                new = True
+        if new:
+            self.count += 1
+        return new
+
+    def __contains__(self, key):
+        return all(self._bits[pos // 8] & (1 << (pos % 8)) for pos in self._positions(key))
+
+    def __len__(self):
+        return self.count
+
+    def close(self):
+        if self.path:
+            with open(self.path, 'wb') as f:
+                f.write(self._bits)
+
+class Deduper:
+    """Canonicalize URLs for one platform and drop the ones already seen."""
+
+    def __init__(self, platform, seen=None):
+        self.platform = platform
+        self.seen = seen if seen is not None else SeenSet()
+
+    def add(self, url):
+        """Return the canonical URL if it is new, otherwise None."""
+        if self.seen.add(item_key(self.platform, url)):
+            return canonicalize(self.platform, url)
+        return None
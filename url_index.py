@@ -0,0 +1,163 @@
+import os
+import sqlite3
+import threading
+import time
+
+from page_cache import DEFAULT_CACHE_PATH, normalize_query
+from url_canon import item_key
+
+DEFAULT_INDEX_PATH = os.path.join(os.path.dirname(DEFAULT_CACHE_PATH), 'url_index.sqlite')
+
+class UrlIndex:
+    """
+    Persistent index of the URLs found per (platform, normalized query), with
+    first-seen, last-seen and gone timestamps, for delta crawls: a run only
+    emits URLs that are new (or came back), stops paginating once a page
+    yields nothing new, and reports the URLs that disappeared.
+
+    URLs are only marked gone by a run that reaches the last page of the
+    results, which a run that stops early rarely does. With `stop_early`
+    False, runs crawl every page instead, so gone URLs are tracked.
+    """
+
+    def __init__(self, path=DEFAULT_INDEX_PATH, stop_early=True):
+        self.path = path
+        self.stop_early = stop_early
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.executescript(
+            """CREATE TABLE IF NOT EXISTS urls (
+                platform TEXT NOT NULL,
+                query TEXT NOT NULL,
+                key TEXT NOT NULL,
+                url TEXT NOT NULL,
+                first_seen REAL NOT NULL,
+                last_seen REAL NOT NULL,
+                new_at REAL,
+                gone_at REAL,
+                PRIMARY KEY (platform, query, key)
+            );
+            CREATE TABLE IF NOT EXISTS runs (
+                platform TEXT NOT NULL,
+                query TEXT NOT NULL,
+                started_at REAL NOT NULL,
+                finished_at REAL NOT NULL,
+                complete INTEGER NOT NULL,
+                new_count INTEGER NOT NULL,
+                gone_count INTEGER NOT NULL
+            );"""
+        )
+        self._db.commit()
+
+    def start_run(self, platform, query):
+        """Begin a delta run; pass the returned DeltaRun to the scrape."""
+        return DeltaRun(self, platform, normalize_query(query))
+
+    def _observe(self, platform, query, urls, now):
+        keys = {item_key(platform, url): url for url in urls}
+        if not keys:
+            return []
+        with self._lock:
+            placeholders = ','.join('?' * len(keys))
+            known = {
+                key for key, gone_at in self._db.execute(
+                    f"SELECT key, gone_at FROM urls WHERE platform=? AND query=? AND key IN ({placeholders})",
+                    (platform, query, *keys),
+                )
+                if gone_at is None
+            }
+            new = [url for key, url in keys.items() if key not in known]
+            self._db.executemany(
+                """INSERT INTO urls (platform, query, key, url, first_seen, last_seen, new_at, gone_at)
+                   VALUES (?, ?, ?, ?, ?, ?, ?, NULL)
+                   ON CONFLICT (platform, query, key) DO UPDATE SET
+                       last_seen=excluded.last_seen,
+                       new_at=CASE WHEN urls.gone_at IS NULL THEN urls.new_at ELSE excluded.new_at END,
+                       gone_at=NULL""",
+                [(platform, query, key, url, now, now, now) for key, url in keys.items()],
+            )
+            self._db.commit()
+        return new
+
+    def _finish(self, run, complete):
+        now = time.time()
+        with self._lock:
+            gone = []
+            if complete:
+                # Only a run that reached the last page can tell that a URL is gone
+                gone = [row[0] for row in self._db.execute(
+                    "SELECT url FROM urls WHERE platform=? AND query=? AND last_seen<? AND gone_at IS NULL",
+                    (run.platform, run.query, run.started_at),
+                )]
+                self._db.execute(
+                    "UPDATE urls SET gone_at=? WHERE platform=? AND query=? AND last_seen<? AND gone_at IS NULL",
+                    (now, run.platform, run.query, run.started_at),
+                )
+            self._db.execute(
+                "INSERT INTO runs VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (run.platform, run.query, run.started_at, now, int(complete), len(run.new), len(gone)),
+            )
+            self._db.commit()
+        return gone
+
+    def changes(self, platform, query):
+        """New and gone URLs of the latest run for (platform, query), as {'new': [...], 'gone': [...]}."""
+        query = normalize_query(query)
+        with self._lock:
+            run = self._db.execute(
+                "SELECT started_at FROM runs WHERE platform=? AND query=? ORDER BY started_at DESC LIMIT 1",
+                (platform, query),
+            ).fetchone()
+            if run is None:
+                return {'new': [], 'gone': []}
+            new = [row[0] for row in self._db.execute(
+                "SELECT url FROM urls WHERE platform=? AND query=? AND new_at>=? ORDER BY new_at",
+                (platform, query, run[0]),
+            )]
+            gone = [row[0] for row in self._db.execute(
+                "SELECT url FROM urls WHERE platform=? AND query=? AND gone_at>=?",
+                (platform, query, run[0]),
+            )]
+        return {'new': new, 'gone': gone}
+
+    def count(self, platform, query):
+        """Number of URLs currently listed for (platform, query)."""
+        with self._lock:
+            return self._db.execute(
+                "SELECT COUNT(*) FROM urls WHERE platform=? AND query=? AND gone_at IS NULL",
+                (platform, normalize_query(query)),
+            ).fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+class DeltaRun:
+    """One delta crawl of (platform, query); created by UrlIndex.start_run()."""
+
+    def __init__(self, index, platform, query):
+        self.index = index
+        self.platform = platform
+        self.query = query
+        # Whether pagination stops at the first page with nothing new
+        self.stop_early = index.stop_early
+        self.started_at = time.time()
+        self.new = []
+        self.gone = []
+
+    def observe(self, urls):
+        """Record the URLs found on a page and return those that are new since the previous runs."""
+        new = self.index._observe(self.platform, self.query, urls, time.time())
+        self.new.extend(new)
+        return new
+
+    def finish(self, complete):
+        """
+        End the run. When `complete` (every page up to the natural end was
+        crawled), URLs not seen in this run are marked gone and returned.
+        """
+        self.gone = self.index._finish(self, complete)
+        return self.gone
@@ -1,10 +1,20 @@
-import requests
-from bs4 import BeautifulSoup
-import csv
-import time
-import random
-from urllib.parse import urljoin
-import re
+from engine import HttpAdapter, ScrapeEngine
+from page_cache import get_default_cache
+from sinks import CsvSink
+
+class WalmartAdapter(HttpAdapter):
+    """Walmart search pages; the page count is read from page 1's pagination bar and a page without product links ends the search."""
+
+    platform = 'walmart'
+    # Walmart serves at most 25 result pages per search
+    page_limit = 25
+
+    def __init__(self, base_url="https://www.walmart.com", *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.base_url = base_url
+
+    def search_url(self, query, page):
+        return f"{self.base_url}/search?q={query.replace(' ', '+')}&page={page}"
 
 class WalmartScraper:
     def __init__(self):
@@ -14,62 +24,59 @@ class WalmartScraper:
             'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
             'Accept-Language': 'en-US,en;q=0.5',
         }
+        # Extraction backend: None picks the fastest available (see extraction.py)
+        self.backend = None
+        # Page cache shared with the other scrapers; set to None to always hit the network
+        self.cache = get_default_cache()
+        # Parse pages as they download and stop reading after the results (see streaming.py)
+        self.stream = True
         
-    def search_products(self, query):
-        search_url = f"{self.base_url}/search?q={query.replace(' ', '+')}"
-        products = []
-        page = 1
-        
-        try:
-            while True:
-                print(f"Scraping page {page}...")
-                current_url = f"{search_url}&page={page}"
-                response = requests.get(current_url, headers=self.headers)
-                
-                if response.status_code != 200:
-                    print(f"Failed to fetch page {page}. Status code: {response.status_code}")
-                    break
-                
-                soup = BeautifulSoup(response.text, 'html.parser')
-                product_elements = soup.find_all('a', href=re.compile(r'/ip/'))
-                
-                if not product_elements:
-                    break
-                
-                for element in product_elements:
-                    product_url = urljoin(self.base_url, element['href'])
-                    if product_url not in products:
-                        products.append(product_url)
-                
-                # Random delay between requests (1-3 seconds)
-                time.sleep(random.uniform(1, 3))
-                page += 1
-                
-                # Optional: limit to first 5 pages for testing
-                if page > 5:
-                    break
-                
-        except Exception as e:
-            print(f"An error occurred: {str(e)}")
-        
-        return products
+    def search_products(self, query, max_pages=None, per_host_limit=4, progress_callback=None, seen=None,
+                        page_callback=None, cancel_event=None, index=None, url_callback=None, strict=False):
+        """
+        Fetch the result pages of `query` and extract the product URLs from
+        them in page order (see engine.py). Page 1 tells how many pages there
+        are; the rest are fetched concurrently, at most `per_host_limit` at a
+        time, up to `max_pages` (None: every page, up to the adapter's
+        `page_limit`).
+
+        URLs are reduced to `https://www.walmart.com/ip/<item id>` and
+        deduplicated; pass a persistent `seen` set (see url_canon) to also
+        skip items found by earlier runs. `page_callback(page, urls)` receives
+        the new URLs of each page as soon as it is processed, and setting
+        `cancel_event` stops the search after the current page. With a
+        url_index.UrlIndex as `index`, only URLs new since earlier runs of the
+        query are returned (a delta crawl). With `stream` on, `url_callback(page,
+        url)` receives every product URL the moment it is parsed, before its
+        page has finished downloading (duplicates included). With `strict`, a
+        search that fails part way raises engine.ScrapeError instead of
+        returning the URLs found so far.
+        """
+        adapter = WalmartAdapter(self.base_url, None, self.headers, per_host_limit, self.cache, self.backend,
+                                 self.stream, url_callback)
+        delta = index.start_run('walmart', query) if index is not None else None
+        return ScrapeEngine(adapter).run(
+            query, max_pages, seen=seen, page_callback=page_callback,
+            progress_callback=progress_callback, cancel_event=cancel_event, delta=delta, strict=strict,
+        )
     
     def save_to_csv(self, products, filename):
-        with open(filename, 'w', newline='', encoding='utf-8') as file:
-            writer = csv.writer(file)
-            writer.writerow(['Product URL'])
-            for url in products:
-                writer.writerow([url])
-                
+        with CsvSink(filename, ['Product URL']) as sink:
+            sink.write_many({'Product URL': url} for url in products)
+
 def main():
     scraper = WalmartScraper()
     search_query = input("Enter your search query (e.g., 's24 ultra'): ")
     
-    print("Starting scraping process...")
-    products = scraper.search_products(search_query)
-    
     filename = f"walmart_{search_query.replace(' ', '_')}_products.csv"
-    scraper.save_to_csv(products, filename)
+    
+    print("Starting scraping process...")
+    # Rows are written to the CSV page by page as they are extracted
+    with CsvSink(filename, ['Product URL']) as sink:
+        products = scraper.search_products(
+            search_query,
+            page_callback=lambda page, urls: sink.write_many({'Product URL': url} for url in urls),
+        )
     
     print(f"\nScraping completed!")
     print(f"Found {len(products)} unique product URLs")